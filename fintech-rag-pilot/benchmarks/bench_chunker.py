@@ -0,0 +1,88 @@
+# benchmarks/bench_chunker.py
+"""
+Throughput benchmark: chunker.OffsetTextSplitter vs LangChain's
+RecursiveCharacterTextSplitter on the documents under data/.
+Also checks both produce identical chunks and compares memory held by
+the chunk output (string copies vs offset spans).
+
+    python benchmarks/bench_chunker.py --repeat 5
+"""
+import sys
+import time
+import argparse
+import tracemalloc
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SRC_DIR = ROOT_DIR / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from chunker import OffsetTextSplitter
+from ingest import list_source_files, pdf_to_text
+
+
+def load_texts(folder):
+    texts = []
+    for p in list_source_files(folder):
+        try:
+            texts.append(pdf_to_text(p) if p.suffix.lower() == ".pdf" else p.read_text(encoding="utf-8"))
+        except Exception as e:
+            print(f"[WARN] skip {p}: {e}")
+    return texts
+
+
+def timed(fn, texts, repeat):
+    best = float("inf")
+    out = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = [fn(t) for t in texts]
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def held_bytes(fn, texts):
+    tracemalloc.start()
+    out = [fn(t) for t in texts]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del out
+    return current
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--data", default=str(ROOT_DIR / "data"))
+    ap.add_argument("--chunk-size", type=int, default=800)
+    ap.add_argument("--chunk-overlap", type=int, default=200)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    texts = load_texts(args.data)
+    n_chars = sum(len(t) for t in texts)
+    lc = RecursiveCharacterTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+    native = OffsetTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+
+    t_lc, out_lc = timed(lc.split_text, texts, args.repeat)
+    t_spans, out_spans = timed(native.split_spans, texts, args.repeat)
+    t_text, out_text = timed(native.split_text, texts, args.repeat)
+
+    same = out_lc == out_text
+    n_chunks = sum(len(c) for c in out_lc)
+    print(f"docs={len(texts)} chars={n_chars} chunks={n_chunks} identical_output={same}")
+    for name, t in (("langchain split_text", t_lc), ("native split_spans", t_spans), ("native split_text", t_text)):
+        print(f"{name:22s} {t * 1000:8.1f} ms  {n_chars / t / 1e6:7.2f} MB/s  {n_chunks / t:9.0f} chunks/s  "
+              f"x{t_lc / t:.2f}")
+
+    mem_lc = held_bytes(lc.split_text, texts)
+    mem_spans = held_bytes(native.split_spans, texts)
+    print(f"memory held by output: langchain strings={mem_lc / 1024:.0f} KiB, "
+          f"native spans={mem_spans / 1024:.0f} KiB ({mem_lc / max(mem_spans, 1):.1f}x smaller)")
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
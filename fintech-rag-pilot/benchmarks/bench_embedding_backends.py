@@ -0,0 +1,110 @@
+# benchmarks/bench_embedding_backends.py
+"""
+Compare an embedding backend (onnx / onnx-int8) against full-precision torch
+on the indexed corpus:
+  - quality: cosine(full, candidate) per chunk and recall@k of the candidate's
+    nearest neighbours against the full-precision neighbours
+  - throughput (chunks/s) for index builds and single-query latency (p50/p99)
+
+    python benchmarks/bench_embedding_backends.py --backend onnx-int8 --k 10
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+import numpy as np
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SRC_DIR = ROOT_DIR / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+from encoders import load_encoder, BACKENDS, DEFAULT_MODEL
+from chunk_store import open_chunk_store
+from ingest import ingest_folder
+
+DEFAULT_QUERIES = [
+    "What is the due date on INV-2025-0815?",
+    "What is the net pay for employee EMP-4783?",
+    "RBI guidelines on customer service in banks",
+    "What is the closing balance on the Aisra bank statement?",
+    "What is the interest rate on the prior loan agreement?",
+    "Exchange of soiled and mutilated notes",
+    "Who is the vendor on purchase order PO-2025-0730?",
+    "What is the amount due on the BSES electricity bill?",
+]
+
+
+def load_texts(limit):
+    store = open_chunk_store()
+    if store is not None:
+        texts = [store.text(i) for i in range(len(store))]
+    else:
+        texts = [d["text"] for d in ingest_folder(str(ROOT_DIR / "data"), report_timings=False)]
+    return texts[:limit] if limit else texts
+
+
+def normalize(x):
+    x = np.asarray(x, dtype=np.float32)
+    return x / np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+
+
+def throughput(model, texts, batch):
+    model.encode(texts[:batch], batch_size=batch)  # warm-up
+    t0 = time.perf_counter()
+    emb = model.encode(texts, batch_size=batch, convert_to_numpy=True)
+    return emb, len(texts) / (time.perf_counter() - t0)
+
+
+def query_latency(model, queries, repeat):
+    times = []
+    for _ in range(repeat):
+        for q in queries:
+            t0 = time.perf_counter()
+            model.encode([q], convert_to_numpy=True)
+            times.append((time.perf_counter() - t0) * 1000)
+    return np.percentile(times, 50), np.percentile(times, 99)
+
+
+def recall_at_k(ref_docs, ref_q, cand_docs, cand_q, k):
+    ref_top = np.argsort(-(ref_q @ ref_docs.T), axis=1)[:, :k]
+    cand_top = np.argsort(-(cand_q @ cand_docs.T), axis=1)[:, :k]
+    return float(np.mean([len(set(a) & set(b)) / k for a, b in zip(ref_top, cand_top)]))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", default=DEFAULT_MODEL)
+    ap.add_argument("--backend", choices=BACKENDS, default="onnx-int8")
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--batch", type=int, default=64)
+    ap.add_argument("--limit", type=int, default=0, help="Only use the first N chunks")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    texts = load_texts(args.limit)
+    queries = DEFAULT_QUERIES
+    print(f"chunks={len(texts)} queries={len(queries)} model={args.model}")
+
+    results = {}
+    for backend in ("torch", args.backend):
+        model = load_encoder(args.model, backend)
+        docs, rate = throughput(model, texts, args.batch)
+        p50, p99 = query_latency(model, queries, args.repeat)
+        q = model.encode(queries, convert_to_numpy=True)
+        results[backend] = (normalize(docs), normalize(q))
+        print(f"{backend:10s} index {rate:8.1f} chunks/s | query p50 {p50:6.2f} ms  p99 {p99:6.2f} ms")
+
+    ref_d, ref_q = results["torch"]
+    cand_d, cand_q = results[args.backend]
+    cos = np.sum(ref_d * cand_d, axis=1)
+    # corpus chunks double as queries so recall covers the whole index, not just the sample questions
+    sample = ref_d[:: max(1, len(ref_d) // 200)]
+    sample_c = cand_d[:: max(1, len(cand_d) // 200)]
+    print(f"cosine(torch, {args.backend}) per chunk: mean {cos.mean():.4f}  min {cos.min():.4f}")
+    print(f"recall@{args.k} vs torch: questions {recall_at_k(ref_d, ref_q, cand_d, cand_q, args.k):.3f}  "
+          f"chunk-queries {recall_at_k(ref_d, sample, cand_d, sample_c, args.k):.3f}")
+
+
+if __name__ == "__main__":
+    main()
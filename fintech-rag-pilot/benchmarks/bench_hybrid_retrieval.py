@@ -0,0 +1,70 @@
+# benchmarks/bench_hybrid_retrieval.py
+"""
+Retrieval latency per mode (dense / sparse / hybrid) against an indexed store,
+checked against the README's 300 ms retrieval budget. Stores must have been
+built with the current embedding CLI so the BM25 index exists next to them.
+
+    python benchmarks/bench_hybrid_retrieval.py --persist chromadb_store --k 4 --repeat 20
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+import numpy as np
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SRC_DIR = ROOT_DIR / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+import vectorstore
+from bench_embedding_backends import DEFAULT_QUERIES
+
+BUDGET_MS = 300.0
+
+
+def run_mode(queries, k, mode, repeat, fresh):
+    encoder = vectorstore.REGISTRY.get(vectorstore.PUBLIC_DIR, vectorstore.PUBLIC_COLLECTION).encoder
+    times = []
+    for _ in range(repeat):
+        for q in queries:
+            if fresh:
+                encoder._cache.clear()  # measure query inference too, not just LRU hits
+            t0 = time.perf_counter()
+            vectorstore.retrieve(q, n_results=k, mode=mode)
+            times.append((time.perf_counter() - t0) * 1000)
+    return np.percentile(times, 50), np.percentile(times, 95), np.percentile(times, 99)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--persist", default=str(vectorstore.PUBLIC_DIR))
+    ap.add_argument("--collection", default=vectorstore.PUBLIC_COLLECTION)
+    ap.add_argument("--k", type=int, default=4)
+    ap.add_argument("--repeat", type=int, default=10)
+    ap.add_argument("--cached-queries", action="store_true", help="Let the query-vector LRU serve repeats")
+    args = ap.parse_args()
+
+    vectorstore.PUBLIC_DIR = Path(args.persist)
+    vectorstore.PUBLIC_COLLECTION = args.collection
+    vectorstore.warm_stores([(vectorstore.PUBLIC_DIR, args.collection)])
+    if vectorstore.REGISTRY.get(vectorstore.PUBLIC_DIR, args.collection).bm25 is None:
+        sys.exit(1)
+
+    over = False
+    for mode in vectorstore.RETRIEVE_MODES:
+        p50, p95, p99 = run_mode(DEFAULT_QUERIES, args.k, mode, args.repeat, not args.cached_queries)
+        ok = p99 <= BUDGET_MS
+        over |= not ok
+        print(f"{mode:7s} p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  p99 {p99:7.2f} ms  "
+              f"{'OK' if ok else 'OVER'} (budget {BUDGET_MS:.0f} ms)")
+
+    print("\nTop hit per mode:")
+    for q in DEFAULT_QUERIES:
+        tops = {m: (vectorstore.retrieve(q, n_results=1, mode=m) or [{"id": "-"}])[0]["id"] for m in vectorstore.RETRIEVE_MODES}
+        print(f"- {q}\n    " + "  ".join(f"{m}: {tops[m]}" for m in vectorstore.RETRIEVE_MODES))
+    sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/bench_quantization.py
+"""
+Quantized vector snapshots (float32 / float16 / int8): memory scanned per
+query, recall@k against exact float32 search with and without float32
+re-scoring, and query p50/p99.
+
+    python benchmarks/bench_quantization.py --synthetic 100000 --k 10
+    python benchmarks/bench_quantization.py --persist chromadb_store --rescore 4
+"""
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+import numpy as np
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SRC_DIR = ROOT_DIR / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+from vector_backends import open_collection
+from vector_snapshot import SNAPSHOT_DTYPES, VectorSnapshot, export_snapshot
+from bench_vector_backends import synthetic, store_vectors, ground_truth
+
+
+def evaluate(snap, queries, truth, k, rescore):
+    snap.rescore = rescore
+    times, hits = [], 0
+    for qi, q in enumerate(queries):
+        t0 = time.perf_counter()
+        resp = snap.query(query_embeddings=q[None, :], n_results=k, include=["distances"])
+        times.append((time.perf_counter() - t0) * 1000)
+        hits += len({int(i) for i in resp["ids"][0]} & set(truth[qi].tolist()))
+    return hits / float(truth.size), np.percentile(times, 50), np.percentile(times, 99)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--persist", default=None, help="Take vectors from this Chroma store")
+    ap.add_argument("--collection", default="werize_docs")
+    ap.add_argument("--synthetic", type=int, default=50000, help="Number of synthetic vectors (without --persist)")
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--rescore", type=int, default=4, help="Candidates per result re-scored in float32")
+    args = ap.parse_args()
+
+    vectors = store_vectors(args.persist, args.collection) if args.persist else synthetic(args.synthetic, args.dim)
+    print(f"[INFO] {len(vectors)} vectors, dim {vectors.shape[1]}")
+    rng = np.random.RandomState(1)
+    picks = rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)
+    queries = vectors[picks] + 0.05 * rng.normal(size=(len(picks), vectors.shape[1])).astype(np.float32)
+    truth = ground_truth(vectors, queries, args.k)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = open_collection("flat", Path(tmp), "bench")
+        source.upsert(ids=[str(i) for i in range(len(vectors))], embeddings=vectors)
+
+        base = None
+        for dtype in ("float32",) + tuple(d for d in SNAPSHOT_DTYPES if d != "float32"):
+            out = Path(tmp) / dtype
+            info = export_snapshot(source, out, dtype)
+            snap = VectorSnapshot(out / "vector_snapshot")
+            mb = info["scan_bytes"] / 2 ** 20
+            base = base or mb
+            modes = [(0, "scan only")] + ([(args.rescore, f"rescore x{args.rescore}")] if dtype != "float32" else [])
+            for rescore, label in modes:
+                recall, p50, p99 = evaluate(snap, queries, truth, args.k, rescore)
+                print(f"{dtype:8s} {label:12s} {mb:8.1f} MB ({base / mb:.1f}x smaller)  "
+                      f"recall@{args.k} {recall:.4f}  p50 {p50:6.2f} ms  p99 {p99:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
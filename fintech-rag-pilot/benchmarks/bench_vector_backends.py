@@ -0,0 +1,148 @@
+# benchmarks/bench_vector_backends.py
+"""
+Vector backends (chroma / flat / ivfpq) on the same vectors: build time,
+recall@k against exact brute force, query p50/p99 and peak RSS. Each backend
+runs in its own process so RSS is not shared between them.
+
+Vectors come from an indexed Chroma store (--persist) or are synthetic
+(--synthetic N, clustered Gaussian). Queries are perturbed held-out vectors.
+
+    python benchmarks/bench_vector_backends.py --synthetic 100000 --dim 384 --k 10
+    RAG_IVF_NPROBE=16 python benchmarks/bench_vector_backends.py --persist chromadb_store
+"""
+import os
+import sys
+import json
+import time
+import resource
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+import numpy as np
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SRC_DIR = ROOT_DIR / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+from vector_backends import VECTOR_BACKENDS, open_collection
+
+BUDGET_MS = 300.0
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0  # Linux reports KiB
+
+
+def synthetic(n, dim, seed=0):
+    rng = np.random.RandomState(seed)
+    centers = rng.normal(size=(max(8, n // 500), dim)).astype(np.float32)
+    x = centers[rng.randint(len(centers), size=n)] + 0.3 * rng.normal(size=(n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def store_vectors(persist, collection):
+    import chromadb
+    col = chromadb.PersistentClient(path=str(persist)).get_collection(collection)
+    out, offset = [], 0
+    while True:
+        page = col.get(include=["embeddings"], limit=5000, offset=offset)
+        if not page["ids"]:
+            break
+        out.append(np.asarray(page["embeddings"], dtype=np.float32))
+        offset += len(page["ids"])
+    return np.vstack(out)
+
+
+def ground_truth(vectors, queries, k):
+    d = (queries ** 2).sum(1)[:, None] - 2.0 * queries @ vectors.T + (vectors ** 2).sum(1)[None, :]
+    return np.argsort(d, axis=1)[:, :k]
+
+
+def run_backend(backend, data_path, k, batch=1000):
+    """Child process: build the backend from the saved vectors and time queries."""
+    data = np.load(data_path)
+    vectors, queries, truth = data["vectors"], data["queries"], data["truth"]
+    base_rss = rss_mb()
+    ids = [str(i) for i in range(len(vectors))]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        col = open_collection(backend, Path(tmp), "bench", delete_existing=True)
+        for i in range(0, len(vectors), batch):
+            col.upsert(ids=ids[i:i + batch], embeddings=vectors[i:i + batch],
+                       metadatas=[{"n": j} for j in range(i, min(i + batch, len(vectors)))])
+        col.query(query_embeddings=queries[:1], n_results=k)  # in-process ANN trains lazily on first query
+        build_s = time.perf_counter() - t0
+
+        times, hits = [], 0
+        for qi, q in enumerate(queries):
+            t0 = time.perf_counter()
+            resp = col.query(query_embeddings=q[None, :], n_results=k, include=["distances"])
+            times.append((time.perf_counter() - t0) * 1000)
+            hits += len({int(i) for i in resp["ids"][0]} & set(truth[qi].tolist()))
+
+    return {
+        "backend": backend,
+        "build_s": build_s,
+        "recall": hits / float(truth.size),
+        "p50_ms": float(np.percentile(times, 50)),
+        "p99_ms": float(np.percentile(times, 99)),
+        "rss_mb": rss_mb(),
+        "rss_delta_mb": rss_mb() - base_rss,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--persist", default=None, help="Take vectors from this Chroma store")
+    ap.add_argument("--collection", default="werize_docs")
+    ap.add_argument("--synthetic", type=int, default=20000, help="Number of synthetic vectors (without --persist)")
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--backends", default=",".join(VECTOR_BACKENDS))
+    ap.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    ap.add_argument("--data", default=None, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_backend(args.worker, args.data, args.k)))
+        return
+
+    if args.persist:
+        vectors = store_vectors(args.persist, args.collection)
+        print(f"[INFO] {len(vectors)} vectors from {args.persist}/{args.collection}")
+    else:
+        vectors = synthetic(args.synthetic, args.dim)
+        print(f"[INFO] {len(vectors)} synthetic vectors, dim {args.dim}")
+    rng = np.random.RandomState(1)
+    picks = rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)
+    queries = vectors[picks] + 0.05 * rng.normal(size=(len(picks), vectors.shape[1])).astype(np.float32)
+    truth = ground_truth(vectors, queries, args.k)
+
+    over = False
+    with tempfile.TemporaryDirectory() as tmp:
+        data_path = os.path.join(tmp, "bench.npz")
+        np.savez(data_path, vectors=vectors, queries=queries, truth=truth)
+        for backend in args.backends.split(","):
+            proc = subprocess.run(
+                [sys.executable, __file__, "--worker", backend, "--data", data_path, "--k", str(args.k)],
+                capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                print(f"[ERROR] {backend} failed:\n{proc.stderr.strip()}")
+                over = True
+                continue
+            r = json.loads(proc.stdout.strip().splitlines()[-1])
+            ok = r["p99_ms"] <= BUDGET_MS
+            over |= not ok
+            print(f"{backend:7s} build {r['build_s']:7.2f} s  recall@{args.k} {r['recall']:.3f}  "
+                  f"p50 {r['p50_ms']:7.2f} ms  p99 {r['p99_ms']:7.2f} ms  "
+                  f"RSS {r['rss_mb']:7.1f} MB (+{r['rss_delta_mb']:.1f})  {'OK' if ok else 'OVER'}")
+    sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
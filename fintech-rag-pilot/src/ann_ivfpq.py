@@ -0,0 +1,169 @@
+# src/ann_ivfpq.py
+"""
+IVF-PQ approximate nearest-neighbour index in NumPy.
+
+    coarse quantizer  k-means into nlist cells; a query scans only the nprobe
+                      nearest cells
+    product quantizer each residual (vector - cell centroid) is split into m
+                      sub-vectors, each stored as a 1-byte code (256 centroids)
+    refine            the best n_results * refine candidates by PQ distance are
+                      re-scored exactly against the float vectors (0 = off)
+
+Distances are squared L2, the same values Chroma reports for an "l2" space.
+Tuning: larger nprobe / refine -> higher recall, slower queries; larger m ->
+more accurate codes, more memory (m bytes per vector).
+"""
+import numpy as np
+
+KSUB = 256  # centroids per sub-quantizer (codes fit in uint8)
+
+
+def _sq_dists(x, c):
+    """Squared L2 distances [len(x), len(c)]."""
+    return np.maximum(
+        np.sum(x ** 2, axis=1, keepdims=True) - 2.0 * (x @ c.T) + np.sum(c ** 2, axis=1)[None, :], 0.0
+    )
+
+
+def _assign(x, c, block=8192):
+    """Nearest centroid per row (|x|^2 is constant per row, so it is left out)."""
+    if not len(x):
+        return np.zeros(0, dtype=np.int64)
+    c_sq = np.sum(c ** 2, axis=1)[None, :]
+    return np.concatenate([np.argmin(c_sq - 2.0 * (x[i:i + block] @ c.T), axis=1) for i in range(0, len(x), block)])
+
+
+def kmeans(x, k, iters=20, seed=0):
+    """Plain Lloyd's k-means; empty clusters are re-seeded from random points."""
+    rng = np.random.RandomState(seed)
+    k = min(k, len(x))
+    centroids = x[rng.choice(len(x), k, replace=False)].copy()
+    for _ in range(iters):
+        assign = _assign(x, centroids)
+        counts = np.bincount(assign, minlength=k)
+        order = np.argsort(assign, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        sums = np.zeros_like(centroids)
+        nonempty = counts > 0
+        sums[nonempty] = np.add.reduceat(x[order], starts[nonempty], axis=0)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        if empty.any():
+            centroids[empty] = x[rng.choice(len(x), int(empty.sum()), replace=False)]
+    return centroids
+
+
+class IVFPQIndex:
+    def __init__(self, nlist=None, m=None, nprobe=16, refine=10, kmeans_iters=12, train_size=50000, seed=0):
+        self.nlist = nlist          # None -> ~2 * sqrt(n)
+        self.m = m                  # None -> largest of 48/32/24/16/8/... dividing dim
+        self.nprobe = nprobe
+        self.refine = refine
+        self.kmeans_iters = kmeans_iters
+        self.train_size = train_size
+        self.seed = seed
+        self.centroids = None       # [nlist, dim]
+        self.codebooks = None       # [m, ksub, dim / m]
+        self.codes = None           # uint8 [n, m]
+        self.list_offsets = None    # int64 [nlist + 1]
+        self.list_rows = None       # int64 [n] rows grouped by cell
+
+    @staticmethod
+    def _pick_m(dim):
+        for m in (48, 32, 24, 16, 12, 8, 6, 4, 3, 2, 1):
+            if dim % m == 0:
+                return m
+        return 1
+
+    def params(self):
+        return {"nlist": self.nlist, "m": self.m, "nprobe": self.nprobe, "refine": self.refine,
+                "kmeans_iters": self.kmeans_iters, "train_size": self.train_size, "seed": self.seed}
+
+    def build(self, vectors):
+        x = np.asarray(vectors, dtype=np.float32)
+        n, dim = x.shape
+        if self.nlist is None:
+            self.nlist = max(1, int(2 * np.sqrt(n)))
+        self.nlist = min(self.nlist, n)
+        if self.m is None or dim % self.m:
+            self.m = self._pick_m(dim)
+        rng = np.random.RandomState(self.seed)
+        sample = x[rng.choice(n, min(n, self.train_size), replace=False)]
+
+        self.centroids = kmeans(sample, self.nlist, self.kmeans_iters, self.seed)
+        self.nlist = len(self.centroids)
+        assign = _assign(x, self.centroids)
+        residuals = x - self.centroids[assign]
+        sample_res = sample - self.centroids[_assign(sample, self.centroids)]
+
+        dsub = dim // self.m
+        ksub = min(KSUB, len(sample))
+        self.codebooks = np.stack([
+            kmeans(sample_res[:, j * dsub:(j + 1) * dsub], ksub, self.kmeans_iters, self.seed + j)
+            for j in range(self.m)
+        ])
+        self.codes = np.stack([
+            _assign(residuals[:, j * dsub:(j + 1) * dsub], self.codebooks[j]) for j in range(self.m)
+        ], axis=1).astype(np.uint8)
+
+        order = np.argsort(assign, kind="stable")
+        self.list_rows = order.astype(np.int64)
+        self.list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=self.nlist))]).astype(np.int64)
+        return self
+
+    def search(self, queries, k, vectors=None, allowed=None):
+        """
+        Top-k (rows, squared L2 distances) per query, best first.
+        vectors: float vectors for exact refinement; allowed: optional bool row mask.
+        """
+        q = np.asarray(queries, dtype=np.float32)
+        dsub = q.shape[1] // self.m
+        nprobe = min(self.nprobe, self.nlist)
+        cells = np.argsort(_sq_dists(q, self.centroids), axis=1)[:, :nprobe]
+        b_sq = np.sum(self.codebooks ** 2, axis=2)                     # [m, ksub]
+        sub = np.arange(self.m)
+        out_rows, out_dists = [], []
+        for qi in range(len(q)):
+            lo, hi = self.list_offsets[cells[qi]], self.list_offsets[cells[qi] + 1]
+            sizes = hi - lo
+            if not sizes.sum():
+                out_rows.append(np.zeros(0, dtype=np.int64))
+                out_dists.append(np.zeros(0, dtype=np.float32))
+                continue
+            rows = np.concatenate([self.list_rows[s:e] for s, e in zip(lo, hi)])
+            which = np.repeat(np.arange(nprobe), sizes)
+            # lookup tables per probed cell: |residual_j - codeword|^2 for every sub-quantizer j
+            res = (q[qi] - self.centroids[cells[qi]]).reshape(nprobe, self.m, dsub)
+            lut = (np.sum(res ** 2, axis=2)[:, :, None] - 2.0 * np.einsum("pmd,mkd->pmk", res, self.codebooks)
+                   + b_sq[None, :, :])
+            dists = lut[which[:, None], sub[None, :], self.codes[rows]].sum(axis=1)
+            if allowed is not None:
+                keep = allowed[rows]
+                rows, dists = rows[keep], dists[keep]
+            n_cand = min(len(rows), k * self.refine if (self.refine and vectors is not None) else k)
+            if n_cand == 0:
+                out_rows.append(rows)
+                out_dists.append(dists)
+                continue
+            top = np.argpartition(dists, n_cand - 1)[:n_cand]
+            rows, dists = rows[top], dists[top]
+            if self.refine and vectors is not None:
+                exact = np.asarray(vectors[np.sort(rows)], dtype=np.float32)
+                rows = np.sort(rows)
+                dists = np.sum((exact - q[qi]) ** 2, axis=1)
+            order = np.argsort(dists, kind="stable")[:k]
+            out_rows.append(rows[order])
+            out_dists.append(dists[order])
+        return out_rows, out_dists
+
+    def save(self, path):
+        for name in ("centroids", "codebooks", "codes", "list_offsets", "list_rows"):
+            np.save(path / f"ivf_{name}.npy", getattr(self, name))
+
+    @classmethod
+    def load(cls, path, params):
+        index = cls(**params)
+        for name in ("centroids", "codebooks", "codes", "list_offsets", "list_rows"):
+            setattr(index, name, np.load(path / f"ivf_{name}.npy", mmap_mode="r"))
+        index.nlist = len(index.centroids)
+        return index
@@ -0,0 +1,108 @@
+# src/answer_cache.py
+"""
+Semantic answer cache for rag_agent.answer_query.
+
+A new question is answered from the cache when its query embedding has
+cosine similarity >= threshold with a cached question that has the same
+sensitivity label and the same index version (so a re-index invalidates
+everything answered from the old index). Entries expire after a TTL and the
+least recently used ones are evicted beyond max_entries. The caller must never
+store RED answers; put() refuses them anyway.
+
+Config: RAG_ANSWER_CACHE (1/0), RAG_ANSWER_CACHE_THRESHOLD, RAG_ANSWER_CACHE_TTL
+(seconds), RAG_ANSWER_CACHE_SIZE.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+
+ANSWER_CACHE_ENABLED = os.environ.get("RAG_ANSWER_CACHE", "1").strip().lower() in ("1", "true", "yes")
+DEFAULT_THRESHOLD = float(os.environ.get("RAG_ANSWER_CACHE_THRESHOLD", "0.92"))
+DEFAULT_TTL = float(os.environ.get("RAG_ANSWER_CACHE_TTL", str(24 * 3600)))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("RAG_ANSWER_CACHE_SIZE", "1000"))
+CACHEABLE_LABELS = ("GREEN", "YELLOW")
+
+
+class _Entry:
+    __slots__ = ("label", "version", "vec", "question", "answer", "created")
+
+    def __init__(self, label, version, vec, question, answer):
+        self.label = label
+        self.version = version
+        self.vec = vec
+        self.question = question
+        self.answer = answer
+        self.created = time.time()
+
+
+class SemanticAnswerCache:
+    def __init__(self, threshold=DEFAULT_THRESHOLD, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # id -> _Entry, least recently used first
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.metrics = {"hits": 0, "misses": 0, "stores": 0, "evicted": 0, "expired": 0, "invalidated": 0}
+
+    @staticmethod
+    def _unit(vec):
+        vec = np.asarray(vec, dtype=np.float32).ravel()
+        return vec / max(float(np.linalg.norm(vec)), 1e-12)
+
+    def _purge(self, label, version, now):
+        """Drop expired entries and entries of this label built from an older index."""
+        for eid in list(self._entries):
+            e = self._entries[eid]
+            if now - e.created > self.ttl:
+                del self._entries[eid]
+                self.metrics["expired"] += 1
+            elif e.label == label and e.version != version:
+                del self._entries[eid]
+                self.metrics["invalidated"] += 1
+
+    def get(self, vec, label, version):
+        """Cached answer for the nearest matching question, or None."""
+        if label not in CACHEABLE_LABELS:
+            return None
+        q = self._unit(vec)
+        with self._lock:
+            self._purge(label, version, time.time())
+            ids = [eid for eid, e in self._entries.items() if e.label == label]
+            best_id, best_sim = None, -1.0
+            if ids:
+                sims = np.stack([self._entries[eid].vec for eid in ids]) @ q
+                i = int(np.argmax(sims))
+                best_id, best_sim = ids[i], float(sims[i])
+            if best_id is not None and best_sim >= self.threshold:
+                self._entries.move_to_end(best_id)
+                self.metrics["hits"] += 1
+                e = self._entries[best_id]
+                return {"answer": e.answer, "similarity": best_sim, "cached_question_age_s": time.time() - e.created}
+            self.metrics["misses"] += 1
+            return None
+
+    def put(self, vec, label, version, question, answer):
+        if label not in CACHEABLE_LABELS:
+            return
+        with self._lock:
+            self._entries[self._next_id] = _Entry(label, version, self._unit(vec), question, answer)
+            self._next_id += 1
+            self.metrics["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.metrics["evicted"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            m = dict(self.metrics)
+            m["entries"] = len(self._entries)
+        lookups = m["hits"] + m["misses"]
+        m["hit_rate"] = round(m["hits"] / lookups, 4) if lookups else 0.0
+        return m
@@ -0,0 +1,206 @@
+# src/bm25_index.py
+"""
+On-disk BM25 inverted index, built next to a Chroma store at index time.
+
+Dense search is weak on exact tokens (invoice numbers, employee IDs, dates),
+so retrieval can fuse this keyword index with the vector search
+(see vectorstore.retrieve(mode="hybrid")).
+
+Layout of <persist_dir>/bm25_index/ (numeric arrays memory-mapped on load):
+
+    postings_offsets.npy  int64  [V + 1] posting range of each term
+    postings_rows.npy     int32  row (chunk) numbers, grouped by term
+    postings_tf.npy       uint16 term frequency for each posting
+    doc_len.npy           int32  [N] tokens per chunk
+    meta.json             terms, chunk_ids, avgdl, k1, b
+
+Identifiers such as "INV-2025-0815" are kept as one token and also split
+into their parts, so both the full ID and "0815" match.
+"""
+import re
+import json
+import math
+import shutil
+from pathlib import Path
+from datetime import datetime, timezone
+import numpy as np
+
+BM25_DIRNAME = "bm25_index"
+K1 = 1.5
+B = 0.75
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-/_.][a-z0-9]+)*")
+_PART_RE = re.compile(r"[-/_.]")
+
+
+def tokenize(text):
+    tokens = []
+    for m in _TOKEN_RE.finditer((text or "").lower()):
+        tok = m.group()
+        tokens.append(tok)
+        if _PART_RE.search(tok):
+            tokens.extend(p for p in _PART_RE.split(tok) if p)
+    return tokens
+
+
+class BM25Builder:
+    def __init__(self, k1=K1, b=B):
+        self.k1 = k1
+        self.b = b
+        self.chunk_ids = []
+        self.doc_len = []
+        self.postings = {}  # term -> [(row, tf)]
+
+    def add(self, chunk_id, text):
+        row = len(self.chunk_ids)
+        self.chunk_ids.append(chunk_id)
+        tokens = tokenize(text)
+        self.doc_len.append(len(tokens))
+        counts = {}
+        for t in tokens:
+            counts[t] = counts.get(t, 0) + 1
+        for t, tf in counts.items():
+            self.postings.setdefault(t, []).append((row, min(tf, 65535)))
+
+    def write(self, path):
+        """Write the index to path (replaced as a whole, never half-written)."""
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+
+        terms = sorted(self.postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        for i, t in enumerate(terms):
+            offsets[i + 1] = offsets[i] + len(self.postings[t])
+        rows = np.empty(int(offsets[-1]), dtype=np.int32)
+        tfs = np.empty(int(offsets[-1]), dtype=np.uint16)
+        for i, t in enumerate(terms):
+            plist = self.postings[t]
+            rows[offsets[i]:offsets[i + 1]] = [r for r, _ in plist]
+            tfs[offsets[i]:offsets[i + 1]] = [f for _, f in plist]
+
+        np.save(tmp / "postings_offsets.npy", offsets)
+        np.save(tmp / "postings_rows.npy", rows)
+        np.save(tmp / "postings_tf.npy", tfs)
+        np.save(tmp / "doc_len.npy", np.asarray(self.doc_len, dtype=np.int32))
+        n = len(self.chunk_ids)
+        meta = {
+            "built_at": datetime.now(timezone.utc).isoformat(),
+            "num_chunks": n,
+            "num_terms": len(terms),
+            "avgdl": (sum(self.doc_len) / n) if n else 0.0,
+            "k1": self.k1,
+            "b": self.b,
+            "terms": terms,
+            "chunk_ids": self.chunk_ids,
+        }
+        with open(tmp / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+        old = path.with_name(path.name + ".old")
+        shutil.rmtree(old, ignore_errors=True)
+        if path.exists():
+            path.rename(old)
+        tmp.rename(path)
+        shutil.rmtree(old, ignore_errors=True)
+        return meta
+
+
+class BM25Index:
+    """Read-only BM25 index; search() returns [(chunk_id, score)] best first."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / "meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.k1 = meta["k1"]
+        self.b = meta["b"]
+        self.avgdl = meta["avgdl"] or 1.0
+        self.chunk_ids = meta["chunk_ids"]
+        self.term_index = {t: i for i, t in enumerate(meta["terms"])}
+        self._row_of = None
+        self.offsets = np.load(self.path / "postings_offsets.npy", mmap_mode="r")
+        self.rows = np.load(self.path / "postings_rows.npy", mmap_mode="r")
+        self.tfs = np.load(self.path / "postings_tf.npy", mmap_mode="r")
+        self.doc_len = np.load(self.path / "doc_len.npy").astype(np.float32)
+        # per-chunk length normalisation, precomputed once
+        self.norm = self.k1 * (1 - self.b + self.b * self.doc_len / self.avgdl)
+
+    def __len__(self):
+        return len(self.chunk_ids)
+
+    def term_stats(self, query):
+        """(chunks, total tokens, {term: document frequency}) for the query's terms."""
+        df = {}
+        for term in set(tokenize(query)):
+            i = self.term_index.get(term)
+            if i is not None:
+                df[term] = int(self.offsets[i + 1] - self.offsets[i])
+        return len(self.chunk_ids), self.avgdl * len(self.chunk_ids), df
+
+    def search(self, query, k=10, allowed_ids=None, stats=None):
+        """
+        allowed_ids: optional collection of chunk ids to restrict the results to.
+        stats: optional corpus-wide (chunks, avgdl, {term: df}) to score with
+        instead of this index's own, so scores from several shards are comparable.
+        """
+        n = len(self.chunk_ids)
+        if n == 0:
+            return []
+        n_docs, avgdl, df = stats if stats is not None else (n, self.avgdl, None)
+        scores = np.zeros(n, dtype=np.float32)
+        hit = False
+        for term in set(tokenize(query)):
+            i = self.term_index.get(term)
+            if i is None:
+                continue
+            lo, hi = int(self.offsets[i]), int(self.offsets[i + 1])
+            rows = self.rows[lo:hi]
+            tf = self.tfs[lo:hi].astype(np.float32)
+            d = (hi - lo) if df is None else df.get(term, hi - lo)
+            idf = math.log(1 + (n_docs - d + 0.5) / (d + 0.5))
+            norm = self.norm[rows] if stats is None else self.k1 * (1 - self.b + self.b * self.doc_len[rows] / avgdl)
+            scores[rows] += idf * tf * (self.k1 + 1) / (tf + norm)
+            hit = True
+        if not hit:
+            return []
+        if allowed_ids is not None:
+            if self._row_of is None:
+                self._row_of = {cid: i for i, cid in enumerate(self.chunk_ids)}
+            keep = np.zeros(n, dtype=bool)
+            keep[[self._row_of[c] for c in allowed_ids if c in self._row_of]] = True
+            scores[~keep] = 0
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.chunk_ids[r], float(scores[r])) for r in top if scores[r] > 0]
+
+
+def build_bm25_from_collection(collection, persist_directory, page_size=1000):
+    """(Re)build the BM25 index from every chunk currently in the Chroma collection."""
+    builder = BM25Builder()
+    offset = 0
+    while True:
+        page = collection.get(include=["documents"], limit=page_size, offset=offset)
+        ids = page.get("ids") or []
+        if not ids:
+            break
+        for cid, text in zip(ids, page.get("documents") or []):
+            builder.add(cid, text or "")
+        offset += len(ids)
+    path = Path(persist_directory) / BM25_DIRNAME
+    meta = builder.write(path)
+    print(f"[INFO] BM25 index: {meta['num_chunks']} chunks, {meta['num_terms']} terms → {path}")
+    return meta
+
+
+def open_bm25_index(persist_directory):
+    """BM25Index stored next to a Chroma store, or None if it has not been built."""
+    path = Path(persist_directory) / BM25_DIRNAME
+    if not (path / "meta.json").exists():
+        return None
+    try:
+        return BM25Index(path)
+    except Exception as e:
+        print("[WARN] Failed to open BM25 index:", e)
+        return None
@@ -5,9 +5,10 @@ import textwrap
 
 # import your existing RAG entrypoint
 # make sure src/ is current working dir when running streamlit from project root
-from rag_agent import answer_query
+from rag_agent import init, answer_query, answer_cache_stats
 
 st.set_page_config(page_title="Fintech — RAG Chat", layout="centered")
+init()  # warm stores/models once per process (no-op on reruns)
 
 st.title("Fintech — Knowledge Triage Chat (Pilot)")
 st.markdown(
@@ -20,6 +21,9 @@ with st.sidebar:
     st.write("- Local RAG agent using your Chroma index")
     st.write("- If OpenAI key configured, answers will be polished by the LLM")
     st.write("- Sensitive inputs are refused by the agent (RED)")
+    cache_stats = answer_cache_stats()
+    if cache_stats:
+        st.write(f"- Answer cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses ({cache_stats['entries']} entries)")
 
 # Input area
 st.subheader("Ask a question")
@@ -0,0 +1,203 @@
+# src/chunk_store.py
+"""
+Compact chunk representation.
+
+In memory: ChunkRecord (__slots__, interned doc_id/file_type/source).
+On disk: a columnar directory written once by ingest and memory-mapped by
+indexing (embedding,py --chunk-store) and the benchmarks instead of
+re-parsing raw files:
+
+    text.bin            all chunk texts, UTF-8, back to back
+    text_offsets.npy    int64 [n + 1] byte offsets into text.bin
+    doc.npy             int32 [n] index into dicts.json["doc_id"]
+    file_type.npy       int16 [n] index into dicts.json["file_type"]
+    source.npy          int8  [n] index into dicts.json["source"]
+    chunk_no.npy        int32 [n] chunk number within its doc (chunk_id = f"{doc_id}_{no}")
+    start.npy / end.npy int64 [n] character span in the extracted document text
+    page.npy            int32 [n] PDF page number, -1 if none
+    dicts.json          interned string tables + per-doc content hashes
+
+Numeric columns use .npy so np.load(mmap_mode="r") maps them without copying;
+no Arrow/Parquet dependency is needed.
+"""
+import sys
+import json
+from array import array
+from pathlib import Path
+from datetime import datetime, timezone
+import numpy as np
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+DEFAULT_STORE_DIR = ROOT_DIR / "chunk_store"
+_INTERNED = ("doc_id", "file_type", "source")
+
+
+class ChunkRecord:
+    __slots__ = ("doc_id", "chunk_id", "file_type", "source", "content_hash", "start", "end", "page", "text")
+
+    def __init__(self, doc_id, chunk_id, file_type, source, text, content_hash=None, start=None, end=None, page=None):
+        self.doc_id = sys.intern(doc_id)
+        self.chunk_id = chunk_id
+        self.file_type = sys.intern(file_type)
+        self.source = sys.intern(source)
+        self.content_hash = content_hash
+        self.start = start
+        self.end = end
+        self.page = page
+        self.text = text
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["doc_id"], d["chunk_id"], d.get("file_type", ""), d.get("source", ""), d["text"],
+                   d.get("content_hash"), d.get("start"), d.get("end"), d.get("page"))
+
+    def to_dict(self):
+        """Same shape as ingest's chunk dicts (what build_chroma consumes)."""
+        return {s: getattr(self, s) for s in self.__slots__}
+
+    # dict-style access so records can be passed where chunk dicts are expected
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __repr__(self):
+        return f"ChunkRecord({self.chunk_id!r}, {len(self.text)} chars)"
+
+
+class _Interner:
+    def __init__(self):
+        self.values = []
+        self.index = {}
+
+    def __call__(self, value):
+        value = value if value is not None else ""
+        i = self.index.get(value)
+        if i is None:
+            i = self.index[value] = len(self.values)
+            self.values.append(value)
+        return i
+
+
+def write_chunk_store(docs, path=DEFAULT_STORE_DIR):
+    """
+    Stream chunk dicts/records into a columnar store at path (overwrites).
+    Only the small numeric columns are held in memory while writing.
+    Returns the number of chunks written.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    interners = {k: _Interner() for k in _INTERNED}
+    doc_hashes = {}
+    cols = {
+        "doc": array("i"), "file_type": array("h"), "source": array("b"),
+        "chunk_no": array("i"), "start": array("q"), "end": array("q"), "page": array("i"),
+    }
+    offsets = array("q", [0])
+    with open(path / "text.bin", "wb") as f:
+        for d in docs:
+            doc_id = d["doc_id"]
+            cols["doc"].append(interners["doc_id"](doc_id))
+            cols["file_type"].append(interners["file_type"](d.get("file_type")))
+            cols["source"].append(interners["source"](d.get("source")))
+            cols["chunk_no"].append(int(d["chunk_id"].rsplit("_", 1)[1]))
+            cols["start"].append(d.get("start") if d.get("start") is not None else -1)
+            cols["end"].append(d.get("end") if d.get("end") is not None else -1)
+            cols["page"].append(d.get("page") if d.get("page") is not None else -1)
+            doc_hashes[doc_id] = d.get("content_hash")
+            data = d["text"].encode("utf-8")
+            f.write(data)
+            offsets.append(offsets[-1] + len(data))
+
+    dtypes = {"doc": np.int32, "file_type": np.int16, "source": np.int8, "chunk_no": np.int32,
+              "start": np.int64, "end": np.int64, "page": np.int32}
+    for name, col in cols.items():
+        np.save(path / f"{name}.npy", np.frombuffer(col, dtype=dtypes[name]) if len(col) else np.zeros(0, dtypes[name]))
+    np.save(path / "text_offsets.npy", np.frombuffer(offsets, dtype=np.int64))
+    dicts = {k: interners[k].values for k in _INTERNED}
+    dicts["content_hash"] = [doc_hashes.get(d) for d in dicts["doc_id"]]
+    dicts["num_chunks"] = len(offsets) - 1
+    dicts["written_at"] = datetime.now(timezone.utc).isoformat()
+    with open(path / "dicts.json", "w", encoding="utf-8") as f:
+        json.dump(dicts, f, indent=2, ensure_ascii=False)
+    print(f"[INFO] Wrote {len(offsets) - 1} chunks to chunk store {path}")
+    return len(offsets) - 1
+
+
+class ChunkStore:
+    """Read-only, memory-mapped view of a store written by write_chunk_store."""
+
+    def __init__(self, path=DEFAULT_STORE_DIR):
+        self.path = Path(path)
+        with open(self.path / "dicts.json", "r", encoding="utf-8") as f:
+            self.dicts = json.load(f)
+        self.offsets = np.load(self.path / "text_offsets.npy", mmap_mode="r")
+        self.cols = {
+            name: np.load(self.path / f"{name}.npy", mmap_mode="r")
+            for name in ("doc", "file_type", "source", "chunk_no", "start", "end", "page")
+        }
+        size = int(self.offsets[-1]) if len(self.offsets) else 0
+        self.text_bin = np.memmap(self.path / "text.bin", dtype=np.uint8, mode="r") if size else np.zeros(0, np.uint8)
+        self._id_index = None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def text(self, i):
+        return bytes(self.text_bin[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+    def chunk_id(self, i):
+        return f"{self.dicts['doc_id'][self.cols['doc'][i]]}_{int(self.cols['chunk_no'][i])}"
+
+    def record(self, i):
+        doc = int(self.cols["doc"][i])
+        doc_id = self.dicts["doc_id"][doc]
+
+        def opt(name):
+            v = int(self.cols[name][i])
+            return None if v < 0 else v
+        return ChunkRecord(
+            doc_id, f"{doc_id}_{int(self.cols['chunk_no'][i])}",
+            self.dicts["file_type"][self.cols["file_type"][i]],
+            self.dicts["source"][self.cols["source"][i]],
+            self.text(i),
+            self.dicts["content_hash"][doc],
+            opt("start"), opt("end"), opt("page"),
+        )
+
+    def __getitem__(self, i):
+        return self.record(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.record(i)
+
+    def index_of(self, chunk_id):
+        """Row number of chunk_id (index built on first use), or None."""
+        if self._id_index is None:
+            self._id_index = {self.chunk_id(i): i for i in range(len(self))}
+        return self._id_index.get(chunk_id)
+
+    def get(self, chunk_id):
+        i = self.index_of(chunk_id)
+        return None if i is None else self.record(i)
+
+    def rows_for_doc(self, doc_id):
+        try:
+            doc = self.dicts["doc_id"].index(doc_id)
+        except ValueError:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(np.asarray(self.cols["doc"]) == doc)
+
+
+def open_chunk_store(path=DEFAULT_STORE_DIR):
+    """ChunkStore at path, or None if no store has been written there."""
+    path = Path(path)
+    if not (path / "dicts.json").exists():
+        return None
+    try:
+        return ChunkStore(path)
+    except Exception as e:
+        print("[WARN] Failed to open chunk store:", e)
+        return None
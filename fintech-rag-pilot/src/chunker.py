@@ -0,0 +1,175 @@
+# src/chunker.py
+"""
+Offset-based recursive text splitter.
+
+Produces exactly the same chunks as LangChain's
+RecursiveCharacterTextSplitter(chunk_size, chunk_overlap) with its default
+settings (separators ["\\n\\n", "\\n", " ", ""], separator kept at the start of
+the following piece, whitespace stripped), but works on (start, end) offsets
+into the source text instead of copying every piece and chunk into new strings.
+Chunks keep their offsets (and PDF page), so citations can point at exact spans.
+"""
+from bisect import bisect_right
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", " ", ""]
+DEFAULT_TOKENIZER = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+class SourceDoc:
+    """Extracted text of one file plus (offset, page number) markers for PDFs."""
+    __slots__ = ("doc_id", "text", "page_offsets", "page_numbers")
+
+    def __init__(self, doc_id, text, pages=None):
+        self.doc_id = doc_id
+        self.text = text
+        pages = pages or []
+        self.page_offsets = [off for off, _ in pages]
+        self.page_numbers = [num for _, num in pages]
+
+    def page_at(self, offset):
+        if not self.page_offsets:
+            return None
+        i = bisect_right(self.page_offsets, offset) - 1
+        return self.page_numbers[max(i, 0)]
+
+
+class Chunk:
+    """A chunk as a view into its SourceDoc: (doc, start, end, page)."""
+    __slots__ = ("doc", "start", "end", "page")
+
+    def __init__(self, doc, start, end, page=None):
+        self.doc = doc
+        self.start = start
+        self.end = end
+        self.page = page
+
+    @property
+    def text(self):
+        return self.doc.text[self.start:self.end]
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __repr__(self):
+        return f"Chunk({self.doc.doc_id!r}, {self.start}, {self.end}, page={self.page})"
+
+
+def token_length_function(model_name=DEFAULT_TOKENIZER):
+    """
+    Length in tokens of the given HuggingFace tokenizer; same counting as
+    RecursiveCharacterTextSplitter.from_huggingface_tokenizer.
+    """
+    from transformers import AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    def length(text):
+        return len(tokenizer.tokenize(text))
+    return length
+
+
+class OffsetTextSplitter:
+    def __init__(self, chunk_size=800, chunk_overlap=200, separators=None, length_function=None):
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) larger than chunk_size ({chunk_size})")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators or DEFAULT_SEPARATORS
+        # None -> character length computed from offsets, no string copies
+        self.length_function = length_function
+
+    @staticmethod
+    def _split_on(text, start, end, separator):
+        """Pieces of text[start:end] with each separator kept at the start of the following piece."""
+        if not separator:
+            return [(i, i + 1) for i in range(start, end)]
+        # str.split runs in C; only the piece lengths are used to rebuild offsets
+        parts = text[start:end].split(separator)
+        sep_len = len(separator)
+        spans = []
+        pos = start
+        first = True
+        for part in parts:
+            n = len(part) if first else len(part) + sep_len
+            first = False
+            if n:
+                spans.append((pos, pos + n))
+                pos += n
+        return spans
+
+    @staticmethod
+    def _strip(text, start, end):
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return start, end
+
+    def _emit(self, text, start, end, out):
+        start, end = self._strip(text, start, end)
+        if end > start:
+            out.append((start, end))
+
+    def _merge(self, text, splits):
+        """splits: [(start, end, length)]; window of pieces is splits[lo:j] (no list copies)."""
+        separator_len = 0 if self.length_function is None else self.length_function("")
+        chunk_size, chunk_overlap = self.chunk_size, self.chunk_overlap
+        out = []
+        lo = 0
+        total = 0
+        for j, (_, _, n) in enumerate(splits):
+            if total + n + (separator_len if j > lo else 0) > chunk_size:
+                if j > lo:
+                    self._emit(text, splits[lo][0], splits[j - 1][1], out)
+                    while total > chunk_overlap or (
+                        total + n + (separator_len if j > lo else 0) > chunk_size and total > 0
+                    ):
+                        total -= splits[lo][2] + (separator_len if j - lo > 1 else 0)
+                        lo += 1
+            total += n + (separator_len if j > lo else 0)
+        if len(splits) > lo:
+            self._emit(text, splits[lo][0], splits[-1][1], out)
+        return out
+
+    def _split(self, text, start, end, separators):
+        final = []
+        separator = separators[-1]
+        new_separators = []
+        for i, sep in enumerate(separators):
+            if not sep:
+                separator = sep
+                break
+            if text.find(sep, start, end) != -1:
+                separator = sep
+                new_separators = separators[i + 1:]
+                break
+
+        chunk_size = self.chunk_size
+        char_length = self.length_function is None
+        good = []
+        for s, e in self._split_on(text, start, end, separator):
+            n = e - s if char_length else self.length_function(text[s:e])
+            if n < chunk_size:
+                good.append((s, e, n))
+            else:
+                if good:
+                    final.extend(self._merge(text, good))
+                    good = []
+                if not new_separators:
+                    final.append((s, e))
+                else:
+                    final.extend(self._split(text, s, e, new_separators))
+        if good:
+            final.extend(self._merge(text, good))
+        return final
+
+    def split_spans(self, text):
+        """Return chunk (start, end) offsets into text."""
+        return self._split(text, 0, len(text), self.separators)
+
+    def split_text(self, text):
+        """Drop-in for RecursiveCharacterTextSplitter.split_text."""
+        return [text[s:e] for s, e in self.split_spans(text)]
+
+    def split_doc(self, doc):
+        """Return Chunk views (with page numbers for PDFs) for a SourceDoc."""
+        return [Chunk(doc, s, e, doc.page_at(s)) for s, e in self.split_spans(doc.text)]
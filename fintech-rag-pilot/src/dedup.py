@@ -0,0 +1,99 @@
+# src/dedup.py
+"""
+Near-duplicate chunk detection with MinHash signatures + LSH banding.
+
+MinHashDeduper.filter(docs) streams chunk dicts through and yields only
+the first ("representative") chunk of each near-duplicate group; later
+chunks whose estimated Jaccard similarity (word 3-gram shingles) to a
+representative is >= threshold are recorded in `groups` instead of being
+embedded again.
+"""
+import re
+import zlib
+import numpy as np
+
+DEFAULT_THRESHOLD = 0.9
+DEFAULT_NUM_PERM = 128
+DEFAULT_BANDS = 32
+SHINGLE_WORDS = 3
+_PRIME = 4294967311  # smallest prime > 2**32
+_WORD_RE = re.compile(r"\w+")
+
+
+def shingle_hashes(text, k=SHINGLE_WORDS):
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < k:
+        grams = [" ".join(words)] if words else [text]
+    else:
+        grams = [" ".join(words[i:i + k]) for i in range(len(words) - k + 1)]
+    return np.fromiter({zlib.crc32(g.encode("utf-8")) for g in grams}, dtype=np.uint64)
+
+
+class MinHashDeduper:
+    def __init__(self, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM, bands=DEFAULT_BANDS, seed=42):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.RandomState(seed)
+        # a, b < 2**31 and hashes < 2**32 keep a*x + b inside uint64
+        self.a = rng.randint(1, 2 ** 31, size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, 2 ** 31, size=num_perm).astype(np.uint64)
+        self.buckets = [dict() for _ in range(bands)]
+        self.signatures = {}   # representative chunk_id -> signature
+        self.groups = {}       # representative chunk_id -> [{chunk_id, doc_id, content_hash}]
+        self.input_chunks = 0
+
+    def signature(self, text):
+        sh = shingle_hashes(text)
+        return ((self.a[:, None] * sh[None, :] + self.b[:, None]) % _PRIME).min(axis=1)
+
+    def _band_keys(self, sig):
+        r = self.rows
+        return [sig[i * r:(i + 1) * r].tobytes() for i in range(self.bands)]
+
+    def find(self, sig):
+        """Return the representative chunk_id this signature duplicates, or None."""
+        keys = self._band_keys(sig)
+        checked = set()
+        for band, key in enumerate(keys):
+            for cand in self.buckets[band].get(key, ()):
+                if cand in checked:
+                    continue
+                checked.add(cand)
+                if float(np.mean(self.signatures[cand] == sig)) >= self.threshold:
+                    return cand
+        return None
+
+    def add(self, chunk_id, sig):
+        self.signatures[chunk_id] = sig
+        for band, key in enumerate(self._band_keys(sig)):
+            self.buckets[band].setdefault(key, []).append(chunk_id)
+
+    def filter(self, docs):
+        """Yield unique chunk dicts; near-duplicates are collected in self.groups."""
+        for d in docs:
+            self.input_chunks += 1
+            sig = self.signature(d["text"])
+            rep = self.find(sig)
+            if rep is None:
+                self.add(d["chunk_id"], sig)
+                yield d
+            else:
+                dup = {"chunk_id": d["chunk_id"], "doc_id": d["doc_id"], "content_hash": d.get("content_hash")}
+                self.groups.setdefault(rep, []).append(dup)
+
+    def stats(self):
+        unique = len(self.signatures)
+        dups = self.input_chunks - unique
+        return {
+            "input_chunks": self.input_chunks,
+            "unique_chunks": unique,
+            "duplicates_collapsed": dups,
+            "dedup_ratio": round(dups / self.input_chunks, 4) if self.input_chunks else 0.0,
+            "threshold": self.threshold,
+            "num_perm": self.num_perm,
+            "bands": self.bands,
+        }
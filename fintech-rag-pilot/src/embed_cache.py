@@ -0,0 +1,192 @@
+# src/embed_cache.py
+"""
+On-disk embedding cache keyed by (model name, sha256 of chunk text).
+
+Layout (one sub-directory per model):
+    <cache_dir>/<model>/vectors.f32   float32 matrix, memory-mapped (capacity x dim)
+    <cache_dir>/<model>/index.sqlite  key -> slot, last_used (for LRU eviction)
+
+The vector file grows by doubling up to max_bytes; once full, the least
+recently used entries are evicted and their slots reused.
+"""
+import re
+import time
+import sqlite3
+import hashlib
+from pathlib import Path
+import numpy as np
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+DEFAULT_CACHE_DIR = ROOT_DIR / "embedding_cache"
+DEFAULT_MAX_MB = 1024
+INITIAL_CAPACITY = 1024
+EVICT_FRACTION = 0.1  # share of entries dropped when the cache is full
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _model_dirname(model_name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+
+
+class EmbeddingCache:
+    def __init__(self, model_name, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.model_name = model_name
+        self.dir = Path(cache_dir) / _model_dirname(model_name)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_bytes)
+        self.vec_path = self.dir / "vectors.f32"
+        self.db = sqlite3.connect(str(self.dir / "index.sqlite"))
+        self.db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, slot INTEGER, last_used REAL)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON entries(last_used)")
+        self.db.commit()
+
+        row = self.db.execute("SELECT value FROM meta WHERE name='dim'").fetchone()
+        self.dim = int(row[0]) if row else None
+        row = self.db.execute("SELECT value FROM meta WHERE name='capacity'").fetchone()
+        self.capacity = int(row[0]) if row else 0
+        self.vectors = None
+        if self.dim and self.capacity and self.vec_path.exists():
+            self.vectors = np.memmap(self.vec_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+        self._init_free_list()
+        self.hits = 0
+        self.misses = 0
+
+    # ---- storage helpers ----
+    def _max_slots(self):
+        return max(1, self.max_bytes // (self.dim * 4))
+
+    def _set_meta(self, name, value):
+        self.db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, str(value)))
+
+    def _resize(self, capacity):
+        """Grow the memory-mapped vector file to `capacity` rows."""
+        if self.vectors is not None:
+            self.vectors.flush()
+            self.vectors = None
+        with open(self.vec_path, "ab") as f:
+            f.truncate(capacity * self.dim * 4)
+        self.capacity = capacity
+        self.vectors = np.memmap(self.vec_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self._set_meta("capacity", capacity)
+
+    def _init_free_list(self):
+        """Slots below the high-water mark that are not in use (left by evictions)."""
+        row = self.db.execute("SELECT MAX(slot), COUNT(*) FROM entries").fetchone()
+        self.next_slot = 0 if row[0] is None else row[0] + 1
+        self._free = []
+        if row[1] < self.next_slot:
+            used = {r[0] for r in self.db.execute("SELECT slot FROM entries")}
+            self._free = [s for s in range(self.next_slot) if s not in used]
+
+    def _free_slots(self, needed):
+        """Return `needed` free slot numbers, growing the file or evicting LRU entries."""
+        slots = self._free[:needed]
+        del self._free[:needed]
+        needed -= len(slots)
+        if needed and self.next_slot + needed > self.capacity and self.capacity < self._max_slots():
+            new_cap = max(self.capacity * 2, INITIAL_CAPACITY, self.next_slot + needed)
+            self._resize(min(new_cap, self._max_slots()))
+        take = min(needed, self.capacity - self.next_slot)
+        slots.extend(range(self.next_slot, self.next_slot + take))
+        self.next_slot += take
+        needed -= take
+        if needed:
+            # full: drop least-recently-used entries and reuse their slots
+            n_evict = max(needed, int(self.capacity * EVICT_FRACTION))
+            rows = self.db.execute("SELECT key, slot FROM entries ORDER BY last_used LIMIT ?", (n_evict,)).fetchall()
+            self.db.executemany("DELETE FROM entries WHERE key=?", [(r[0],) for r in rows])
+            evicted = [r[1] for r in rows]
+            print(f"[INFO] Embedding cache full; evicted {len(evicted)} LRU entries")
+            slots.extend(evicted[:needed])
+            self._free.extend(evicted[needed:])
+        return slots
+
+    # ---- public API ----
+    def get_many(self, texts):
+        """Return {position: vector} for the texts already cached."""
+        found = {}
+        if self.vectors is None:
+            self.misses += len(texts)
+            return found
+        keys = [text_key(t) for t in texts]
+        now = time.time()
+        touched = []
+        for i, k in enumerate(keys):
+            row = self.db.execute("SELECT slot FROM entries WHERE key=?", (k,)).fetchone()
+            if row is not None:
+                found[i] = np.array(self.vectors[row[0]])
+                touched.append((now, k))
+        if touched:
+            self.db.executemany("UPDATE entries SET last_used=? WHERE key=?", touched)
+            self.db.commit()
+        self.hits += len(found)
+        self.misses += len(texts) - len(found)
+        return found
+
+    def put_many(self, texts, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(texts) == 0:
+            return
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+            self._set_meta("dim", self.dim)
+        # de-duplicate keys within the batch and skip keys already stored
+        pending = {}
+        for t, v in zip(texts, vectors):
+            pending[text_key(t)] = v
+        existing = {
+            k for k in pending
+            if self.db.execute("SELECT 1 FROM entries WHERE key=?", (k,)).fetchone() is not None
+        }
+        new_keys = [k for k in pending if k not in existing][: self._max_slots()]
+        if not new_keys:
+            return
+        slots = self._free_slots(len(new_keys))
+        now = time.time()
+        rows = []
+        for k, slot in zip(new_keys, slots):
+            self.vectors[slot] = pending[k]
+            rows.append((k, slot, now))
+        self.db.executemany("INSERT OR REPLACE INTO entries (key, slot, last_used) VALUES (?, ?, ?)", rows)
+        self.db.commit()
+
+    def flush(self):
+        if self.vectors is not None:
+            self.vectors.flush()
+        self.db.commit()
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+
+def encode_with_cache(model_loader, texts, cache=None, **encode_kwargs):
+    """
+    Encode texts, reusing cached vectors and only running the model on misses.
+    model_loader() is called lazily (and only if at least one text misses).
+    Returns an (n, dim) float32 array in input order.
+    """
+    if cache is None:
+        return model_loader().encode(texts, convert_to_numpy=True, **encode_kwargs)
+
+    found = cache.get_many(texts)
+    missing = [i for i in range(len(texts)) if i not in found]
+    if missing:
+        miss_texts = [texts[i] for i in missing]
+        emb = np.asarray(model_loader().encode(miss_texts, convert_to_numpy=True, **encode_kwargs), dtype=np.float32)
+        cache.put_many(miss_texts, emb)
+        for i, v in zip(missing, emb):
+            found[i] = v
+    return np.vstack([found[i] for i in range(len(texts))]).astype(np.float32)
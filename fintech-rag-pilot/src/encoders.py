@@ -0,0 +1,137 @@
+# src/encoders.py
+"""
+Embedding model loading, plus a multi-process encoder pool for index builds.
+
+Backends (same model weights, different CPU runtimes):
+    torch      PyTorch SentenceTransformer (default)
+    onnx       ONNX Runtime export of the model
+    onnx-int8  dynamically int8-quantized ONNX model
+The ONNX backends need sentence-transformers >= 3.2 and optimum[onnxruntime].
+Vectors from different backends are close but not identical, so caches and
+manifests key them by encoder_id(model, backend).
+
+EncoderPool starts N worker processes, each loading the model exactly once,
+shards every encode() call across them and gathers the vectors back in input
+order. It exposes the same encode() signature as SentenceTransformer, so it
+can be used anywhere a model is expected (e.g. embed_cache.encode_with_cache).
+"""
+import os
+import re
+import multiprocessing as mp
+from pathlib import Path
+import numpy as np
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+DEFAULT_BACKEND = "torch"
+BACKENDS = ("torch", "onnx", "onnx-int8")
+ROOT_DIR = Path(__file__).resolve().parents[1]
+ONNX_EXPORT_DIR = ROOT_DIR / "onnx_models"
+# pre-quantized file shipped with the sentence-transformers MiniLM repos (AVX2 is the widely available ISA)
+ONNX_INT8_FILE = os.environ.get("RAG_ONNX_INT8_FILE", "onnx/model_quint8_avx2.onnx")
+
+_worker_model = None
+
+
+def encoder_id(model_name=DEFAULT_MODEL, backend=DEFAULT_BACKEND):
+    """Name under which vectors of this model/backend are cached and recorded."""
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+def _load_int8(model_name):
+    from sentence_transformers import SentenceTransformer
+    try:
+        return SentenceTransformer(model_name, backend="onnx", model_kwargs={"file_name": ONNX_INT8_FILE})
+    except Exception as e:
+        print(f"[INFO] No pre-quantized '{ONNX_INT8_FILE}' for {model_name} ({e}); quantizing locally")
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+    save_dir = ONNX_EXPORT_DIR / re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+    quantized = save_dir / "onnx" / "model_qint8_avx2.onnx"
+    if not quantized.exists():
+        model = SentenceTransformer(model_name, backend="onnx")
+        model.save_pretrained(str(save_dir))
+        export_dynamic_quantized_onnx_model(model, "avx2", str(save_dir))
+    return SentenceTransformer(str(save_dir), backend="onnx", model_kwargs={"file_name": "onnx/model_qint8_avx2.onnx"})
+
+
+def load_encoder(model_name=DEFAULT_MODEL, backend=DEFAULT_BACKEND):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}' (choose from {', '.join(BACKENDS)})")
+    from sentence_transformers import SentenceTransformer
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+    try:
+        if backend == "onnx":
+            return SentenceTransformer(model_name, backend="onnx")
+        return _load_int8(model_name)
+    except Exception as e:
+        print(f"[ERROR] Failed to load {backend} backend (needs sentence-transformers>=3.2 and "
+              f"'pip install optimum[onnxruntime]'):", e)
+        raise
+
+
+def _init_worker(model_name, threads, backend=DEFAULT_BACKEND):
+    global _worker_model
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except Exception:
+        pass
+    os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+    _worker_model = load_encoder(model_name, backend)
+
+
+def _encode_shard(args):
+    texts, kwargs = args
+    return _worker_model.encode(texts, convert_to_numpy=True, **kwargs)
+
+
+class EncoderPool:
+    def __init__(self, model_name=DEFAULT_MODEL, workers=None, backend=DEFAULT_BACKEND):
+        self.model_name = model_name
+        self.workers = workers or os.cpu_count() or 1
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        # spawn: never fork a parent that may already hold torch thread pools
+        ctx = mp.get_context("spawn")
+        self.pool = ctx.Pool(self.workers, initializer=_init_worker, initargs=(model_name, threads, backend))
+        print(f"[INFO] Started {self.workers} {backend} encoder processes for '{model_name}' ({threads} threads each)")
+
+    def encode(self, texts, convert_to_numpy=True, show_progress_bar=False, batch_size=32, **kwargs):
+        if len(texts) == 0:
+            return np.zeros((0, 0), dtype=np.float32)
+        n_shards = min(self.workers, len(texts))
+        size = -(-len(texts) // n_shards)  # ceil
+        shards = [texts[i:i + size] for i in range(0, len(texts), size)]
+        kwargs = dict(kwargs, batch_size=min(batch_size, size), show_progress_bar=False)
+        # map() returns shard results in submission order
+        parts = self.pool.map(_encode_shard, [(shard, kwargs) for shard in shards])
+        return np.vstack(parts)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+
+class LazyEncoder:
+    """
+    Callable returning the encoder, built on first call only (so fully
+    cached runs never load a model). workers > 1 builds an EncoderPool.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL, workers=1, backend=DEFAULT_BACKEND):
+        self.model_name = model_name
+        self.workers = workers
+        self.backend = backend
+        self.encoder = None
+
+    def __call__(self):
+        if self.encoder is None:
+            if self.workers and self.workers > 1:
+                self.encoder = EncoderPool(self.model_name, self.workers, self.backend)
+            else:
+                self.encoder = load_encoder(self.model_name, self.backend)
+        return self.encoder
+
+    def close(self):
+        if isinstance(self.encoder, EncoderPool):
+            self.encoder.close()
+        self.encoder = None
@@ -0,0 +1,127 @@
+# src/evidence.py
+"""
+Evidence selection for the generation prompt.
+
+adaptive_top_k: keep retrieved chunks only while they stay relevant — stop at
+    a relevance floor (a distance cutoff on the dense side) or at a clear score
+    drop ("elbow"), instead of always passing k chunks.
+budget_evidence: merge chunks of the same document that are adjacent or
+    overlapping in the source text (dropping the duplicated splitter overlap)
+    and, when a token budget is set, fill the prompt up to it, best evidence first.
+
+Config: RAG_ADAPTIVE_K (1/0, default off: callers get the k they ask for), RAG_MIN_RELEVANCE, RAG_ELBOW,
+RAG_EVIDENCE_TOKENS (0 = no budget, the default: every retrieved chunk reaches the prompt).
+"""
+import os
+
+ADAPTIVE_K = os.environ.get("RAG_ADAPTIVE_K", "0").strip().lower() in ("1", "true", "yes")
+MIN_RELEVANCE = float(os.environ.get("RAG_MIN_RELEVANCE", "0.2"))
+ELBOW = float(os.environ.get("RAG_ELBOW", "0.5"))   # cut where one drop is >= this share of the score spread
+EVIDENCE_TOKENS = int(os.environ.get("RAG_EVIDENCE_TOKENS", "0"))
+MERGE_GAP = 2   # chars of whitespace allowed between chunks that still count as adjacent
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.encoding_for_model("gpt-3.5-turbo")
+except Exception:
+    _ENCODING = None
+
+
+def count_tokens(text):
+    """gpt-3.5-turbo tokens (tiktoken), or a ~4 chars/token estimate without it."""
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return (len(text) + 3) // 4
+
+
+def truncate_tokens(text, max_tokens):
+    """Head of text within max_tokens, cut with the tokenizer count_tokens uses."""
+    if _ENCODING is not None:
+        return _ENCODING.decode(_ENCODING.encode(text)[:max_tokens])
+    return text[: max_tokens * 4]
+
+
+def adaptive_top_k(results, key="relevance", min_score=MIN_RELEVANCE, elbow=ELBOW, min_k=1):
+    """
+    Prefix of results (sorted best first by key, higher = better) that is still
+    relevant. min_score applies only to normalized relevance; elbow works on
+    any scale (e.g. cross-encoder logits).
+    """
+    if not results or any(r.get(key) is None for r in results):
+        return results
+    scores = [r[key] for r in results]
+    n = len(results)
+    if min_score is not None:
+        while n > min_k and scores[n - 1] < min_score:
+            n -= 1
+    if n >= 3 and elbow:
+        gaps = [scores[i - 1] - scores[i] for i in range(1, n)]
+        spread = scores[0] - scores[n - 1]
+        i = max(range(len(gaps)), key=gaps.__getitem__)
+        if spread > 0 and gaps[i] >= elbow * spread:
+            n = max(min_k, i + 1)
+    return results[:n]
+
+
+def _meta(r):
+    return r.get("metadata") or {}
+
+
+def _merge_doc_chunks(chunks):
+    """Merge one document's chunks that touch or overlap in the source text."""
+    with_span = sorted((c for c in chunks if _meta(c).get("start") is not None), key=lambda c: _meta(c)["start"])
+    sections = [{"chunks": [c], "text": c.get("text") or ""} for c in chunks if _meta(c).get("start") is None]
+    cur = None
+    for c in with_span:
+        start, end, text = _meta(c)["start"], _meta(c)["end"], c.get("text") or ""
+        if cur is not None and start <= cur["end"] + MERGE_GAP:
+            if end > cur["end"]:
+                overlap = cur["end"] - start
+                cur["text"] += text[overlap:] if overlap >= 0 else "\n" + text
+                cur["end"] = end
+            cur["chunks"].append(c)
+        else:
+            cur = {"chunks": [c], "text": text, "end": end}
+            sections.append(cur)
+    return sections
+
+
+def budget_evidence(results, max_tokens=EVIDENCE_TOKENS):
+    """
+    Evidence sections for compose_evidence, best first, within max_tokens
+    (0/None: no budget, only merge).
+    Each section looks like a retrieved result ({id, text, metadata}) plus
+    chunk_ids of the chunks merged into it.
+    """
+    rank = {}
+    by_doc = {}
+    for i, r in enumerate(results):
+        rank.setdefault(r["id"], i)
+        by_doc.setdefault(_meta(r).get("doc_id", r["id"]), []).append(r)
+
+    sections = []
+    for chunks in by_doc.values():
+        for s in _merge_doc_chunks(chunks):
+            first = min(s["chunks"], key=lambda c: rank[c["id"]])
+            sections.append({
+                "id": first["id"],
+                "text": s["text"].strip(),
+                "metadata": _meta(first),
+                "chunk_ids": [c["id"] for c in s["chunks"]],
+                "rank": rank[first["id"]],
+            })
+    sections.sort(key=lambda s: s["rank"])
+
+    out, used = [], 0
+    for s in sections:
+        tokens = count_tokens(s["text"])
+        if max_tokens and used + tokens > max_tokens:
+            if out:
+                continue  # a later, smaller section may still fit
+            # the best section alone exceeds the budget: keep its head
+            s["text"] = truncate_tokens(s["text"], max_tokens)
+            tokens = count_tokens(s["text"])
+        s["tokens"] = tokens
+        out.append(s)
+        used += tokens
+    return out
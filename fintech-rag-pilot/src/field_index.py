@@ -0,0 +1,323 @@
+# src/field_index.py
+"""
+Structured-field index: "Key: Value" fields extracted from the text documents
+(invoice numbers, due dates, employee IDs, net pay, masked account digits ...)
+stored in SQLite next to a Chroma store.
+
+answer_query uses it for exact identifier lookups ("What is the due date on
+INV-2025-0815?"): the identifier selects the document, the question names the
+field, and the answer is returned with a line citation without vector search
+or an LLM call. Anything that does not resolve to exactly one field falls
+back to RAG.
+
+Field names follow data/expected_*.json, which doubles as the accuracy test set:
+
+    python src/field_index.py --build --eval
+"""
+import re
+import sys
+import json
+import sqlite3
+import argparse
+import threading
+from pathlib import Path
+
+from ingest import list_source_files, file_sha256
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+DATA_DIR = ROOT_DIR / "data"
+DB_NAME = "field_index.sqlite"
+DEFAULT_STORE_DIR = ROOT_DIR / "chromadb_store"
+
+# source label -> field name, where snake_case(label) is not the expected name
+FIELD_ALIASES = {
+    "employee": "employee_name",
+    "account number": "account_last4",
+    "aadhaar": "id_last4",
+    "bank account (last 4)": "bank_last4",
+    "interest rate": "interest_rate_percent",
+    "purchase order": "po_number",
+    "total order value": "total_value",
+}
+# filename keyword -> document type
+DOC_TYPES = [
+    ("invoice", "invoice"), ("payslip", "payslip"), ("bank_statement", "bank_statement"),
+    ("credit", "credit_report"), ("employment", "employment_letter"), ("govt_id", "id_proof"),
+    ("income_tax", "tax_notice"), ("loan", "loan_agreement"), ("purchase_order", "purchase_order"),
+    ("utility", "utility_bill"),
+]
+INT_FIELDS = {"credit_score"}
+
+_KV_RE = re.compile(r"^\s*([A-Za-z][A-Za-z0-9 ()/.&-]{0,40}?)\s*:\s*(.+?)\s*$")
+_AMOUNT_RE = re.compile(r"^([\d,]+(?:\.\d+)?)\s*(INR|USD|EUR|Rs\.?|₹)?$")
+_PERCENT_RE = re.compile(r"^(\d+(?:\.\d+)?)\s*%")
+_MASKED_RE = re.compile(r"^[*xX\s]+(\d{4})$")
+_RANGE_RE = re.compile(r"^(\d{4}-\d{2}-\d{2})\s+to\s+(\d{4}-\d{2}-\d{2})$")
+# identifiers as they appear in questions: INV-2025-0815, EMP-4783, TF-992, PAN AARPG1234A
+IDENTIFIER_RE = re.compile(r"\b(?:[A-Z]{2,}[A-Z0-9]*-\d[A-Z0-9-]*|[A-Z]{5}\d{4}[A-Z])\b")
+# all a lookup question may contain besides the field and the identifier
+# ("What is the due date on invoice INV-2025-0815?"); anything else goes to RAG
+LOOKUP_WORDS = {
+    "what", "whats", "which", "when", "who", "how", "much", "is", "s", "are", "was", "the", "a", "an",
+    "of", "for", "on", "in", "to", "with", "tell", "me", "give", "show", "please", "find", "get",
+    "number", "no", "id", "document", "doc",
+} | {w for keyword, typ in DOC_TYPES for w in re.split(r"_", keyword + "_" + typ)}
+
+
+def is_lookup_question(question, identifier, phrases):
+    """True if nothing but LOOKUP_WORDS is left once the identifier and phrases are removed."""
+    rest = question.lower().replace(identifier.lower(), " ")
+    for phrase in sorted(phrases, key=len, reverse=True):
+        rest = re.sub(r"\b" + re.escape(phrase) + r"\b", " ", rest)
+    return all(w in LOOKUP_WORDS for w in re.findall(r"[a-z0-9]+", rest))
+
+
+def _snake(label):
+    return re.sub(r"[^a-z0-9]+", "_", label.lower()).strip("_")
+
+
+def doc_type(doc_id):
+    name = doc_id.lower()
+    for keyword, typ in DOC_TYPES:
+        if keyword in name:
+            return typ
+    return None
+
+
+def extract_fields(text):
+    """
+    [(field, value as written, typed value, label, line number, line text)].
+    Amounts become floats (plus a currency field), masked numbers their last
+    four digits, "A to B" date ranges <field>_start / <field>_end.
+    """
+    out = []
+    for lineno, line in enumerate(text.splitlines(), 1):
+        m = _KV_RE.match(line)
+        if not m:
+            continue
+        label, raw = m.group(1).strip(), m.group(2).strip()
+        field = FIELD_ALIASES.get(label.lower(), _snake(label))
+
+        def add(name, value, name_label=label):
+            out.append((name, raw, value, name_label, lineno, line.strip()))
+
+        if _MASKED_RE.match(raw):
+            add(field, _MASKED_RE.match(raw).group(1))
+        elif _RANGE_RE.match(raw):
+            start, end = _RANGE_RE.match(raw).groups()
+            add(f"{field}_start", start)
+            add(f"{field}_end", end)
+        elif _AMOUNT_RE.match(raw) and any(c.isdigit() for c in raw) and not re.fullmatch(r"\d{4}", raw):
+            number, currency = _AMOUNT_RE.match(raw).groups()
+            value = float(number.replace(",", ""))
+            add(field, int(value) if field in INT_FIELDS else value)
+            if currency:
+                add("currency", "INR" if currency.startswith(("Rs", "₹")) else currency, "Currency")
+        elif _PERCENT_RE.match(raw):
+            add(field, float(_PERCENT_RE.match(raw).group(1)))
+        else:
+            add(field, raw)
+    return out
+
+
+class FieldIndex:
+    """SQLite field store; safe to share between threads."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._lock = threading.Lock()
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS docs (doc_id TEXT PRIMARY KEY, type TEXT, sha256 TEXT);
+            CREATE TABLE IF NOT EXISTS fields (
+                doc_id TEXT, field TEXT, value TEXT, value_norm TEXT, label TEXT,
+                line INTEGER, line_text TEXT, PRIMARY KEY (doc_id, field));
+            CREATE INDEX IF NOT EXISTS fields_value ON fields (value_norm);
+        """)
+
+    def doc_hashes(self):
+        with self._lock:
+            return dict(self.conn.execute("SELECT doc_id, sha256 FROM docs"))
+
+    def put_document(self, doc_id, text, sha256=None):
+        rows = []
+        seen = set()
+        for field, raw, value, label, lineno, line in extract_fields(text):
+            if field in seen:
+                continue  # first occurrence wins
+            seen.add(field)
+            rows.append((doc_id, field, json.dumps(value), raw.upper() if field != "currency" else None,
+                         label, lineno, line))
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM fields WHERE doc_id = ?", (doc_id,))
+            self.conn.execute("INSERT OR REPLACE INTO docs VALUES (?, ?, ?)", (doc_id, doc_type(doc_id), sha256))
+            self.conn.executemany("INSERT INTO fields VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def remove_document(self, doc_id):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM fields WHERE doc_id = ?", (doc_id,))
+            self.conn.execute("DELETE FROM docs WHERE doc_id = ?", (doc_id,))
+
+    def document(self, doc_id):
+        """{field: typed value} plus doc_id/type, in the expected_*.json shape."""
+        with self._lock:
+            typ = self.conn.execute("SELECT type FROM docs WHERE doc_id = ?", (doc_id,)).fetchone()
+            rows = self.conn.execute("SELECT field, value FROM fields WHERE doc_id = ?", (doc_id,)).fetchall()
+        if typ is None:
+            return None
+        out = {"doc_id": doc_id, "type": typ[0]}
+        out.update({f: json.loads(v) for f, v in rows})
+        return out
+
+    def docs_with_value(self, identifier):
+        with self._lock:
+            return [r[0] for r in self.conn.execute(
+                "SELECT DISTINCT doc_id FROM fields WHERE value_norm = ?", (identifier.upper(),))]
+
+    def lookup(self, question):
+        """
+        Resolve "<field> of <identifier>" questions. Returns {doc_id, field,
+        label, value, raw, line, line_text, identifier} or None when the question has
+        no identifier, the identifier is ambiguous, no field name is mentioned, or
+        the question asks more than the field's value ("Why was ... not paid by the
+        due date?").
+        """
+        q = question.lower()
+        for identifier in dict.fromkeys(IDENTIFIER_RE.findall(question)):
+            docs = self.docs_with_value(identifier)
+            if len(docs) != 1:
+                continue
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT field, value, label, line, line_text, value_norm FROM fields WHERE doc_id = ?",
+                    (docs[0],)).fetchall()
+            # words naming the identifier ("employee" in "employee EMP-4783") do not select a field
+            id_phrases = [p for f, _, l, _, _, v in rows if v == identifier.upper()
+                          for p in (l.lower(), f.replace("_", " "))]
+            best = None
+            for field, value, label, line, line_text, value_norm in rows:
+                if value_norm == identifier.upper():
+                    continue  # the identifier itself is not the answer
+                for phrase in {label.lower(), field.replace("_", " ")}:
+                    if any(phrase in p for p in id_phrases):
+                        continue
+                    if re.search(r"\b" + re.escape(phrase) + r"\b", q) and (best is None or len(phrase) > best[0]):
+                        best = (len(phrase), field, value, label, line, line_text)
+            if best is not None:
+                _, field, value, label, line, line_text = best
+                phrases = id_phrases + [label.lower(), field.replace("_", " ")]
+                if not is_lookup_question(question, identifier, phrases):
+                    return None
+                return {"doc_id": docs[0], "identifier": identifier, "field": field, "label": label,
+                        "value": json.loads(value), "raw": line_text.split(":", 1)[1].strip(),
+                        "line": line, "line_text": line_text}
+        return None
+
+    def close(self):
+        self.conn.close()
+
+
+def _is_field_source(p):
+    # text documents only: PDFs are prose, expected_*.json is the ground truth
+    return p.suffix.lower() == ".txt" and not p.name.startswith("expected_")
+
+
+def build_field_index(data_folder=DATA_DIR, store_dir=DEFAULT_STORE_DIR):
+    """Extract fields from new/changed text docs into <store_dir>/field_index.sqlite; drop removed docs."""
+    index = FieldIndex(Path(store_dir) / DB_NAME)
+    try:
+        known = index.doc_hashes()
+        current = {}
+        n_fields = updated = 0
+        for p in list_source_files(data_folder):
+            if not _is_field_source(p):
+                continue
+            sha = file_sha256(p)
+            current[p.name] = sha
+            if known.get(p.name) == sha:
+                continue
+            try:
+                n_fields += index.put_document(p.name, p.read_text(encoding="utf-8"), sha)
+                updated += 1
+            except Exception as e:
+                print(f"[WARN] Field extraction failed for {p.name}:", e)
+        for doc_id in set(known) - set(current):
+            index.remove_document(doc_id)
+        print(f"[INFO] Field index: {updated} docs (re)extracted, {n_fields} fields, "
+              f"{len(set(known) - set(current))} removed → {index.path}")
+    finally:
+        index.close()
+
+
+def open_field_index(store_dir=DEFAULT_STORE_DIR):
+    """FieldIndex next to a Chroma store, or None if it has not been built."""
+    path = Path(store_dir) / DB_NAME
+    if not path.exists():
+        return None
+    try:
+        return FieldIndex(path)
+    except Exception as e:
+        print("[WARN] Failed to open field index:", e)
+        return None
+
+
+def _values_match(expected, got):
+    if isinstance(expected, (int, float)) and isinstance(got, (int, float)):
+        return abs(expected - got) < 1e-6
+    return str(expected).strip().lower() == str(got).strip().lower()
+
+
+def evaluate(index, data_folder=DATA_DIR):
+    """
+    Score the index against data/expected_*.json: field extraction accuracy and
+    lookup accuracy for "What is the <field> for <identifier>?" questions.
+    """
+    fields_ok = fields_total = lookups_ok = lookups_total = 0
+    for exp_path in sorted(Path(data_folder).glob("expected_*.json")):
+        expected = json.loads(exp_path.read_text(encoding="utf-8"))
+        got = index.document(expected["doc_id"]) or {}
+        misses = []
+        for field, value in expected.items():
+            fields_total += 1
+            if field in got and _values_match(value, got[field]):
+                fields_ok += 1
+            else:
+                misses.append(f"{field}: expected {value!r}, got {got.get(field)!r}")
+        identifiers = [v for v in expected.values() if isinstance(v, str) and IDENTIFIER_RE.fullmatch(v)]
+        for identifier in identifiers:
+            for field, value in expected.items():
+                if field in ("doc_id", "type", "currency") or value == identifier:
+                    continue
+                lookups_total += 1
+                hit = index.lookup(f"What is the {field.replace('_', ' ')} for {identifier}?")
+                if hit and hit["doc_id"] == expected["doc_id"] and _values_match(value, hit["value"]):
+                    lookups_ok += 1
+                else:
+                    misses.append(f"lookup {field} for {identifier}: got {hit and hit['value']!r}")
+        status = "OK  " if not misses else "MISS"
+        print(f"{status} {expected['doc_id']}" + "".join(f"\n       - {m}" for m in misses))
+    print(f"\nField extraction accuracy: {fields_ok}/{fields_total} = {fields_ok / max(fields_total, 1):.3f}")
+    if lookups_total:
+        print(f"Identifier lookup accuracy: {lookups_ok}/{lookups_total} = {lookups_ok / lookups_total:.3f}")
+    return fields_ok, fields_total, lookups_ok, lookups_total
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Build / evaluate the structured-field index.")
+    ap.add_argument("--data", default=str(DATA_DIR))
+    ap.add_argument("--store", default=str(DEFAULT_STORE_DIR), help="Chroma store directory the index sits next to")
+    ap.add_argument("--build", action="store_true", help="Extract fields from --data first")
+    ap.add_argument("--eval", action="store_true", help="Score against data/expected_*.json")
+    args = ap.parse_args()
+
+    if args.build:
+        build_field_index(args.data, args.store)
+    if args.eval:
+        idx = open_field_index(args.store)
+        if idx is None:
+            print("[ERROR] No field index; run with --build")
+            sys.exit(1)
+        ok, total, _, _ = evaluate(idx, args.data)
+        sys.exit(0 if ok == total else 1)
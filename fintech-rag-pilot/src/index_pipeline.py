@@ -0,0 +1,143 @@
+# src/index_pipeline.py
+"""
+Helpers for the build_chroma indexing loop:
+  - length_bucketed_batches: sort a bounded window of chunks by length before
+    cutting batches, so short and long chunks are not padded together
+  - AdaptiveBatchSize: hill-climbs the batch size from observed encode throughput
+  - PipelinedWriter: runs the Chroma upsert of batch N on a background thread
+    while batch N+1 is being encoded
+"""
+import time
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+
+MIN_BATCH = 16
+MAX_BATCH = 1024
+WINDOW_BATCHES = 8  # chunks read ahead for sorting = WINDOW_BATCHES * batch size
+
+
+class FixedBatchSize:
+    def __init__(self, size):
+        self.size = size
+
+    def observe(self, n, seconds):
+        return self.size
+
+
+class AdaptiveBatchSize:
+    """
+    Grow the batch size while chunks/s keeps improving, then settle on the
+    best size seen. Re-probes if throughput later falls well below the best.
+    """
+
+    def __init__(self, initial=128, min_size=MIN_BATCH, max_size=MAX_BATCH, step=1.5, tolerance=0.05):
+        self.size = initial
+        self.min_size = min_size
+        self.max_size = max_size
+        self.step = step
+        self.tolerance = tolerance
+        self.best_rate = 0.0
+        self.best_size = initial
+        self.settled = False
+
+    def _clamp(self, n):
+        return int(max(self.min_size, min(self.max_size, n)))
+
+    def observe(self, n, seconds):
+        if n < self.size or seconds <= 0:
+            # partial (last) batch or cache-only batch: not a useful sample
+            return self.size
+        rate = n / seconds
+        if self.settled:
+            if rate < self.best_rate * 0.7:
+                print(f"[INFO] Throughput dropped to {rate:.0f} chunks/s; re-tuning batch size")
+                self.settled = False
+                self.best_rate = rate
+            return self.size
+        if rate > self.best_rate * (1 + self.tolerance):
+            self.best_rate = rate
+            self.best_size = self.size
+            grown = self._clamp(self.size * self.step)
+            if grown == self.size:
+                self.settled = True
+            self.size = grown
+        else:
+            self.size = self.best_size
+            self.settled = True
+            print(f"[INFO] Batch size settled at {self.size} ({self.best_rate:.0f} chunks/s)")
+        return self.size
+
+
+def length_bucketed_batches(docs, sizer, window_batches=WINDOW_BATCHES, bucket=True):
+    """
+    Yield batches of chunks. With bucket=True a window of chunks is read ahead
+    and sorted by text length before being cut, which keeps memory bounded
+    while cutting padding waste. Batch size is read from sizer.size each time.
+    """
+    it = iter(docs)
+    while True:
+        size = sizer.size
+        window = list(islice(it, size * (window_batches if bucket else 1)))
+        if not window:
+            return
+        if bucket:
+            window.sort(key=lambda d: len(d["text"]))
+        i = 0
+        while i < len(window):
+            size = sizer.size
+            yield window[i:i + size]
+            i += size
+
+
+class PaddingStats:
+    """Share of padded positions (in characters, as a proxy for tokens)."""
+
+    def __init__(self):
+        self.padded = 0
+        self.total = 0
+
+    def add(self, texts):
+        if not texts:
+            return
+        lengths = [len(t) for t in texts]
+        self.padded += max(lengths) * len(lengths)
+        self.total += sum(lengths)
+
+    @property
+    def waste(self):
+        return 1 - self.total / self.padded if self.padded else 0.0
+
+
+class PipelinedWriter:
+    """Single background writer thread; at most one write in flight."""
+
+    def __init__(self, write_fn, enabled=True):
+        self.write_fn = write_fn
+        self.enabled = enabled
+        self.pool = ThreadPoolExecutor(max_workers=1) if enabled else None
+        self.pending = None
+        self.write_seconds = 0.0
+
+    def _timed_write(self, *args):
+        t0 = time.perf_counter()
+        self.write_fn(*args)
+        self.write_seconds += time.perf_counter() - t0
+
+    def submit(self, *args):
+        self.wait()
+        if self.enabled:
+            self.pending = self.pool.submit(self._timed_write, *args)
+        else:
+            self._timed_write(*args)
+
+    def wait(self):
+        if self.pending is not None:
+            pending, self.pending = self.pending, None
+            pending.result()  # re-raise write errors in the caller
+
+    def close(self):
+        try:
+            self.wait()
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown(wait=True)
@@ -0,0 +1,231 @@
+# src/index_versions.py
+"""
+Blue/green index builds.
+
+A versioned store root holds complete, independent stores side by side and a
+one-line CURRENT file naming the one being served:
+
+    <root>/versions/v20251016-120000-123456/   chroma + manifest + BM25 + metadata/field indexes
+    <root>/versions/v20251017-090000-654321/
+    <root>/CURRENT                             "v20251017-090000-654321"
+
+A build writes into a fresh version directory (optionally seeded with a copy
+of the current one, for incremental builds), is validated against its index
+manifest, and only then published by atomically replacing CURRENT. Serving
+processes (vectorstore.StoreRegistry) notice the new pointer, warm the new
+version in the background and swap to it; the old version is released after
+a grace period. The newest RAG_KEEP_VERSIONS versions are kept for rollback;
+older ones are deleted only once they have been out of service for
+RAG_PRUNE_GRACE_S (by default the serving poll interval + retire grace + a
+minute for warming), so no replica still has them open.
+
+    python src/index_versions.py <root> [--prune]    list versions / prune now
+
+A root without CURRENT is a plain single store, as before.
+"""
+import os
+import json
+import time
+import shutil
+from pathlib import Path
+from datetime import datetime, timezone
+import numpy as np
+
+VERSIONS_DIRNAME = "versions"
+CURRENT_FILE = "CURRENT"
+RETIRED_FILE = "RETIRED"
+KEEP_VERSIONS = int(os.environ.get("RAG_KEEP_VERSIONS", "2"))
+# must cover vectorstore's RAG_VERSION_CHECK_S + RAG_RETIRE_GRACE_S + time to warm a version
+PRUNE_GRACE_S = float(os.environ.get(
+    "RAG_PRUNE_GRACE_S",
+    float(os.environ.get("RAG_VERSION_CHECK_S", "2")) + float(os.environ.get("RAG_RETIRE_GRACE_S", "30")) + 60,
+))
+
+
+def current_version(root):
+    """Name of the published version under root, or None for a plain store."""
+    try:
+        with open(Path(root) / CURRENT_FILE, "r", encoding="utf-8") as f:
+            name = f.read().strip()
+    except OSError:
+        return None
+    return name or None
+
+
+def resolve_store_dir(root):
+    """Directory holding the store to serve: the current version, or root itself."""
+    name = current_version(root)
+    return Path(root) / VERSIONS_DIRNAME / name if name else Path(root)
+
+
+def new_version_dir(root, copy_current=False):
+    """
+    Create an empty version directory for the next build. copy_current seeds it
+    with the published store (plain or versioned) so an incremental build only
+    applies the changes.
+    """
+    root = Path(root)
+    name = "v" + datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S-%f")
+    target = root / VERSIONS_DIRNAME / name
+    source = resolve_store_dir(root)
+    if copy_current and (source / "index_manifest.json").exists():
+        # a plain store's root also contains versions/; never copy that into itself
+        shutil.copytree(source, target, ignore=shutil.ignore_patterns(VERSIONS_DIRNAME, CURRENT_FILE, RETIRED_FILE, "*.tmp", "*.old"))
+        print(f"[INFO] New index version {name} (seeded from {source})")
+    else:
+        target.mkdir(parents=True)
+        print(f"[INFO] New index version {name}")
+    return target
+
+
+def validate_version(store_dir, collection_name):
+    """
+    Problems found in a built version (empty list = OK to publish): the manifest
+    must exist and match the collection, and every index built next to it must
+    cover exactly the vectors the collection holds.
+    """
+    from vector_backends import DEFAULT_VECTOR_BACKEND, open_collection
+    from bm25_index import open_bm25_index
+    from metadata_index import open_metadata_index
+    from vector_snapshot import SNAPSHOT_DIRNAME, open_snapshot
+
+    store_dir = Path(store_dir)
+    path = store_dir / "index_manifest.json"
+    if not path.exists():
+        return [f"no index manifest in {store_dir}"]
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("collection") != collection_name:
+        return [f"manifest is for collection '{manifest.get('collection')}', expected '{collection_name}'"]
+
+    problems = []
+    expected = manifest.get("num_vectors", 0)
+    layout = manifest.get("shards")
+    if layout:
+        # sharded store: every built shard is a store of its own
+        shards = sorted(p for p in store_dir.glob("shard-*") if (p / "index_manifest.json").exists())
+        total = 0
+        for shard in shards:
+            problems += [f"{shard.name}: {p}" for p in validate_version(shard, collection_name)]
+            with open(shard / "index_manifest.json", "r", encoding="utf-8") as f:
+                total += json.load(f).get("num_vectors", 0)
+        if not shards:
+            problems.append("no shard was built")
+        if total != expected:
+            problems.append(f"shards hold {total} vectors, manifest lists {expected}")
+        return problems
+    try:
+        collection = open_collection(manifest.get("vector_backend", DEFAULT_VECTOR_BACKEND), store_dir, collection_name)
+        count = collection.count()
+        if count != expected:
+            problems.append(f"collection holds {count} vectors, manifest lists {expected}")
+        if count:
+            # the store must answer queries: a stored vector finds itself (or an identical one)
+            probe = collection.get(limit=1, include=["embeddings"])
+            vec = np.asarray(probe["embeddings"][0], dtype=np.float32)
+            resp = collection.query(query_embeddings=[vec.tolist()], n_results=1, include=["distances"])
+            if not resp["ids"][0] or resp["distances"][0][0] > 1e-3 * max(1.0, float(vec @ vec)):
+                problems.append("query for a stored vector does not return it")
+    except Exception as e:
+        problems.append(f"collection failed to open/query: {e}")
+
+    bm25 = open_bm25_index(store_dir)
+    if bm25 is None or len(bm25.chunk_ids) != expected:
+        problems.append("BM25 index missing or out of sync")
+    meta_index = open_metadata_index(store_dir)
+    if meta_index is None or len(meta_index) != expected:
+        problems.append("metadata index missing or out of sync")
+    if (store_dir / SNAPSHOT_DIRNAME).exists():
+        snap = open_snapshot(store_dir, manifest.get("indexed_at"))
+        if snap is None or snap.count() != expected:
+            problems.append("vector snapshot out of sync")
+    return problems
+
+
+def activate_version(root, name):
+    """Atomically point CURRENT at version name (readers see the old or the new name, never a partial one)."""
+    root = Path(root)
+    previous = current_version(root)
+    # a rolled-back-to version is in service again
+    (root / VERSIONS_DIRNAME / name / RETIRED_FILE).unlink(missing_ok=True)
+    tmp = root / (CURRENT_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(name + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, root / CURRENT_FILE)
+    if previous and previous != name and (root / VERSIONS_DIRNAME / previous).is_dir():
+        # when the previous version went out of service (prune_versions waits out the grace period)
+        with open(root / VERSIONS_DIRNAME / previous / RETIRED_FILE, "w", encoding="utf-8") as f:
+            f.write(datetime.now(timezone.utc).isoformat() + "\n")
+    print(f"[INFO] CURRENT → {name}")
+
+
+def list_versions(root):
+    base = Path(root) / VERSIONS_DIRNAME
+    return sorted(p.name for p in base.iterdir() if p.is_dir()) if base.exists() else []
+
+
+def retired_at(root, name):
+    """
+    When version name went out of service: its RETIRED marker, else (older
+    stores, builds never published) the last CURRENT swap, which is no earlier.
+    """
+    for path in (Path(root) / VERSIONS_DIRNAME / name / RETIRED_FILE, Path(root) / CURRENT_FILE):
+        try:
+            return path.stat().st_mtime
+        except OSError:
+            continue
+    return time.time()
+
+
+def prune_versions(root, keep=KEEP_VERSIONS, grace_s=PRUNE_GRACE_S):
+    """
+    Delete versions older than the current one beyond the newest keep (current
+    included), once they have been out of service for grace_s, so a replica
+    that has not switched yet never loses files it has open (later publishes
+    or --prune pick up the rest). Newer unpublished versions (a build in
+    progress, a failed build) are left alone.
+    """
+    current = current_version(root)
+    versions = list_versions(root)
+    if current not in versions:
+        return []
+    older = versions[:versions.index(current)]
+    candidates = older[:max(0, len(older) - (max(1, keep) - 1))]
+    now = time.time()
+    removed = [name for name in candidates if now - retired_at(root, name) >= grace_s]
+    for name in removed:
+        shutil.rmtree(Path(root) / VERSIONS_DIRNAME / name, ignore_errors=True)
+    if removed:
+        print(f"[INFO] Pruned old index versions: {', '.join(removed)}")
+    if len(removed) < len(candidates):
+        print(f"[INFO] {len(candidates) - len(removed)} old version(s) kept until they have been "
+              f"out of service for {grace_s:.0f}s")
+    return removed
+
+
+def publish_version(root, store_dir, collection_name, keep=KEEP_VERSIONS):
+    """Validate a finished build and make it current. Returns False (CURRENT untouched) if it fails validation."""
+    problems = validate_version(store_dir, collection_name)
+    if problems:
+        for p in problems:
+            print(f"[ERROR] Version {Path(store_dir).name} not published: {p}")
+        return False
+    activate_version(root, Path(store_dir).name)
+    prune_versions(root, keep)
+    return True
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="List or prune the index versions under a versioned store root.")
+    ap.add_argument("root", help="Versioned store root (the --persist directory)")
+    ap.add_argument("--prune", action="store_true", help="Delete old versions whose grace period has passed")
+    ap.add_argument("--keep", type=int, default=KEEP_VERSIONS)
+    args = ap.parse_args()
+    if args.prune:
+        prune_versions(args.root, args.keep)
+    current = current_version(args.root)
+    for name in list_versions(args.root):
+        print(("* " if name == current else "  ") + name)
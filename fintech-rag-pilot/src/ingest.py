@@ -1,14 +1,25 @@
 # src/ingest.py
 import os
+import time
+import argparse
+import hashlib
+from collections import deque
 from pathlib import Path
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from concurrent.futures import ProcessPoolExecutor
 from pypdf import PdfReader
 import json
 
+from chunker import OffsetTextSplitter, SourceDoc, token_length_function
+from chunk_store import ChunkRecord, ChunkStore, write_chunk_store, DEFAULT_STORE_DIR
+
 
 ROOT_DIR = Path(__file__).resolve().parents[1]
 DATA_DIR = ROOT_DIR / "data"
 
+# PDFs with more pages than this are split into page ranges so that one
+# large document can be extracted by several worker processes at once.
+PDF_PAGES_PER_TASK = 16
+
 def pdf_to_text(path):
     txt = []
     reader = PdfReader(path)
@@ -18,42 +29,205 @@ def pdf_to_text(path):
             txt.append(page_text)
     return "\n".join(txt)
 
-def ingest_folder(folder='data', chunk_size=800, chunk_overlap=200):
-    docs = []
-    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+def pdf_page_count(path):
+    return len(PdfReader(path).pages)
+
+def _extract_pdf_pages(path, start, stop=None):
+    """
+    Worker task: extract pages [start, stop) of a PDF.
+    Returns ([(page number, text)] for non-empty pages, elapsed seconds).
+    """
+    t0 = time.perf_counter()
+    reader = PdfReader(path)
+    stop = len(reader.pages) if stop is None else stop
+    pages = []
+    for i in range(start, stop):
+        page_text = reader.pages[i].extract_text() or ""
+        if page_text:
+            pages.append((i + 1, page_text))
+    return pages, time.perf_counter() - t0
+
+def _join_pages(pages):
+    """Join page texts like pdf_to_text and return (text, [(offset, page number)])."""
+    offsets, pos = [], 0
+    for num, page_text in pages:
+        offsets.append((pos, num))
+        pos += len(page_text) + 1
+    return "\n".join(t for _, t in pages), offsets
+
+def _read_text_file(path):
+    """
+    Worker task: read a text file as UTF-8.
+    Returns (text or None, elapsed seconds, error message or None).
+    """
+    t0 = time.perf_counter()
+    try:
+        text = Path(path).read_text(encoding='utf-8')
+    except Exception as e:
+        return None, time.perf_counter() - t0, str(e)
+    return text, time.perf_counter() - t0, None
+
+def list_source_files(folder):
+    """Files under folder in a stable (sorted) order so chunk order is deterministic."""
+    return sorted(p for p in Path(folder).rglob('*.*') if p.is_file())
+
+def file_sha256(path):
+    """Content hash of a source file (used by incremental re-indexing)."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def _chunk_records(p, text, splitter, pages=None):
+    doc = SourceDoc(p.name, text, pages)
+    content_hash = file_sha256(p)
+    records = []
+    file_type = p.suffix.lower().replace('.', '')
+    source = "external" if "external_pdfs" in str(p.parent) else "internal"
+    for i, c in enumerate(splitter.split_doc(doc)):
+        records.append(ChunkRecord(
+            doc_id=p.name,
+            chunk_id=f"{p.name}_{i}",
+            file_type=file_type,
+            source=source,
+            content_hash=content_hash,
+            start=c.start,
+            end=c.end,
+            page=c.page,
+            text=c.text,
+        ))
+    return records
 
-    for p in Path(folder).rglob('*.*'):  # recursive search
+def _extract_serial(paths):
+    """Yield (path, text, elapsed seconds, page offsets) one file at a time in the current process."""
+    for p in paths:
+        t0 = time.perf_counter()
+        pages = None
         if p.suffix.lower() == '.pdf':
-            text = pdf_to_text(p)
+            text, pages = _join_pages(_extract_pdf_pages(p, 0)[0])
         else:
-            try:
-                text = p.read_text(encoding='utf-8')
-            except Exception as e:
-                print(f"[ERROR] Cannot read {p}: {e}")
+            text, _, err = _read_text_file(p)
+            if err is not None:
+                print(f"[ERROR] Cannot read {p}: {err}")
                 continue
+        yield p, text, time.perf_counter() - t0, pages
+
+def _extract_parallel(paths, workers, pdf_pages_per_task=PDF_PAGES_PER_TASK, max_inflight=None):
+    """
+    Yield (path, text, elapsed seconds, page offsets) in the same order as paths, extracting
+    files (and page ranges of large PDFs) across a process pool.
+    Elapsed is the summed worker time spent on the file.
+    At most max_inflight files are submitted ahead of the consumer so memory
+    stays bounded when the caller streams.
+    """
+    max_inflight = max_inflight or workers * 4
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        def submit(p):
+            if p.suffix.lower() == '.pdf':
+                try:
+                    n_pages = pdf_page_count(p)
+                except Exception as e:
+                    print(f"[ERROR] Cannot open PDF {p}: {e}")
+                    return None
+                step = max(1, pdf_pages_per_task)
+                futures = [pool.submit(_extract_pdf_pages, str(p), s, min(s + step, n_pages))
+                           for s in range(0, n_pages, step)]
+                return p, 'pdf', futures
+            return p, 'text', [pool.submit(_read_text_file, str(p))]
+
+        pending = deque()
+        remaining = iter(paths)
+        while True:
+            while len(pending) < max_inflight:
+                p = next(remaining, None)
+                if p is None:
+                    break
+                job = submit(p)
+                if job is not None:
+                    pending.append(job)
+            if not pending:
+                break
+
+            # collect in submission order -> deterministic output regardless of completion order
+            p, kind, futures = pending.popleft()
+            pages = None
+            if kind == 'pdf':
+                page_texts, elapsed = [], 0.0
+                for f in futures:
+                    texts, dt = f.result()
+                    page_texts.extend(texts)
+                    elapsed += dt
+                text, pages = _join_pages(page_texts)
+            else:
+                text, elapsed, err = futures[0].result()
+                if err is not None:
+                    print(f"[ERROR] Cannot read {p}: {err}")
+                    continue
+            yield p, text, elapsed, pages
+
+def make_splitter(chunk_size=800, chunk_overlap=200, length_unit="chars"):
+    """Offset-based splitter; length_unit="tokens" sizes chunks in model tokens instead of characters."""
+    length_function = token_length_function() if length_unit == "tokens" else None
+    return OffsetTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=length_function)
+
+def iter_chunks(folder='data', chunk_size=800, chunk_overlap=200, workers=None, report_timings=True, paths=None,
+                length_unit="chars"):
+    """
+    Lazily yield chunk dicts file by file (read -> split), so callers can
+    stream them into the index without holding the whole corpus in memory.
+    workers > 1 extracts files (and page ranges of large PDFs) in a process pool;
+    output order and chunk ids are identical to the serial path.
+    paths restricts ingestion to a subset of files (e.g. only changed ones).
+    Chunks are slotted ChunkRecords (dict-style access) carrying their start/end
+    offsets in the extracted text (and page for PDFs).
+    """
+    splitter = make_splitter(chunk_size, chunk_overlap, length_unit)
+    paths = list_source_files(folder) if paths is None else sorted(Path(p) for p in paths)
+
+    t_start = time.perf_counter()
+    n_chunks = 0
+    if workers and workers > 1:
+        extracted = _extract_parallel(paths, workers)
+    else:
+        extracted = _extract_serial(paths)
+
+    for p, text, elapsed, pages in extracted:
+        if report_timings:
+            print(f"[TIME] {p.name}: extracted in {elapsed:.3f}s")
 
         if not text.strip():
             print(f"[WARN] Empty text from {p}")
             continue
 
-        chunks = splitter.split_text(text)
-        for i, c in enumerate(chunks):
-            docs.append({
-                'doc_id': p.name,
-                'chunk_id': f"{p.name}_{i}",
-                'file_type': p.suffix.lower().replace('.', ''),
-                'source': "external" if "external_pdfs" in str(p.parent) else "internal",
-                'text': c
-            })
+        for record in _chunk_records(p, text, splitter, pages):
+            n_chunks += 1
+            yield record
+
+    mode = f"{workers} workers" if workers and workers > 1 else "serial"
+    print(f"Ingested {n_chunks} chunks from {folder} in {time.perf_counter() - t_start:.2f}s ({mode})")
 
-    print(f"Ingested {len(docs)} chunks from {folder}")
-    return docs
+def ingest_folder(folder='data', chunk_size=800, chunk_overlap=200, workers=None, report_timings=True,
+                  length_unit="chars"):
+    """Read every file under folder and return the full list of chunk records."""
+    return list(iter_chunks(folder, chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                            workers=workers, report_timings=report_timings, length_unit=length_unit))
 
 
 if __name__ == "__main__":
-    docs = ingest_folder(DATA_DIR)
+    parser = argparse.ArgumentParser(description="Ingest and chunk documents from the data folder.")
+    parser.add_argument("--workers", "-w", type=int, default=os.cpu_count() or 1,
+                        help="Extraction processes (1 = serial)")
+    parser.add_argument("--length-unit", choices=["chars", "tokens"], default="chars",
+                        help="Measure chunk_size/overlap in characters or model tokens")
+    parser.add_argument("--store", type=str, default=str(DEFAULT_STORE_DIR),
+                        help="Columnar chunk store to write (read back memory-mapped by indexing/verifier)")
+    args = parser.parse_args()
+
+    # stream straight into the columnar store; nothing is held as a list
+    n = write_chunk_store(iter_chunks(DATA_DIR, workers=args.workers, length_unit=args.length_unit), args.store)
+    store = ChunkStore(args.store)
     output_file = DATA_DIR / "chunks_preview.json"
     with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(docs[:5], f, indent=2, ensure_ascii=False)
-    print(f"Ingested {len(docs)} chunks. Sample saved to {output_file}")
-
+        json.dump([store[i].to_dict() for i in range(min(5, len(store)))], f, indent=2, ensure_ascii=False)
+    print(f"Ingested {n} chunks into {args.store}. Sample saved to {output_file}")
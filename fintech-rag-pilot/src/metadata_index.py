@@ -0,0 +1,197 @@
+# src/metadata_index.py
+"""
+Local index of the filterable chunk metadata (doc_id, file_type, source),
+built next to a Chroma store at index time.
+
+MetadataIndex.match(where) evaluates a Chroma-style where filter on these
+columns without touching Chroma, so retrieval can see how selective a filter
+is and, for small candidate sets (one document, one file type), search the
+candidates exactly instead of running a filtered ANN query.
+
+Supported: {"field": value}, {"field": {"$eq" | "$ne" | "$in" | "$nin": ...}},
+"$and" / "$or" lists. Anything else returns None (caller pushes the filter
+down to Chroma unchanged).
+
+With dedup, a document's near-duplicate chunks are not stored; their
+representative (another document's chunk) lists the document in
+duplicate_doc_ids. doc_id $eq/$in matches include those representatives,
+so filtering on a document still finds its content. Filters this index
+cannot evaluate go to Chroma, which only sees each chunk's own doc_id.
+
+Layout of <persist_dir>/metadata_index/:
+    <field>.npy   int32 [n] index into dicts.json[field]
+    dicts.json    chunk_ids + per-field value tables + doc_aliases
+                  ({doc_id: rows of representatives standing in for it})
+"""
+import json
+import shutil
+from pathlib import Path
+from datetime import datetime, timezone
+import numpy as np
+
+INDEX_DIRNAME = "metadata_index"
+INDEXED_FIELDS = ("doc_id", "file_type", "source")
+
+
+_COMPARE = {
+    "$eq": lambda v, a: v == a,
+    "$ne": lambda v, a: v != a,
+    "$gt": lambda v, a: v is not None and v > a,
+    "$gte": lambda v, a: v is not None and v >= a,
+    "$lt": lambda v, a: v is not None and v < a,
+    "$lte": lambda v, a: v is not None and v <= a,
+    "$in": lambda v, a: v in a,
+    "$nin": lambda v, a: v not in a,
+}
+
+
+def where_matches(meta, where):
+    """Evaluate a Chroma where filter against one metadata dict (for in-process backends)."""
+    if not where:
+        return True
+    meta = meta or {}
+    for key, cond in where.items():
+        if key == "$and":
+            ok = all(where_matches(meta, w) for w in cond)
+        elif key == "$or":
+            ok = any(where_matches(meta, w) for w in cond)
+        elif isinstance(cond, dict):
+            ok = all(_COMPARE[op](meta.get(key), arg) for op, arg in cond.items())
+        else:
+            ok = meta.get(key) == cond
+        if not ok:
+            return False
+    return True
+
+
+def build_metadata_index_from_collection(collection, persist_directory, page_size=1000):
+    """(Re)build the metadata index from every chunk currently in the Chroma collection."""
+    chunk_ids = []
+    tables = {f: {} for f in INDEXED_FIELDS}
+    codes = {f: [] for f in INDEXED_FIELDS}
+    aliases = {}
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        ids = page.get("ids") or []
+        if not ids:
+            break
+        for cid, meta in zip(ids, page.get("metadatas") or []):
+            meta = meta or {}
+            chunk_ids.append(cid)
+            for f in INDEXED_FIELDS:
+                value = meta.get(f, "")
+                codes[f].append(tables[f].setdefault(value, len(tables[f])))
+            for doc_id in filter(None, (meta.get("duplicate_doc_ids") or "").split(",")):
+                aliases.setdefault(doc_id, []).append(len(chunk_ids) - 1)
+        offset += len(ids)
+
+    path = Path(persist_directory) / INDEX_DIRNAME
+    shutil.rmtree(path, ignore_errors=True)
+    path.mkdir(parents=True)
+    for f in INDEXED_FIELDS:
+        np.save(path / f"{f}.npy", np.asarray(codes[f], dtype=np.int32))
+    dicts = {f: list(tables[f]) for f in INDEXED_FIELDS}
+    dicts["chunk_ids"] = chunk_ids
+    dicts["doc_aliases"] = aliases
+    dicts["built_at"] = datetime.now(timezone.utc).isoformat()
+    with open(path / "dicts.json", "w", encoding="utf-8") as fh:
+        json.dump(dicts, fh, ensure_ascii=False)
+    print(f"[INFO] Metadata index: {len(chunk_ids)} chunks → {path}")
+    return len(chunk_ids)
+
+
+class MetadataIndex:
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / "dicts.json", "r", encoding="utf-8") as f:
+            dicts = json.load(f)
+        self.chunk_ids = dicts["chunk_ids"]
+        self.lookup = {f: {v: i for i, v in enumerate(dicts[f])} for f in INDEXED_FIELDS}
+        self.codes = {f: np.load(self.path / f"{f}.npy", mmap_mode="r") for f in INDEXED_FIELDS}
+        self.aliases = dicts.get("doc_aliases", {})
+
+    def __len__(self):
+        return len(self.chunk_ids)
+
+    def _field_mask(self, field, cond):
+        if isinstance(cond, dict):
+            if len(cond) != 1:
+                return None
+            (op, value), = cond.items()
+        else:
+            op, value = "$eq", cond
+        table, codes = self.lookup[field], self.codes[field]
+        if op in ("$eq", "$ne"):
+            code = table.get(value)
+            mask = codes == code if code is not None else np.zeros(len(codes), dtype=bool)
+            if op == "$ne":
+                return ~mask
+            return self._with_aliases(mask, [value]) if field == "doc_id" else mask
+        if op in ("$in", "$nin"):
+            mask = np.isin(codes, [table[v] for v in value if v in table])
+            if op == "$nin":
+                return ~mask
+            return self._with_aliases(mask, value) if field == "doc_id" else mask
+        return None
+
+    def _with_aliases(self, mask, doc_ids):
+        """Add the representatives standing in for these documents' collapsed chunks."""
+        rows = [r for d in doc_ids for r in self.aliases.get(d, ())]
+        if rows:
+            mask = mask.copy()
+            mask[rows] = True
+        return mask
+
+    def aliased(self, where):
+        """True if where selects a document by doc_id that has chunks collapsed onto other documents."""
+        if not isinstance(where, dict):
+            return False
+        for key, cond in where.items():
+            if key in ("$and", "$or"):
+                if any(self.aliased(w) for w in cond):
+                    return True
+            elif key == "doc_id":
+                values = cond.get("$eq", cond.get("$in", [])) if isinstance(cond, dict) else cond
+                values = values if isinstance(values, list) else [values]
+                if any(v in self.aliases for v in values):
+                    return True
+        return False
+
+    def _mask(self, where):
+        if not isinstance(where, dict) or not where:
+            return None
+        masks = []
+        for key, cond in where.items():
+            if key in ("$and", "$or"):
+                subs = [self._mask(w) for w in cond]
+                if not subs or any(m is None for m in subs):
+                    return None
+                m = np.logical_and.reduce(subs) if key == "$and" else np.logical_or.reduce(subs)
+            elif key in self.lookup:
+                m = self._field_mask(key, cond)
+                if m is None:
+                    return None
+            else:
+                return None
+            masks.append(m)
+        return np.logical_and.reduce(masks)
+
+    def match(self, where):
+        """Chunk ids matching where, or None if the filter uses fields/operators not indexed here."""
+        mask = self._mask(where)
+        if mask is None:
+            return None
+        return [self.chunk_ids[i] for i in np.flatnonzero(mask)]
+
+
+def open_metadata_index(persist_directory):
+    """MetadataIndex stored next to a Chroma store, or None if it has not been built."""
+    path = Path(persist_directory) / INDEX_DIRNAME
+    if not (path / "dicts.json").exists():
+        return None
+    try:
+        return MetadataIndex(path)
+    except Exception as e:
+        print("[WARN] Failed to open metadata index:", e)
+        return None
@@ -5,7 +5,11 @@ import textwrap
 import json
 import hashlib
 from dotenv import load_dotenv
-from vectorstore import retrieve
+from vectorstore import retrieve_fanout, warm_stores, encode_query, index_version, store_dir
+from reranker import RERANK_ENABLED, RERANK_CANDIDATES, get_reranker
+from answer_cache import SemanticAnswerCache, ANSWER_CACHE_ENABLED
+from field_index import open_field_index
+from evidence import ADAPTIVE_K, adaptive_top_k, budget_evidence
 from datetime import datetime
 
 # classifier must be implemented in src/data_classifier.py
@@ -28,6 +32,27 @@ if USE_OPENAI:
         USE_OPENAI = False
         client = None
 
+# paraphrased GREEN/YELLOW questions are answered from here; RED is never cached
+ANSWER_CACHE = SemanticAnswerCache() if ANSWER_CACHE_ENABLED else None
+
+_INITIALIZED = False
+
+
+def init():
+    """
+    Open + warm the vector stores (and load the reranker) once per process,
+    before the first user query. Called by chat_ui and the CLI, so importing
+    this module stays cheap; without it stores open lazily on first use.
+    """
+    global _INITIALIZED
+    if _INITIALIZED:
+        return
+    _INITIALIZED = True
+    warm_stores()
+    if RERANK_ENABLED:
+        get_reranker()
+
+
 SYSTEM_PROMPT = (
     "You are a domain-expert assistant. Use ONLY the provided evidence chunks to answer the user's question. "
     "Cite which document the answer came from where appropriate. "
@@ -80,11 +105,13 @@ def call_openai_chat(system_prompt, user_prompt, max_tokens=512, temperature=0.0
         # fallback to string if shape differs
         return str(resp)
 
+FALLBACK_PREFIX = "I could not call a generator"
+
 def simple_fallback_answer(retrieved, question):
     evidence = compose_evidence(retrieved)
     excerpt = evidence[:4000]  # keep it reasonably short
     return (
-        "I could not call a generator (no OpenAI key or API failed); here are the top retrieved evidence chunks:\n\n"
+        f"{FALLBACK_PREFIX} (no OpenAI key or API failed); here are the top retrieved evidence chunks:\n\n"
         f"{excerpt}\n\n"
         "If you want a polished answer, set the OPENAI_API_KEY environment variable and re-run."
     )
@@ -126,24 +153,52 @@ def create_human_review_ticket(query: str, label: str, meta: dict):
 # ---------------------------
 # Routing helpers
 # ---------------------------
+def permitted_stores(internal_only=False):
+    """Stores a route may read: public always, the internal store only for internal (YELLOW) queries."""
+    return (True, False) if internal_only else (False,)
+
+def retrieve_evidence(question, k=4, internal_only=False):
+    """
+    Up to k chunks for the prompt from the permitted stores, queried concurrently.
+    With reranking enabled (RAG_RERANK=1) a larger candidate pool is retrieved
+    and a cross-encoder keeps the best k. With RAG_ADAPTIVE_K=1 (opt-in) k is
+    an upper bound: chunks below the relevance floor or past a score elbow are dropped.
+    """
+    stores = permitted_stores(internal_only)
+    reranker = get_reranker() if RERANK_ENABLED else None
+    if reranker is None:
+        retrieved = retrieve_fanout(question, n_results=k, internal=stores)
+        return adaptive_top_k(retrieved) if ADAPTIVE_K else retrieved
+    candidates = retrieve_fanout(question, n_results=max(k, RERANK_CANDIDATES), internal=stores)
+    try:
+        reranked = reranker.rerank(question, candidates, top_n=k)
+        # cross-encoder logits have no fixed scale: elbow only, no floor
+        return adaptive_top_k(reranked, key="rerank_score", min_score=None) if ADAPTIVE_K else reranked
+    except Exception as e:
+        print("[WARN] Reranking failed, using retrieval order:", e)
+        return candidates[:k]
+
 def handle_rag_pipeline(question, k=4, internal_only=False):
     """
     Run retrieval + optional LLM generation.
-    If internal_only=True, you should route to an internal collection only.
-    Current retrieve() implementation uses the default collection; if you have
-    separate collections implement selection inside vectorstore.retrieve.
+    internal_only=True (YELLOW) searches the internal and public stores together;
+    otherwise only the public store is read.
     """
-    retrieved = retrieve(question, n_results=k)
+    retrieved = retrieve_evidence(question, k=k, internal_only=internal_only)
     if not retrieved or len(retrieved) == 0:
         return "No documents found in the index."
 
+    # merge adjacent same-doc chunks; capped only when RAG_EVIDENCE_TOKENS is set
+    retrieved = budget_evidence(retrieved)
+    print(f"[INFO] Evidence: {sum(len(r['chunk_ids']) for r in retrieved)} chunks in {len(retrieved)} sections, "
+          f"~{sum(r['tokens'] for r in retrieved)} tokens")
     evidence_block = compose_evidence(retrieved)
     prompt = ANSWER_TEMPLATE.format(question=question, evidence=evidence_block)
 
     if USE_OPENAI and client is not None:
         try:
             ans = call_openai_chat(SYSTEM_PROMPT, prompt, max_tokens=512, temperature=0.0)
-            docs_list = ", ".join([r.get("metadata", {}).get("doc_id", r.get("id")) for r in retrieved])
+            docs_list = ", ".join(dict.fromkeys(r.get("metadata", {}).get("doc_id", r.get("id")) for r in retrieved))
             tag = "[INTERNAL]" if internal_only else "[PUBLIC]"
             return f"{ans}\n\n{tag} [Retrieved docs: {docs_list}]"
         except Exception as e:
@@ -161,12 +216,80 @@ def answer_query_normal(question, k=4):
 
 def private_rag_answer(question, k=4):
     """
-    Internal-only RAG path. Right now it calls the same retrieve() function.
-    If you want strict separation, implement separate vectorstore collections and
-    update vectorstore.retrieve to accept a 'collection' parameter.
+    Internal RAG path: retrieves from the internal store as well as the public one.
     """
     return handle_rag_pipeline(question, k=k, internal_only=True)
 
+# ---------------------------
+# Exact field lookup
+# ---------------------------
+_FIELD_INDEXES = {}
+
+def field_lookup(question, label):
+    """
+    Answer "<field> of <identifier>" questions (e.g. due date of INV-2025-0815)
+    from the structured-field index of the stores this label may read.
+    Returns the answer text with a citation, or None to fall back to RAG.
+    """
+    for is_internal in permitted_stores(label == "YELLOW"):
+        # keyed by the served build, so a newly published index version is picked up
+        persist_dir = store_dir(is_internal)
+        index = _FIELD_INDEXES.get(persist_dir)
+        if index is None:
+            index = open_field_index(persist_dir)
+            if index is None:
+                continue
+            if len(_FIELD_INDEXES) > 4:
+                _FIELD_INDEXES.clear()  # indexes of replaced versions
+            _FIELD_INDEXES[persist_dir] = index
+        try:
+            hit = index.lookup(question)
+        except Exception as e:
+            print("[WARN] Field lookup failed:", e)
+            continue
+        if hit is not None:
+            return (
+                f"{hit['label']} for {hit['identifier']}: {hit['raw']}\n\n"
+                f"[Source: {hit['doc_id']}, line {hit['line']}: \"{hit['line_text']}\"]\n"
+                f"[Exact field lookup] [Retrieved docs: {hit['doc_id']}]"
+            )
+    return None
+
+# ---------------------------
+# Semantic answer cache
+# ---------------------------
+def _answer_cache_key(question, label, k):
+    """(query vector, index version) for the stores this label reads; k is part of the version."""
+    version = index_version(internal=False)
+    if label == "YELLOW":
+        version += "|" + index_version(internal=True)
+    return encode_query(question), f"{version}|k={k}"
+
+def cached_answer(question, label, k, route):
+    """
+    Answer via route(question) unless a paraphrase with the same label was
+    answered from the same index version. Only generated answers are stored.
+    """
+    if ANSWER_CACHE is None or label == "RED":
+        return route(question)
+    try:
+        vec, version = _answer_cache_key(question, label, k)
+    except Exception as e:
+        print("[WARN] Answer cache unavailable:", e)
+        return route(question)
+    hit = ANSWER_CACHE.get(vec, label, version)
+    if hit is not None:
+        print(f"[INFO] Answer cache hit (similarity={hit['similarity']:.3f})")
+        return hit["answer"]
+    resp = route(question)
+    if not resp.startswith((FALLBACK_PREFIX, "No documents found")):
+        ANSWER_CACHE.put(vec, label, version, question, resp)
+    return resp
+
+def answer_cache_stats():
+    """Hit/miss/eviction counters of the answer cache (None when disabled)."""
+    return ANSWER_CACHE.stats() if ANSWER_CACHE is not None else None
+
 # ---------------------------
 # Main entrypoint with classifier injection
 # ---------------------------
@@ -208,12 +331,19 @@ def answer_query(question, k=4):
                 create_human_review_ticket(question, label, meta)
             except Exception as e:
                 print("[WARN] Failed to schedule human review:", e)
+        # exact identifier lookups never need retrieval or the LLM
+        resp = field_lookup(question, label)
+        if resp is not None:
+            return resp + f"\n\n[⚠️ INTERNAL DATA — label: {label}, confidence={conf:.2f}]"
         # route to internal RAG pipeline (implementation note above)
-        resp = private_rag_answer(question, k=k)
+        resp = cached_answer(question, label, k, lambda q: private_rag_answer(q, k=k))
         return resp + f"\n\n[⚠️ INTERNAL DATA — label: {label}, confidence={conf:.2f}]"
 
     # Handle GREEN: public
-    resp = answer_query_normal(question, k=k)
+    resp = field_lookup(question, label)
+    if resp is not None:
+        return resp + f"\n\n[🟢 PUBLIC DATA — label: {label}, confidence={conf:.2f}]"
+    resp = cached_answer(question, label, k, lambda q: answer_query_normal(q, k=k))
     return resp + f"\n\n[🟢 PUBLIC DATA — label: {label}, confidence={conf:.2f}]"
 
 
@@ -224,5 +354,6 @@ if __name__ == "__main__":
     parser.add_argument("-k", "--topk", type=int, default=4, help="Number of retrieved chunks to use")
     args = parser.parse_args()
 
+    init()
     out = answer_query(args.question, k=args.topk)
     print("\n" + out + "\n")
@@ -0,0 +1,98 @@
+# src/reranker.py
+"""
+Cross-encoder reranking of retrieved candidates.
+
+The retriever fetches a larger candidate pool, the cross-encoder scores the
+(query, chunk) pairs in batches, and only the best few chunks go into the
+prompt. Scores are cached by (query hash, chunk id) so repeated questions do
+not re-score the same chunks; the cache entry also records a checksum of the
+chunk text because chunk ids are reused when a document is re-indexed.
+
+Enable with RAG_RERANK=1 (model: RAG_RERANK_MODEL, pool size: RAG_RERANK_CANDIDATES).
+"""
+import os
+import zlib
+import hashlib
+import threading
+from collections import OrderedDict
+
+from vectorstore import normalize_query
+
+DEFAULT_RERANK_MODEL = os.environ.get("RAG_RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_ENABLED = os.environ.get("RAG_RERANK", "0").strip().lower() in ("1", "true", "yes")
+RERANK_CANDIDATES = int(os.environ.get("RAG_RERANK_CANDIDATES", "20"))
+RERANK_BATCH = 32
+SCORE_CACHE_SIZE = 50000
+
+
+class Reranker:
+    def __init__(self, model_name=DEFAULT_RERANK_MODEL, batch_size=RERANK_BATCH, cache_size=SCORE_CACHE_SIZE):
+        from sentence_transformers import CrossEncoder
+        self.model_name = model_name
+        self.model = CrossEncoder(model_name)
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # (query hash, chunk id) -> (text crc, score)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _query_hash(query):
+        return hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()[:32]
+
+    def score(self, query, results):
+        """Cross-encoder score for each result (higher = more relevant), in input order."""
+        qh = self._query_hash(query)
+        keys = [(qh, r["id"]) for r in results]
+        crcs = [zlib.crc32((r.get("text") or "").encode("utf-8")) for r in results]
+        scores = [None] * len(results)
+        with self._lock:
+            for i, (key, crc) in enumerate(zip(keys, crcs)):
+                cached = self._cache.get(key)
+                if cached is not None and cached[0] == crc:
+                    self._cache.move_to_end(key)
+                    scores[i] = cached[1]
+        todo = [i for i, s in enumerate(scores) if s is None]
+        if todo:
+            pairs = [(query, results[i].get("text") or "") for i in todo]
+            predicted = self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+            with self._lock:
+                for i, s in zip(todo, predicted):
+                    scores[i] = float(s)
+                    self._cache[keys[i]] = (crcs[i], scores[i])
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        with self._lock:
+            self.misses += len(todo)
+            self.hits += len(results) - len(todo)
+        return scores
+
+    def rerank(self, query, results, top_n=4):
+        """Return the top_n results by cross-encoder score, each with a rerank_score."""
+        if not results:
+            return []
+        scores = self.score(query, results)
+        ranked = sorted(zip(scores, range(len(results))), key=lambda x: -x[0])[:top_n]
+        return [dict(results[i], rerank_score=s) for s, i in ranked]
+
+    def stats(self):
+        return {"model": self.model_name, "cached": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+
+_reranker = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker():
+    """Process-wide Reranker (model loaded once), or None if it cannot be loaded."""
+    global _reranker
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None:
+                try:
+                    _reranker = Reranker()
+                except Exception as e:
+                    print(f"[WARN] Failed to load reranker '{DEFAULT_RERANK_MODEL}'; using retrieval order:", e)
+                    _reranker = False
+    return _reranker or None
@@ -0,0 +1,106 @@
+# src/shards.py
+"""
+Sharded stores: one logical store split into independent sub-stores, each
+searched by its own worker process (scatter-gather).
+
+    <root>/index_manifest.json   summary, with "shards": {"count": N, "by": "hash" | "family"}
+    <root>/shard-00/ ...         complete stores (Chroma/in-process collection, manifest, BM25, ...)
+    <root>/field_index.sqlite    exact-lookup index over all documents
+
+Documents are routed by doc_id: "hash" spreads them evenly (crc32 of the
+doc_id), "family" keeps a document family (the doc_id's leading word, e.g.
+payslip_*, invoice_*) on one shard. Chunks of a document never span shards,
+so per-document filters and incremental re-indexing stay shard-local.
+
+ShardPool keeps one single-worker process per shard (spawned, so each has its
+own Chroma client and memory-maps); vectorstore encodes the query once in the
+caller, sends the vector to every shard and merges the per-shard top-k.
+Shards score BM25 with corpus-wide term statistics computed by the caller,
+so sparse/hybrid rankings match an unsharded store.
+Config: RAG_SHARD_TIMEOUT_S (per-shard query timeout).
+"""
+import os
+import re
+import zlib
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+SHARD_STRATEGIES = ("hash", "family")
+SHARD_TIMEOUT_S = float(os.environ.get("RAG_SHARD_TIMEOUT_S", "30"))
+_FAMILY_RE = re.compile(r"[a-z]+")
+
+
+def doc_family(doc_id):
+    """Leading word of a doc_id: "payslip_2025_Aisha_Rao.txt" -> "payslip"."""
+    m = _FAMILY_RE.match(Path(doc_id).stem.lower())
+    return m.group() if m else doc_id
+
+
+def shard_for(doc_id, num_shards, by="hash"):
+    """Shard number of a document (stable across processes and runs)."""
+    key = doc_family(doc_id) if by == "family" else doc_id
+    return zlib.crc32(key.encode("utf-8")) % num_shards
+
+
+def shard_dir(root, i):
+    return Path(root) / f"shard-{i:02d}"
+
+
+def shard_layout(manifest):
+    """{"count", "by"} of a sharded store's manifest, or None for a plain store."""
+    layout = (manifest or {}).get("shards")
+    return layout if layout and layout.get("count", 0) > 0 else None
+
+
+# ---- worker side (runs in the shard processes) ----
+_SHARD = {}
+
+
+def _open_shard(persist_dir, collection_name):
+    """Process initializer: open this worker's shard and touch its indexes."""
+    import vectorstore
+    handle = vectorstore.REGISTRY.get(persist_dir, collection_name)
+    _SHARD["handle"] = handle
+    if handle.count():
+        probe = handle.collection.get(limit=1, include=["embeddings"])
+        handle.collection.query(query_embeddings=[list(map(float, probe["embeddings"][0]))], n_results=1)
+    _ = handle.bm25
+    _ = handle.meta_index
+
+
+def _search_shard(queries, query_vecs, n_results, mode, where, bm25_stats):
+    """(dense, sparse) result lists per query from this worker's shard."""
+    import vectorstore
+    return vectorstore.search_store(_SHARD["handle"], queries, query_vecs, n_results, mode, where, bm25_stats)
+
+
+def _count_shard():
+    return _SHARD["handle"].count()
+
+
+class ShardPool:
+    """One worker process per shard; calls go to every shard in parallel."""
+
+    def __init__(self, shard_dirs, collection_name):
+        ctx = multiprocessing.get_context("spawn")
+        self.shard_dirs = list(shard_dirs)
+        self._pools = [
+            ProcessPoolExecutor(max_workers=1, mp_context=ctx, initializer=_open_shard,
+                                initargs=(str(d), collection_name))
+            for d in self.shard_dirs
+        ]
+
+    def _gather(self, fn, *args):
+        futures = [pool.submit(fn, *args) for pool in self._pools]
+        return [f.result(timeout=SHARD_TIMEOUT_S) for f in futures]
+
+    def search(self, queries, query_vecs, n_results, mode, where, bm25_stats=None):
+        return self._gather(_search_shard, queries, query_vecs, n_results, mode, where, bm25_stats)
+
+    def counts(self):
+        return self._gather(_count_shard)
+
+    def close(self):
+        for pool in self._pools:
+            pool.shutdown(wait=False, cancel_futures=True)
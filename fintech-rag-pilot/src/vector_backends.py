@@ -0,0 +1,318 @@
+# src/vector_backends.py
+"""
+Vector storage engines behind build_chroma / vectorstore.retrieve.
+
+VectorBackend is the collection interface the indexing and retrieval code
+relies on: the subset of the Chroma Collection API it calls (upsert / add /
+update / delete / get / query / count) plus persist(). Chroma collections
+satisfy it as they are; the in-process engines implement it directly:
+
+    chroma  chromadb.PersistentClient collection (default)
+    flat    in-process exact search over all vectors (NumPy)
+    ivfpq   in-process IVF-PQ approximate search (ann_ivfpq), tunable with
+            RAG_IVF_NLIST / RAG_IVF_M (build) and RAG_IVF_NPROBE / RAG_IVF_REFINE (query)
+
+In-process collections live in <persist_dir>/<collection>.<backend>/ and are
+written by persist(). All engines report squared L2 distances.
+"""
+import os
+import json
+import shutil
+from abc import ABC, abstractmethod
+from pathlib import Path
+import numpy as np
+
+from ann_ivfpq import IVFPQIndex, _sq_dists
+from metadata_index import where_matches
+
+VECTOR_BACKENDS = ("chroma", "flat", "ivfpq")
+DEFAULT_VECTOR_BACKEND = "chroma"
+
+
+def _env_int(name):
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+def ivf_build_params():
+    params = {"nlist": _env_int("RAG_IVF_NLIST"), "m": _env_int("RAG_IVF_M")}
+    return {k: v for k, v in params.items() if v is not None}
+
+
+def ivf_query_params():
+    params = {"nprobe": _env_int("RAG_IVF_NPROBE"), "refine": _env_int("RAG_IVF_REFINE")}
+    return {k: v for k, v in params.items() if v is not None}
+
+
+class VectorBackend(ABC):
+    """
+    Collection interface shared by all engines (Chroma collections match it
+    natively). An engine missing a method fails when it is constructed.
+    """
+    name = None
+    metadata = {"hnsw:space": "l2"}
+
+    @abstractmethod
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        """Insert or replace vectors (with optional documents/metadata) by id."""
+
+    def add(self, ids, embeddings, documents=None, metadatas=None):
+        return self.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    @abstractmethod
+    def update(self, ids, metadatas=None, documents=None, embeddings=None):
+        """Change metadata/documents/embeddings of existing ids."""
+
+    @abstractmethod
+    def delete(self, ids=None, where=None):
+        """Remove ids, or every record matching where."""
+
+    @abstractmethod
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("documents", "metadatas")):
+        """Records by ids / where, paged with limit/offset, in Chroma's get() shape."""
+
+    @abstractmethod
+    def query(self, query_embeddings, n_results=10, where=None, include=("documents", "metadatas", "distances")):
+        """Nearest neighbours per query embedding, in Chroma's query() shape (squared L2 distances)."""
+
+    @abstractmethod
+    def count(self):
+        """Number of stored vectors."""
+
+    def persist(self):
+        pass
+
+
+def _query_result(per_query, include):
+    """Chroma-shaped query() result from [(ids, documents, metadatas, distances)] per query."""
+    out = {"ids": [p[0] for p in per_query]}
+    for key, i in (("documents", 1), ("metadatas", 2), ("distances", 3)):
+        out[key] = [p[i] for p in per_query] if key in include else None
+    return out
+
+
+class InProcessCollection(VectorBackend):
+    """
+    Vectors, documents and metadata held in process memory; search is exact
+    ("flat") or IVF-PQ ("ivfpq", index rebuilt lazily after writes).
+    """
+
+    def __init__(self, path, name, index="flat", **params):
+        self.path = Path(path)
+        self.name = name
+        self.index_type = index
+        self.params = params
+        self._ids, self._docs, self._metas = [], [], []
+        self._row = {}
+        self._vecs = np.zeros((0, 0), dtype=np.float32)
+        self._pending = []
+        self._index = None
+        self._sq_norms = None   # |v|^2 per row for exact search
+        if (self.path / "params.json").exists():
+            self._load()
+
+    # ---- storage ----
+    def _vectors(self):
+        if self._pending:
+            parts = ([self._vecs] if len(self._vecs) else []) + self._pending
+            self._vecs = np.ascontiguousarray(np.vstack(parts), dtype=np.float32)
+            self._pending = []
+        return self._vecs
+
+    def _dirty(self):
+        self._index = None
+        self._sq_norms = None
+
+    def _writable(self):
+        vecs = self._vectors()
+        if not vecs.flags.writeable:
+            self._vecs = np.array(vecs)
+        return self._vecs
+
+    def count(self):
+        return len(self._ids)
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        emb = np.asarray(embeddings, dtype=np.float32)
+        documents = documents if documents is not None else [None] * len(ids)
+        metadatas = metadatas if metadatas is not None else [None] * len(ids)
+        new = []
+        for i, cid in enumerate(ids):
+            row = self._row.get(cid)
+            if row is None:
+                self._row[cid] = len(self._ids)
+                self._ids.append(cid)
+                self._docs.append(documents[i])
+                self._metas.append(metadatas[i])
+                new.append(i)
+            else:
+                self._writable()[row] = emb[i]
+                self._docs[row] = documents[i]
+                self._metas[row] = metadatas[i]
+        if new:
+            self._pending.append(emb[new])
+        self._dirty()
+
+    def update(self, ids, metadatas=None, documents=None, embeddings=None):
+        for i, cid in enumerate(ids):
+            row = self._row.get(cid)
+            if row is None:
+                continue
+            if metadatas is not None:
+                self._metas[row] = dict(self._metas[row] or {}, **(metadatas[i] or {}))
+            if documents is not None:
+                self._docs[row] = documents[i]
+            if embeddings is not None:
+                self._writable()[row] = np.asarray(embeddings[i], dtype=np.float32)
+                self._dirty()
+
+    def delete(self, ids=None, where=None):
+        drop = {self._row[c] for c in (ids or []) if c in self._row}
+        if where:
+            drop |= {r for r, m in enumerate(self._metas) if where_matches(m, where)}
+        if not drop:
+            return
+        keep = np.array([r not in drop for r in range(len(self._ids))], dtype=bool)
+        self._vecs = self._vectors()[keep]
+        self._ids = [c for c, k in zip(self._ids, keep) if k]
+        self._docs = [d for d, k in zip(self._docs, keep) if k]
+        self._metas = [m for m, k in zip(self._metas, keep) if k]
+        self._row = {c: i for i, c in enumerate(self._ids)}
+        self._dirty()
+
+    def _rows(self, ids=None, where=None):
+        rows = range(len(self._ids)) if ids is None else [self._row[c] for c in ids if c in self._row]
+        if where:
+            rows = [r for r in rows if where_matches(self._metas[r], where)]
+        return list(rows)
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("documents", "metadatas")):
+        rows = self._rows(ids, where)
+        rows = rows[offset or 0:]
+        if limit is not None:
+            rows = rows[:limit]
+        out = {"ids": [self._ids[r] for r in rows]}
+        out["documents"] = [self._docs[r] for r in rows] if "documents" in include else None
+        out["metadatas"] = [self._metas[r] for r in rows] if "metadatas" in include else None
+        out["embeddings"] = self._vectors()[rows] if "embeddings" in include else None
+        return out
+
+    # ---- search ----
+    def _ann(self):
+        if self._index is None:
+            self._index = IVFPQIndex(**self.params).build(self._vectors())
+        return self._index
+
+    def query(self, query_embeddings, n_results=10, where=None, include=("documents", "metadatas", "distances")):
+        q = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        vecs = self._vectors()
+        allowed = None
+        if where:
+            allowed = np.array([where_matches(m, where) for m in self._metas], dtype=bool)
+        if len(vecs) == 0:
+            return _query_result([([], [], [], [])] * len(q), include)
+
+        if self.index_type == "ivfpq" and allowed is None:
+            index = self._ann()
+            index.nprobe = ivf_query_params().get("nprobe", index.nprobe)
+            index.refine = ivf_query_params().get("refine", index.refine)
+            rows_all, dists_all = index.search(q, n_results, vectors=vecs)
+        else:
+            # exact search (flat backend, or a metadata filter narrowed the candidates)
+            cand = np.flatnonzero(allowed) if allowed is not None else np.arange(len(vecs))
+            rows_all, dists_all = [], []
+            if len(cand):
+                if allowed is not None:
+                    d = _sq_dists(q, vecs[cand])
+                else:
+                    if self._sq_norms is None:
+                        self._sq_norms = np.sum(np.asarray(vecs, dtype=np.float32) ** 2, axis=1)
+                    d = np.maximum(np.sum(q ** 2, axis=1, keepdims=True) - 2.0 * (q @ vecs.T) + self._sq_norms, 0.0)
+                k = min(n_results, len(cand))
+                for row in d:
+                    top = np.argpartition(row, k - 1)[:k]
+                    top = top[np.argsort(row[top], kind="stable")]
+                    rows_all.append(cand[top])
+                    dists_all.append(row[top])
+            else:
+                rows_all = dists_all = [np.zeros(0, dtype=np.int64)] * len(q)
+
+        per_query = []
+        for rows, dists in zip(rows_all, dists_all):
+            rows = [int(r) for r in rows]
+            per_query.append(([self._ids[r] for r in rows], [self._docs[r] for r in rows],
+                              [self._metas[r] for r in rows], [float(x) for x in dists]))
+        return _query_result(per_query, include)
+
+    # ---- persistence ----
+    def persist(self):
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        vecs = self._vectors()
+        np.save(tmp / "vectors.npy", vecs)
+        with open(tmp / "records.jsonl", "w", encoding="utf-8") as f:
+            for cid, doc, meta in zip(self._ids, self._docs, self._metas):
+                f.write(json.dumps([cid, doc, meta], ensure_ascii=False) + "\n")
+        params = dict(self.params)
+        if self.index_type == "ivfpq" and len(vecs):
+            index = self._ann()
+            index.save(tmp)
+            params = index.params()
+        with open(tmp / "params.json", "w", encoding="utf-8") as f:
+            json.dump({"index": self.index_type, "params": params, "count": len(self._ids)}, f, indent=2)
+        old = self.path.with_name(self.path.name + ".old")
+        shutil.rmtree(old, ignore_errors=True)
+        if self.path.exists():
+            self.path.rename(old)
+        tmp.rename(self.path)
+        shutil.rmtree(old, ignore_errors=True)
+        if self._index is not None:
+            # serve from the files just written (memory-mapped)
+            self._index = IVFPQIndex.load(self.path, params)
+
+    def _load(self):
+        with open(self.path / "params.json", "r", encoding="utf-8") as f:
+            info = json.load(f)
+        self._vecs = np.load(self.path / "vectors.npy", mmap_mode="r")
+        with open(self.path / "records.jsonl", "r", encoding="utf-8") as f:
+            for line in f:
+                cid, doc, meta = json.loads(line)
+                self._row[cid] = len(self._ids)
+                self._ids.append(cid)
+                self._docs.append(doc)
+                self._metas.append(meta)
+        if info["index"] == "ivfpq" and (self.path / "ivf_centroids.npy").exists():
+            self.params = info["params"]
+            self._index = IVFPQIndex.load(self.path, info["params"])
+
+
+def collection_space(collection):
+    """Distance space ("l2", "cosine", "ip") of a Chroma or in-process collection."""
+    try:
+        return collection.configuration["hnsw"]["space"]
+    except Exception:
+        return (collection.metadata or {}).get("hnsw:space", "l2")
+
+
+def open_collection(backend, persist_directory, name, delete_existing=False, **params):
+    """Collection of the given engine at persist_directory (created if missing)."""
+    persist_directory = Path(persist_directory)
+    if backend == "chroma":
+        import chromadb
+        persist_directory.mkdir(parents=True, exist_ok=True)
+        client = chromadb.PersistentClient(path=str(persist_directory))
+        if delete_existing:
+            try:
+                client.delete_collection(name=name)
+            except Exception:
+                pass
+        return client.get_or_create_collection(name=name)
+    if backend not in VECTOR_BACKENDS:
+        raise ValueError(f"Unknown vector backend '{backend}' (choose from {', '.join(VECTOR_BACKENDS)})")
+    path = persist_directory / f"{name}.{backend}"
+    if delete_existing:
+        shutil.rmtree(path, ignore_errors=True)
+    if backend == "ivfpq":
+        params = dict(ivf_build_params(), **params)
+    return InProcessCollection(path, name, index=backend, **params)
@@ -0,0 +1,338 @@
+# src/vector_snapshot.py
+"""
+Read-only flat vector snapshot of a store, for serving replicas.
+
+export_snapshot() dumps a collection after a build into plain files that
+VectorSnapshot memory-maps: nothing is copied into process memory on open, so
+any number of worker processes on a node share one page-cached copy and can
+serve immediately. Search scans all vectors (blocked NumPy matmul + top-k).
+
+Quantized snapshots (float16: 2 bytes/dim, int8: 1 byte/dim with a per-dimension
+scale) keep only the compact vectors hot: the scan ranks on them, then the best
+n_results * RAG_SNAPSHOT_RESCORE candidates are re-scored exactly against the
+float32 copy, of which only those rows are ever read from disk.
+
+Layout of <persist_dir>/vector_snapshot/:
+
+    vectors.npy        float32|float16|int8 [n, dim] vectors scanned at query time
+    scale.npy          float32 [dim] int8 dequantization scale (int8 only)
+    vectors_f32.npy    float32 [n, dim] full precision for re-scoring (quantized only)
+    sq_norms.npy       float32 [n] |v|^2 of the scanned (dequantized) vectors
+    ids.bin            utf-8 chunk ids, packed     + ids_offsets.npy  int64 [n + 1]
+    text.bin           utf-8 chunk text, packed    + text_offsets.npy int64 [n + 1]
+    metadata.bin       json metadata, packed       + metadata_offsets.npy int64 [n + 1]
+    snapshot.json      count, dim, dtype, space, indexed_at of the exported index
+
+Serving: RAG_VECTOR_SNAPSHOT=1 makes vectorstore answer dense queries from the
+snapshot when its indexed_at matches the store's index manifest.
+
+    python src/vector_snapshot.py --persist chromadb_store --dtype float16
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+from pathlib import Path
+from datetime import datetime, timezone
+import numpy as np
+
+from metadata_index import where_matches
+
+SNAPSHOT_DIRNAME = "vector_snapshot"
+SNAPSHOT_DTYPES = ("float16", "float32", "int8")
+SERVE_SNAPSHOT = os.environ.get("RAG_VECTOR_SNAPSHOT", "0").strip().lower() in ("1", "true", "yes")
+RESCORE = int(os.environ.get("RAG_SNAPSHOT_RESCORE", "4"))  # candidates per result re-scored in float32; 0 = off
+BLOCK_ROWS = 16384  # rows converted to float32 at a time while scanning
+
+
+class _PackedWriter:
+    """Appends utf-8 records to <name>.bin and collects their offsets."""
+
+    def __init__(self, path, name):
+        self.path = path
+        self.name = name
+        self.f = open(path / f"{name}.bin", "wb")
+        self.offsets = [0]
+
+    def add(self, text):
+        data = (text or "").encode("utf-8")
+        self.f.write(data)
+        self.offsets.append(self.offsets[-1] + len(data))
+
+    def close(self):
+        self.f.close()
+        np.save(self.path / f"{self.name}_offsets.npy", np.asarray(self.offsets, dtype=np.int64))
+
+
+class _PackedReader:
+    def __init__(self, path, name):
+        self.offsets = np.load(path / f"{name}_offsets.npy", mmap_mode="r")
+        size = int(self.offsets[-1])
+        self.data = np.memmap(path / f"{name}.bin", dtype=np.uint8, mode="r") if size else np.zeros(0, np.uint8)
+
+    def __getitem__(self, row):
+        return bytes(self.data[int(self.offsets[row]):int(self.offsets[row + 1])]).decode("utf-8")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+def _collection_space(collection):
+    try:
+        return collection.configuration["hnsw"]["space"]
+    except Exception:
+        return (collection.metadata or {}).get("hnsw:space", "l2")
+
+
+def export_snapshot(collection, persist_directory, dtype="float16", indexed_at=None, page_size=2000):
+    """Write <persist_dir>/vector_snapshot/ from everything the collection holds (replaced as a whole)."""
+    if dtype not in SNAPSHOT_DTYPES:
+        raise ValueError(f"Unknown snapshot dtype '{dtype}' (choose from {', '.join(SNAPSHOT_DTYPES)})")
+    persist_directory = Path(persist_directory)
+    path = persist_directory / SNAPSHOT_DIRNAME
+    tmp = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    total = collection.count()
+    full_name = "vectors.npy" if dtype == "float32" else "vectors_f32.npy"
+    vectors = None
+    writers = [_PackedWriter(tmp, name) for name in ("ids", "text", "metadata")]
+    row = 0
+    while row < total:
+        page = collection.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=row)
+        if not page["ids"]:
+            break
+        emb = np.asarray(page["embeddings"], dtype=np.float32)
+        if vectors is None:
+            vectors = np.lib.format.open_memmap(tmp / full_name, mode="w+", dtype=np.float32, shape=(total, emb.shape[1]))
+        n = len(page["ids"])
+        vectors[row:row + n] = emb
+        for cid, doc, meta in zip(page["ids"], page["documents"], page["metadatas"]):
+            writers[0].add(cid)
+            writers[1].add(doc)
+            writers[2].add(json.dumps(meta or {}, ensure_ascii=False))
+        row += n
+    for w in writers:
+        w.close()
+    if vectors is None:
+        vectors = np.zeros((0, 0), dtype=np.float32)
+        np.save(tmp / full_name, vectors)
+    _write_scan_vectors(tmp, vectors[:row], dtype)
+    del vectors
+
+    info = {
+        "exported_at": datetime.now(timezone.utc).isoformat(),
+        "indexed_at": indexed_at,
+        "count": row,
+        "dtype": dtype,
+        "space": _collection_space(collection),
+        "scan_bytes": int(np.load(tmp / "vectors.npy", mmap_mode="r").nbytes),
+    }
+    with open(tmp / "snapshot.json", "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=2)
+
+    old = path.with_name(path.name + ".old")
+    shutil.rmtree(old, ignore_errors=True)
+    if path.exists():
+        path.rename(old)
+    tmp.rename(path)
+    shutil.rmtree(old, ignore_errors=True)
+    print(f"[INFO] Vector snapshot: {row} vectors ({dtype}, {info['scan_bytes'] / 2 ** 20:.2f} MB scanned) → {path}")
+    return info
+
+
+def _write_scan_vectors(path, full, dtype):
+    """Quantized scan vectors (and their norms) from the float32 rows, block by block."""
+    n, dim = full.shape
+    scale = None
+    if dtype == "int8":
+        # symmetric per-dimension scale: the largest |value| of each dimension maps to 127
+        amax = np.zeros(dim, dtype=np.float32)
+        for lo in range(0, n, BLOCK_ROWS):
+            amax = np.maximum(amax, np.abs(np.asarray(full[lo:lo + BLOCK_ROWS])).max(axis=0))
+        scale = np.where(amax > 0, amax / 127.0, 1.0).astype(np.float32)
+        np.save(path / "scale.npy", scale)
+    scan = full
+    if dtype != "float32":
+        scan = np.lib.format.open_memmap(path / "vectors.npy", mode="w+", dtype=dtype, shape=(n, dim))
+    norms = np.lib.format.open_memmap(path / "sq_norms.npy", mode="w+", dtype=np.float32, shape=(n,))
+    for lo in range(0, n, BLOCK_ROWS):
+        block = np.asarray(full[lo:lo + BLOCK_ROWS], dtype=np.float32)
+        if dtype == "int8":
+            codes = np.clip(np.rint(block / scale), -127, 127).astype(np.int8)
+            scan[lo:lo + len(block)] = codes
+            block = codes.astype(np.float32) * scale
+        elif dtype == "float16":
+            scan[lo:lo + len(block)] = block
+            block = block.astype(np.float16).astype(np.float32)
+        # norms of what the scan sees, so approximate distances stay consistent
+        norms[lo:lo + len(block)] = np.sum(block ** 2, axis=1)
+    norms.flush()
+    if scan is not full:
+        scan.flush()
+
+
+class VectorSnapshot:
+    """
+    Read-only, memory-mapped collection. Supports the read side of the
+    collection interface (get / query / count), so StoreHandle can serve from it.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / "snapshot.json", "r", encoding="utf-8") as f:
+            self.info = json.load(f)
+        self.metadata = {"hnsw:space": self.info.get("space", "l2")}
+        self.vectors = np.load(self.path / "vectors.npy", mmap_mode="r")
+        self.scale = np.load(self.path / "scale.npy") if (self.path / "scale.npy").exists() else None
+        exact = self.path / "vectors_f32.npy"
+        self.exact = np.load(exact, mmap_mode="r") if exact.exists() else None
+        self.rescore = RESCORE
+        self.sq_norms = np.load(self.path / "sq_norms.npy", mmap_mode="r")
+        self.ids = _PackedReader(self.path, "ids")
+        self.text = _PackedReader(self.path, "text")
+        self.metas = _PackedReader(self.path, "metadata")
+        self._row = None        # id -> row, built on the first get(ids=...)
+        self._meta_cache = None # decoded metadata, built on the first filtered query
+
+    def count(self):
+        return len(self.ids)
+
+    def _metadata(self, row):
+        if self._meta_cache is not None:
+            return self._meta_cache[row]
+        return json.loads(self.metas[row])
+
+    def _rows_for_ids(self, ids):
+        if self._row is None:
+            self._row = {self.ids[r]: r for r in range(len(self.ids))}
+        return [self._row[c] for c in ids if c in self._row]
+
+    def _allowed(self, where):
+        if self._meta_cache is None:
+            self._meta_cache = [json.loads(self.metas[r]) for r in range(len(self.metas))]
+        return np.array([where_matches(m, where) for m in self._meta_cache], dtype=bool)
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("documents", "metadatas")):
+        rows = list(range(len(self.ids))) if ids is None else self._rows_for_ids(ids)
+        if where:
+            allowed = self._allowed(where)
+            rows = [r for r in rows if allowed[r]]
+        rows = rows[offset or 0:]
+        if limit is not None:
+            rows = rows[:limit]
+        out = {"ids": [self.ids[r] for r in rows]}
+        out["documents"] = [self.text[r] for r in rows] if "documents" in include else None
+        out["metadatas"] = [self._metadata(r) for r in rows] if "metadatas" in include else None
+        out["embeddings"] = self._full(rows) if "embeddings" in include else None
+        return out
+
+    def _full(self, rows):
+        """float32 vectors of rows: the exact copy when there is one, else the dequantized scan vectors."""
+        rows = np.asarray(rows, dtype=np.int64)
+        if self.exact is not None:
+            return np.asarray(self.exact[rows], dtype=np.float32)
+        vecs = np.asarray(self.vectors[rows], dtype=np.float32)
+        return vecs * self.scale if self.scale is not None else vecs
+
+    def _distances(self, q, dots, sq_norms):
+        space = self.metadata["hnsw:space"]
+        if space == "cosine":
+            q_norm = np.linalg.norm(q, axis=1, keepdims=True)
+            return 1.0 - dots / np.maximum(q_norm * np.sqrt(sq_norms)[None, :], 1e-12)
+        if space == "ip":
+            return 1.0 - dots
+        return np.maximum(np.sum(q ** 2, axis=1, keepdims=True) - 2.0 * dots + sq_norms[None, :], 0.0)
+
+    def _scan(self, q, allowed=None):
+        """Distances [len(q), n] on the scan vectors (approximate when quantized), block by block."""
+        n = len(self.vectors)
+        out = np.empty((len(q), n), dtype=np.float32)
+        # int8: fold the per-dimension scale into the query instead of dequantizing every row
+        qs = q * self.scale if self.scale is not None else q
+        for lo in range(0, n, BLOCK_ROWS):
+            hi = min(n, lo + BLOCK_ROWS)
+            dots = qs @ np.asarray(self.vectors[lo:hi], dtype=np.float32).T
+            out[:, lo:hi] = self._distances(q, dots, np.asarray(self.sq_norms[lo:hi]))
+        if allowed is not None:
+            out[:, ~allowed] = np.inf
+        return out
+
+    def _top(self, q, dists, k):
+        """Best k rows and distances for one query, re-scored exactly when the scan was approximate."""
+        rescore = self.exact is not None and self.rescore > 0
+        n_cand = min(int(np.isfinite(dists).sum()), k * self.rescore) if rescore else k
+        top = np.argpartition(dists, n_cand - 1)[:n_cand]
+        if rescore:
+            top = np.sort(top)  # ascending rows: sequential reads from the float32 file
+            vecs = self._full(top)
+            cand = self._distances(q[None, :], (vecs @ q)[None, :], np.sum(vecs ** 2, axis=1))[0]
+        else:
+            cand = dists[top]
+        order = np.argsort(cand, kind="stable")[:k]
+        return top[order], cand[order]
+
+    def query(self, query_embeddings, n_results=10, where=None, include=("documents", "metadatas", "distances")):
+        q = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        allowed = self._allowed(where) if where else None
+        n_valid = len(self.vectors) if allowed is None else int(allowed.sum())
+        k = min(n_results, n_valid)
+        out = {"ids": [], "documents": [] if "documents" in include else None,
+               "metadatas": [] if "metadatas" in include else None,
+               "distances": [] if "distances" in include else None}
+        dists = self._scan(q, allowed) if k else None
+        for qi in range(len(q)):
+            top, top_dists = [], []
+            if k:
+                top, top_dists = self._top(q[qi], dists[qi], k)
+            out["ids"].append([self.ids[r] for r in top])
+            if out["documents"] is not None:
+                out["documents"].append([self.text[r] for r in top])
+            if out["metadatas"] is not None:
+                out["metadatas"].append([self._metadata(r) for r in top])
+            if out["distances"] is not None:
+                out["distances"].append([float(d) for d in top_dists])
+        return out
+
+
+def open_snapshot(persist_directory, indexed_at=None):
+    """
+    VectorSnapshot of a store, or None if there is none. With indexed_at, a
+    snapshot exported from a different index build is ignored.
+    """
+    path = Path(persist_directory) / SNAPSHOT_DIRNAME
+    if not (path / "snapshot.json").exists():
+        return None
+    try:
+        snap = VectorSnapshot(path)
+    except Exception as e:
+        print("[WARN] Failed to open vector snapshot:", e)
+        return None
+    if indexed_at is not None and snap.info.get("indexed_at") != indexed_at:
+        print(f"[WARN] Vector snapshot in {persist_directory} is from another index build; "
+              "re-export it (python src/vector_snapshot.py)")
+        return None
+    return snap
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Export a read-only memory-mapped vector snapshot of an index.")
+    ap.add_argument("--persist", "-p", required=True, help="Store directory (with index_manifest.json)")
+    ap.add_argument("--dtype", choices=SNAPSHOT_DTYPES, default="float16")
+    args = ap.parse_args()
+
+    from vector_backends import DEFAULT_VECTOR_BACKEND, open_collection
+    manifest_path = Path(args.persist) / "index_manifest.json"
+    if not manifest_path.exists():
+        print(f"[ERROR] No index manifest in {args.persist}")
+        sys.exit(1)
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    collection = open_collection(manifest.get("vector_backend", DEFAULT_VECTOR_BACKEND), args.persist, manifest["collection"])
+    export_snapshot(collection, args.persist, args.dtype, indexed_at=manifest.get("indexed_at"))
+
+
+if __name__ == "__main__":
+    main()
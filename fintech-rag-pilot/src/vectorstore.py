@@ -39,8 +39,25 @@
 
 
 # src/vectorstore.py
+import os
+import re
+import json
+import time
+import threading
+import unicodedata
 from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import chromadb
+import numpy as np
+
+from encoders import DEFAULT_MODEL, DEFAULT_BACKEND, encoder_id, load_encoder
+from bm25_index import open_bm25_index
+from metadata_index import open_metadata_index
+from vector_backends import DEFAULT_VECTOR_BACKEND, collection_space, open_collection
+from vector_snapshot import SERVE_SNAPSHOT, open_snapshot
+from index_versions import VERSIONS_DIRNAME, current_version
+from shards import ShardPool, shard_dir, shard_layout
 
 # ---- Config ----
 ROOT = Path(__file__).resolve().parents[1]
@@ -49,6 +66,495 @@ PUBLIC_DIR = ROOT / "chromadb_store"           # public collection
 INTERNAL_DIR = ROOT / "chromadb_internal"      # internal-only docs
 PUBLIC_COLLECTION = "werize_docs"
 INTERNAL_COLLECTION = "werize_internal_docs"
+# stores opened by warm_stores() at process start
+KNOWN_STORES = [(PUBLIC_DIR, PUBLIC_COLLECTION), (INTERNAL_DIR, INTERNAL_COLLECTION)]
+QUERY_CACHE_SIZE = int(os.environ.get("RAG_QUERY_CACHE_SIZE", "2048"))  # cached query vectors per encoder
+_WS_RE = re.compile(r"\s+")
+# retrieval mode used when retrieve() is called without one: dense | sparse | hybrid
+RETRIEVE_MODE = os.environ.get("RAG_RETRIEVE_MODE", "dense")
+RETRIEVE_MODES = ("dense", "sparse", "hybrid")
+RRF_K = 60                 # reciprocal-rank fusion constant
+HYBRID_CANDIDATES = 4      # each retriever returns n_results * HYBRID_CANDIDATES (min 20) for fusion
+# filters matching at most this many chunks are searched exactly over the candidates
+EXACT_SEARCH_MAX = int(os.environ.get("RAG_EXACT_SEARCH_MAX", "500"))
+_SEARCH_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="retrieve")
+# fan-out tasks wait on _SEARCH_POOL tasks, so they need their own pool
+_FANOUT_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="fanout")
+# versioned stores (index_versions): how often CURRENT is re-read, and how long a
+# replaced version stays open for requests that still hold it
+VERSION_CHECK_S = float(os.environ.get("RAG_VERSION_CHECK_S", "2"))
+RETIRE_GRACE_S = float(os.environ.get("RAG_RETIRE_GRACE_S", "30"))
+
+
+# ---- Query encoder: same model as the index, with an LRU of query vectors ----
+def normalize_query(query):
+    """NFKC + collapsed whitespace, so trivially different spellings share a cache entry."""
+    return _WS_RE.sub(" ", unicodedata.normalize("NFKC", query)).strip()
+
+
+class QueryEncoder:
+    """
+    Encodes queries with the model/backend that built the index and keeps a
+    bounded LRU of normalized query -> vector, so repeated questions skip inference.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL, backend=DEFAULT_BACKEND, cache_size=QUERY_CACHE_SIZE):
+        self.model_name = model_name
+        self.backend = backend
+        self.cache_size = cache_size
+        self.model = load_encoder(model_name, backend)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def encode(self, queries):
+        """Return float32 [len(queries), dim] vectors, in order."""
+        keys = [normalize_query(q) for q in queries]
+        found = {}
+        with self._lock:
+            for k in keys:
+                vec = self._cache.get(k)
+                if vec is not None:
+                    self._cache.move_to_end(k)
+                    found[k] = vec
+        missing = list(dict.fromkeys(k for k in keys if k not in found))
+        if missing:
+            vecs = np.asarray(
+                self.model.encode(missing, convert_to_numpy=True, show_progress_bar=False, batch_size=len(missing)),
+                dtype=np.float32,
+            )
+            with self._lock:
+                for k, v in zip(missing, vecs):
+                    found[k] = v
+                    self._cache[k] = v
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        with self._lock:
+            self.misses += len(missing)
+            self.hits += len(keys) - len(missing)
+        return np.vstack([found[k] for k in keys]) if keys else np.zeros((0, 0), dtype=np.float32)
+
+    def stats(self):
+        return {"encoder": encoder_id(self.model_name, self.backend), "cached": len(self._cache),
+                "hits": self.hits, "misses": self.misses}
+
+
+_ENCODERS = {}
+_ENCODERS_LOCK = threading.Lock()
+
+
+def get_query_encoder(model_name=DEFAULT_MODEL, backend=DEFAULT_BACKEND):
+    """One QueryEncoder (model + LRU) per encoder_id, shared by every store that uses it."""
+    key = encoder_id(model_name, backend)
+    with _ENCODERS_LOCK:
+        enc = _ENCODERS.get(key)
+        if enc is None:
+            enc = _ENCODERS[key] = QueryEncoder(model_name, backend)
+    return enc
+
+
+def read_index_manifest(persist_dir):
+    path = Path(persist_dir) / "index_manifest.json"
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"[WARN] Could not read {path}:", e)
+        return None
+
+
+# ---- Store registry: one warm client/collection per (persist dir, collection) ----
+class StoreHandle:
+    __slots__ = ("root", "version", "persist_dir", "collection_name", "client", "collection", "opened_at", "manifest",
+                 "_encoder", "_bm25", "_meta_index", "space")
+
+    def __init__(self, persist_dir, collection_name):
+        # a versioned root serves the build named in its CURRENT file
+        self.root = Path(persist_dir)
+        self.version = current_version(self.root)
+        self.persist_dir = self.root / VERSIONS_DIRNAME / self.version if self.version else self.root
+        self.collection_name = collection_name
+        self.persist_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest = read_index_manifest(self.persist_dir) or {}
+        backend = self.manifest.get("vector_backend", DEFAULT_VECTOR_BACKEND)
+        snapshot = open_snapshot(self.persist_dir, self.manifest.get("indexed_at")) if SERVE_SNAPSHOT else None
+        if snapshot is not None:
+            # read-only memory-mapped export of this build, shared through the page cache
+            self.client = None
+            self.collection = snapshot
+        elif backend == "chroma":
+            self.client = chromadb.PersistentClient(path=str(self.persist_dir))
+            self.collection = self.client.get_or_create_collection(name=collection_name)
+        else:
+            # in-process engine (vector_backends): loaded from <persist_dir>/<collection>.<backend>/
+            self.client = None
+            self.collection = open_collection(backend, self.persist_dir, collection_name)
+        self.opened_at = time.time()
+        self._encoder = None
+        self._bm25 = False  # not loaded yet; None = no keyword index on disk
+        self._meta_index = False
+        self.space = collection_space(self.collection)
+
+    @property
+    def bm25(self):
+        if self._bm25 is False:
+            self._bm25 = open_bm25_index(self.persist_dir)
+            if self._bm25 is None:
+                print(f"[WARN] No BM25 index in {self.persist_dir}; sparse/hybrid retrieval falls back to dense "
+                      "(re-run the embedding build to create it)")
+        return self._bm25
+
+    @property
+    def meta_index(self):
+        if self._meta_index is False:
+            self._meta_index = open_metadata_index(self.persist_dir)
+        return self._meta_index
+
+    def filter_ids(self, where):
+        """
+        Chunk ids matching a where filter: from the local metadata index when it
+        can evaluate the filter, else from Chroma. None when where is empty.
+        """
+        if not where:
+            return None
+        if self.meta_index is not None:
+            ids = self.meta_index.match(where)
+            if ids is not None:
+                return ids
+        return self.collection.get(where=where, include=[])["ids"]
+
+    @property
+    def encoder(self):
+        """Query encoder matching the model/backend recorded in this store's index manifest."""
+        if self._encoder is None:
+            model_name = self.manifest.get("model_name")
+            if not model_name:
+                print(f"[WARN] No index manifest in {self.persist_dir}; assuming model '{DEFAULT_MODEL}'")
+                model_name = DEFAULT_MODEL
+            self._encoder = get_query_encoder(model_name, self.manifest.get("embedding_backend", DEFAULT_BACKEND))
+        return self._encoder
+
+    def warm(self):
+        """Load the query model and touch the on-disk index before the first user query."""
+        if self.collection.count() == 0:
+            return
+        vec = self.encoder.model.encode(["warm up"], convert_to_numpy=True, show_progress_bar=False)
+        self.collection.query(query_embeddings=np.asarray(vec, dtype=np.float32).tolist(), n_results=1)
+        if RETRIEVE_MODE != "dense":
+            _ = self.bm25
+        _ = self.meta_index
+
+    def count(self):
+        return self.collection.count()
+
+    def close(self):
+        """Release the Chroma client (used when a newer version has replaced this one)."""
+        if self.client is not None and hasattr(self.client, "close"):
+            try:
+                self.client.close()
+            except Exception as e:
+                print(f"[WARN] Failed to close store at {self.persist_dir}:", e)
+
+
+class ShardedHandle:
+    """
+    A sharded store (see shards.py) in place of a StoreHandle: the query is
+    encoded here once, searched on every shard's worker process, and the
+    per-shard top-k lists are merged. There is no single client/collection.
+    """
+    client = None
+    collection = None
+    meta_index = None
+
+    def __init__(self, persist_dir, collection_name, root=None, version=None):
+        self.root = Path(root or persist_dir)
+        self.version = version
+        self.persist_dir = Path(persist_dir)
+        self.collection_name = collection_name
+        self.manifest = read_index_manifest(self.persist_dir) or {}
+        layout = shard_layout(self.manifest)
+        # a shard that received no documents has no manifest and is skipped
+        self.shard_dirs = [d for d in (shard_dir(self.persist_dir, i) for i in range(layout["count"]))
+                           if (d / "index_manifest.json").exists()]
+        self.space = self._shard_space()
+        self.opened_at = time.time()
+        self._encoder = None
+        self._pool = None
+        self._bm25 = False
+        self._lock = threading.Lock()
+
+    encoder = StoreHandle.encoder
+
+    def _shard_space(self):
+        """Distance space of the shards: from the manifests, else read off the first shard's collection."""
+        space = self.manifest.get("space")
+        if space is None and self.shard_dirs:
+            space = (read_index_manifest(self.shard_dirs[0]) or {}).get("space")
+            if space is None:  # stores built before manifests recorded the space
+                backend = self.manifest.get("vector_backend", DEFAULT_VECTOR_BACKEND)
+                space = collection_space(open_collection(backend, self.shard_dirs[0], self.collection_name))
+        return space
+
+    @property
+    def bm25(self):
+        """
+        The shards' keyword indexes (memory-mapped here only to compute
+        corpus-wide term statistics), or None unless every shard has one.
+        """
+        if self._bm25 is False:
+            indexes = [open_bm25_index(d) for d in self.shard_dirs]
+            self._bm25 = indexes if indexes and all(i is not None for i in indexes) else None
+        return self._bm25
+
+    def _bm25_stats(self, queries):
+        """Per query: (chunks, avgdl, {term: df}) over all shards, so shard BM25 scores are comparable."""
+        out = []
+        for q in queries:
+            n_docs, tokens, df = 0, 0.0, {}
+            for index in self.bm25:
+                n, t, d = index.term_stats(q)
+                n_docs += n
+                tokens += t
+                for term, c in d.items():
+                    df[term] = df.get(term, 0) + c
+            out.append((n_docs, (tokens / n_docs) if n_docs else 1.0, df))
+        return out
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ShardPool(self.shard_dirs, self.collection_name)
+        return self._pool
+
+    def count(self):
+        # from the manifest: asking every shard process would cost a round trip per call
+        return self.manifest.get("num_vectors", 0) if self.shard_dirs else 0
+
+    def warm(self):
+        """Load the query model and start every shard worker (each opens and touches its shard)."""
+        self.encoder.model.encode(["warm up"], convert_to_numpy=True, show_progress_bar=False)
+        if self.shard_dirs:
+            self.pool.counts()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+
+    def search(self, queries, n_results, mode, where=None, query_vecs=None):
+        if not self.shard_dirs:
+            return [[] for _ in queries]
+        if query_vecs is None:
+            query_vecs = self.encoder.encode(queries)
+        bm25_stats = self._bm25_stats(queries) if mode != "dense" else None
+        per_shard = self.pool.search(queries, query_vecs, n_results, mode, where, bm25_stats)
+        pool_k = max(n_results * HYBRID_CANDIDATES, 20) if mode == "hybrid" else n_results
+        dense_all, sparse_all = [], []
+        for qi in range(len(queries)):
+            # distances are comparable across shards (same model and space); BM25 scores use corpus-wide stats
+            dense = [r for dense_s, _ in per_shard for r in dense_s[qi]]
+            sparse = [r for _, sparse_s in per_shard for r in sparse_s[qi]]
+            dense_all.append(sorted(dense, key=lambda r: r["score"])[:pool_k])
+            sparse_all.append(sorted(sparse, key=lambda r: -r["score"])[:pool_k])
+        if mode == "hybrid":
+            return _fuse(dense_all, sparse_all, n_results)
+        if mode == "sparse":
+            return [s or d for d, s in zip(dense_all, sparse_all)]
+        return dense_all
+
+
+def open_store_handle(persist_dir, collection_name):
+    """StoreHandle for a store, or a ShardedHandle if the (current version of the) store is sharded."""
+    root = Path(persist_dir)
+    version = current_version(root)
+    store = root / VERSIONS_DIRNAME / version if version else root
+    if shard_layout(read_index_manifest(store)):
+        return ShardedHandle(store, collection_name, root, version)
+    return StoreHandle(persist_dir, collection_name)
+
+
+class StoreRegistry:
+    """
+    Thread-safe cache of open Chroma handles. Each (persist dir, collection)
+    is opened once and shared by all requests/threads in the process.
+    For versioned stores, a newly published version is opened and warmed on a
+    background thread and swapped in once ready; requests keep using the old
+    handle until then, and it is closed RETIRE_GRACE_S after the swap.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._handles = {}
+        self._checked = {}      # key -> last CURRENT check (monotonic)
+        self._switching = set()
+        self._failed = {}       # key -> version that failed to open
+        self._retired = []      # (retired at, handle)
+
+    @staticmethod
+    def _key(persist_dir, collection_name):
+        return (str(Path(persist_dir).resolve()), collection_name)
+
+    def get(self, persist_dir, collection_name):
+        key = self._key(persist_dir, collection_name)
+        handle = self._handles.get(key)
+        if handle is None:
+            with self._lock:
+                handle = self._handles.get(key)
+                if handle is None:
+                    handle = open_store_handle(persist_dir, collection_name)
+                    self._handles[key] = handle
+        else:
+            self._check_version(key, persist_dir, collection_name, handle)
+        return handle
+
+    def _check_version(self, key, persist_dir, collection_name, handle):
+        now = time.monotonic()
+        with self._lock:
+            # claim this check interval, so concurrent callers don't all re-read CURRENT
+            if now - self._checked.get(key, 0.0) < VERSION_CHECK_S:
+                return
+            self._checked[key] = now
+        self._release_retired(now)
+        version = current_version(persist_dir)
+        if version == handle.version or version is None or self._failed.get(key) == version:
+            return
+        with self._lock:
+            if key in self._switching:
+                return
+            self._switching.add(key)
+        threading.Thread(target=self._switch, args=(key, persist_dir, collection_name, version),
+                         name="store-switch", daemon=True).start()
+
+    def _switch(self, key, persist_dir, collection_name, version):
+        """Open and warm a new version off the request path, then swap it in."""
+        t0 = time.perf_counter()
+        try:
+            new = open_store_handle(persist_dir, collection_name)
+            new.warm()
+            with self._lock:
+                old = self._handles.get(key)
+                self._handles[key] = new
+                if old is not None:
+                    self._retired.append((time.monotonic(), old))
+            print(f"[INFO] Store '{collection_name}' switched to version {new.version} "
+                  f"(warmed in {(time.perf_counter() - t0) * 1000:.0f} ms)")
+        except Exception as e:
+            self._failed[key] = version
+            print(f"[WARN] Failed to switch store '{collection_name}' to version {version}:", e)
+        finally:
+            with self._lock:
+                self._switching.discard(key)
+
+    def _release_retired(self, now):
+        with self._lock:
+            done = [h for t, h in self._retired if now - t >= RETIRE_GRACE_S]
+            self._retired = [(t, h) for t, h in self._retired if now - t < RETIRE_GRACE_S]
+        for handle in done:
+            handle.close()
+
+    def warm(self, stores=None):
+        for persist_dir, collection_name in stores or KNOWN_STORES:
+            t0 = time.perf_counter()
+            try:
+                self.get(persist_dir, collection_name).warm()
+                print(f"[INFO] Warmed store '{collection_name}' in {(time.perf_counter() - t0) * 1000:.0f} ms")
+            except Exception as e:
+                print(f"[WARN] Failed to warm store '{collection_name}' at {persist_dir}:", e)
+
+    def health(self):
+        """
+        Per-store status keyed "collection@persist_dir" (one entry per open
+        handle, including versions still retiring): open, vector count, age.
+        Errors are reported, not raised.
+        """
+        with self._lock:
+            handles = [(h, False) for h in self._handles.values()] + [(h, True) for _, h in self._retired]
+        out = {}
+        for handle, retiring in handles:
+            entry = {"persist_dir": str(handle.persist_dir), "collection": handle.collection_name,
+                     "version": handle.version, "opened_at": handle.opened_at, "retiring": retiring}
+            try:
+                entry["count"] = handle.count()
+                entry["ok"] = True
+            except Exception as e:
+                entry["ok"] = False
+                entry["error"] = str(e)
+            if handle._encoder is not None:
+                entry["query_encoder"] = handle._encoder.stats()
+            out[f"{handle.collection_name}@{handle.persist_dir}"] = entry
+        return out
+
+    def reload(self, persist_dir=None, collection_name=None):
+        """Drop and reopen one store (or all) — e.g. after an index rebuild."""
+        with self._lock:
+            keys = [
+                k for k in self._handles
+                if persist_dir is None or k == self._key(persist_dir, collection_name)
+            ]
+            for k in keys:
+                del self._handles[k]
+        for persist_dir_k, collection_name_k in keys:
+            self.get(persist_dir_k, collection_name_k)
+        return len(keys)
+
+
+REGISTRY = StoreRegistry()
+
+
+def store_location(internal=False):
+    return (INTERNAL_DIR, INTERNAL_COLLECTION) if internal else (PUBLIC_DIR, PUBLIC_COLLECTION)
+
+
+def encode_query(query, internal=False):
+    """Query vector from the chosen store's encoder (shares the query-vector LRU with retrieve)."""
+    return REGISTRY.get(*store_location(internal)).encoder.encode([query])[0]
+
+
+_VERSIONS = {}
+
+
+def index_version(internal=False):
+    """
+    Version of the chosen store's index: its manifest's indexed_at, re-read only
+    when index_manifest.json changes on disk (so builds in other processes count).
+    Versioned stores report the build currently served.
+    """
+    handle = REGISTRY.get(*store_location(internal))
+    if handle.version is not None:
+        return handle.manifest.get("indexed_at") or handle.version
+    persist_dir, _ = store_location(internal)
+    path = Path(persist_dir) / "index_manifest.json"
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        return "none"
+    cached = _VERSIONS.get(path)
+    if cached is None or cached[0] != mtime:
+        manifest = read_index_manifest(persist_dir) or {}
+        cached = _VERSIONS[path] = (mtime, manifest.get("indexed_at") or str(mtime))
+    return cached[1]
+
+
+def store_dir(internal=False):
+    """Directory of the store build currently served (the CURRENT version for versioned stores)."""
+    return REGISTRY.get(*store_location(internal)).persist_dir
+
+
+def warm_stores(stores=None):
+    REGISTRY.warm(stores)
+
+
+def store_health():
+    return REGISTRY.health()
+
+
+def reload_stores(persist_dir=None, collection_name=None):
+    return REGISTRY.reload(persist_dir, collection_name)
+
 
 # ---- Helper: dynamic client + collection ----
 def get_client_and_collection(collection_name=PUBLIC_COLLECTION, internal=False):
@@ -56,30 +562,20 @@ def get_client_and_collection(collection_name=PUBLIC_COLLECTION, internal=False)
     Returns a PersistentClient and the specified collection.
     If internal=True, it uses INTERNAL_DIR and INTERNAL_COLLECTION.
     Otherwise, it uses PUBLIC_DIR and PUBLIC_COLLECTION.
+    Handles come from the shared registry, so repeated calls do not reopen the store.
+    Sharded stores have no single client/collection: (None, None).
     """
     persist_path = INTERNAL_DIR if internal else PUBLIC_DIR
-    persist_path.mkdir(parents=True, exist_ok=True)
-
-    client = chromadb.PersistentClient(path=str(persist_path))
-    collection = client.get_or_create_collection(name=collection_name)
-    return client, collection
+    handle = REGISTRY.get(persist_path, collection_name)
+    return handle.client, handle.collection
 
 
 # ---- Core retrieval ----
-def retrieve(query, n_results=4, internal=False):
-    """
-    Query the chosen Chroma collection.
-    If internal=True, searches in the internal collection only.
-    Returns a list of dicts: {id, text, metadata, score}.
-    """
-    collection_name = INTERNAL_COLLECTION if internal else PUBLIC_COLLECTION
-    _, collection = get_client_and_collection(collection_name=collection_name, internal=internal)
-    resp = collection.query(query_texts=[query], n_results=n_results)
-
-    ids = resp.get("ids", [[]])[0]
-    documents = resp.get("documents", [[]])[0]
-    metadatas = resp.get("metadatas", [[]])[0]
-    distances = resp.get("distances", [[]])[0] if "distances" in resp else [None] * len(ids)
+def _unpack_results(resp, qi):
+    ids = resp.get("ids", [[]])[qi]
+    documents = resp.get("documents", [[]])[qi]
+    metadatas = resp.get("metadatas", [[]])[qi]
+    distances = resp.get("distances", [[]])[qi] if resp.get("distances") else [None] * len(ids)
 
     results = []
     for i in range(len(ids)):
@@ -92,6 +588,227 @@ def retrieve(query, n_results=4, internal=False):
     return results
 
 
+def _distances(space, query_vecs, vecs):
+    """Distances as Chroma reports them for the collection's space (l2 is squared)."""
+    if space == "cosine":
+        qn = query_vecs / np.maximum(np.linalg.norm(query_vecs, axis=1, keepdims=True), 1e-12)
+        vn = vecs / np.maximum(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12)
+        return 1.0 - qn @ vn.T
+    if space == "ip":
+        return 1.0 - query_vecs @ vecs.T
+    return (
+        np.sum(query_vecs ** 2, axis=1, keepdims=True)
+        - 2.0 * (query_vecs @ vecs.T)
+        + np.sum(vecs ** 2, axis=1)[None, :]
+    )
+
+
+def _exact_search(handle, query_vecs, ids, n_results):
+    """Brute-force search over a small candidate set (selective filters)."""
+    got = handle.collection.get(ids=list(ids), include=["embeddings", "documents", "metadatas"])
+    if not got["ids"]:
+        return [[] for _ in range(len(query_vecs))]
+    vecs = np.asarray(got["embeddings"], dtype=np.float32)
+    dists = _distances(handle.space, query_vecs, vecs)
+    out = []
+    for row in dists:
+        top = np.argsort(row, kind="stable")[:n_results]
+        out.append([
+            {"id": got["ids"][i], "text": got["documents"][i], "metadata": got["metadatas"][i], "score": float(row[i])}
+            for i in top
+        ])
+    return out
+
+
+def _dense_search(handle, queries, n_results, where=None, query_vecs=None):
+    # embed with the index's own model (cached) rather than Chroma's default embedding function
+    if query_vecs is None:
+        query_vecs = handle.encoder.encode(queries)
+    if where and handle.meta_index is not None:
+        ids = handle.meta_index.match(where)
+        # Chroma's where cannot see dedup representatives standing in for a doc_id
+        if ids is not None and (len(ids) <= EXACT_SEARCH_MAX or handle.meta_index.aliased(where)):
+            if not ids:
+                return [[] for _ in queries]
+            return _exact_search(handle, query_vecs, ids, n_results)
+    resp = handle.collection.query(query_embeddings=query_vecs.tolist(), n_results=n_results, where=where or None)
+    return [_unpack_results(resp, qi) for qi in range(len(queries))]
+
+
+def _fetch_chunks(handle, ids):
+    """id -> (text, metadata) for chunks found only by the keyword index."""
+    if not ids:
+        return {}
+    got = handle.collection.get(ids=list(ids), include=["documents", "metadatas"])
+    return {i: (t, m) for i, t, m in zip(got["ids"], got["documents"], got["metadatas"])}
+
+
+def _sparse_search(handle, queries, n_results, where=None, bm25_stats=None):
+    allowed = handle.filter_ids(where)
+    hits = [handle.bm25.search(q, n_results, allowed_ids=allowed, stats=bm25_stats[qi] if bm25_stats else None)
+            for qi, q in enumerate(queries)]
+    chunks = _fetch_chunks(handle, {cid for h in hits for cid, _ in h})
+    return [
+        [{"id": cid, "text": chunks[cid][0], "metadata": chunks[cid][1], "score": score}
+         for cid, score in h if cid in chunks]
+        for h in hits
+    ]
+
+
+def _fuse(dense_all, sparse_all, n_results):
+    """Reciprocal-rank fusion per query of dense results and BM25 results (whose text may be None)."""
+    fused_all = []
+    for dense, sparse in zip(dense_all, sparse_all):
+        fused = {}
+        for rank, r in enumerate(dense):
+            fused[r["id"]] = {"id": r["id"], "text": r["text"], "metadata": r["metadata"],
+                              "score": 1.0 / (RRF_K + rank + 1), "dense_score": r["score"], "bm25_score": None}
+        for rank, r in enumerate(sparse):
+            entry = fused.setdefault(r["id"], {"id": r["id"], "text": r["text"], "metadata": r["metadata"],
+                                               "score": 0.0, "dense_score": None, "bm25_score": None})
+            entry["score"] += 1.0 / (RRF_K + rank + 1)
+            entry["bm25_score"] = r["score"]
+        fused_all.append(sorted(fused.values(), key=lambda r: -r["score"])[:n_results])
+    return fused_all
+
+
+def _hybrid_search(handle, queries, n_results, where=None, query_vecs=None):
+    """Dense and BM25 search run concurrently, fused with reciprocal-rank fusion."""
+    pool_k = max(n_results * HYBRID_CANDIDATES, 20)
+    dense_future = _SEARCH_POOL.submit(_dense_search, handle, queries, pool_k, where, query_vecs)
+    allowed = handle.filter_ids(where)
+    sparse_all = [
+        [{"id": cid, "text": None, "metadata": None, "score": bm25}
+         for cid, bm25 in handle.bm25.search(q, pool_k, allowed_ids=allowed)]
+        for q in queries
+    ]
+    fused_all = _fuse(dense_future.result(), sparse_all, n_results)
+
+    chunks = _fetch_chunks(handle, {r["id"] for res in fused_all for r in res if r["text"] is None})
+    for res in fused_all:
+        for r in res:
+            if r["text"] is None and r["id"] in chunks:
+                r["text"], r["metadata"] = chunks[r["id"]]
+    return [[r for r in res if r["text"] is not None] for res in fused_all]
+
+
+def search_store(handle, queries, query_vecs, n_results, mode, where=None, bm25_stats=None):
+    """
+    One shard's part of a sharded retrieve: (dense, sparse) result lists per
+    query, with text, for the caller to merge across shards and fuse.
+    bm25_stats: per-query corpus-wide BM25 statistics (see BM25Index.search).
+    """
+    if mode == "dense" or handle.bm25 is None:
+        return _dense_search(handle, queries, n_results, where, query_vecs), [[] for _ in queries]
+    if mode == "sparse":
+        return [[] for _ in queries], _sparse_search(handle, queries, n_results, where, bm25_stats)
+    pool_k = max(n_results * HYBRID_CANDIDATES, 20)
+    dense_future = _SEARCH_POOL.submit(_dense_search, handle, queries, pool_k, where, query_vecs)
+    sparse_all = _sparse_search(handle, queries, pool_k, where, bm25_stats)
+    return dense_future.result(), sparse_all
+
+
+def retrieve_many(queries, n_results=4, internal=False, mode=None, where=None, query_vecs=None):
+    """
+    Batched retrieve(): one encoder call and one multi-query collection.query
+    for all queries. Returns a list (one per query, same order) of result lists
+    in the retrieve() shape.
+    mode and where are as in retrieve(); query_vecs optionally passes vectors
+    already encoded with this store's encoder.
+    """
+    queries = list(queries)
+    if not queries:
+        return []
+    mode = mode or RETRIEVE_MODE
+    if mode not in RETRIEVE_MODES:
+        raise ValueError(f"Unknown retrieve mode '{mode}' (choose from {', '.join(RETRIEVE_MODES)})")
+    collection_name = INTERNAL_COLLECTION if internal else PUBLIC_COLLECTION
+    persist_path = INTERNAL_DIR if internal else PUBLIC_DIR
+    handle = REGISTRY.get(persist_path, collection_name)
+    if isinstance(handle, ShardedHandle):
+        return handle.search(queries, n_results, mode if handle.bm25 is not None else "dense", where, query_vecs)
+    if mode == "dense" or handle.bm25 is None:
+        return _dense_search(handle, queries, n_results, where, query_vecs)
+    if mode == "sparse":
+        return _sparse_search(handle, queries, n_results, where)
+    return _hybrid_search(handle, queries, n_results, where, query_vecs)
+
+
+def retrieve(query, n_results=4, internal=False, mode=None, where=None):
+    """
+    Query the chosen Chroma collection.
+    If internal=True, searches in the internal collection only.
+    mode: "dense" (vector search), "sparse" (BM25) or "hybrid" (both, RRF-fused);
+    defaults to RAG_RETRIEVE_MODE.
+    where: optional Chroma metadata filter, e.g. {"doc_id": "payslip_copy.txt"} or
+    {"$and": [{"source": "internal"}, {"file_type": "pdf"}]}. It is applied before
+    ranking, so all n_results slots go to matching chunks; selective filters on
+    doc_id/file_type/source are answered by an exact search over their candidates.
+    Returns a list of dicts: {id, text, metadata, score}. score is the vector
+    distance (dense, lower is better), the BM25 score (sparse) or the RRF score
+    (hybrid, higher is better; dense_score/bm25_score carry the components).
+    """
+    return retrieve_many([query], n_results=n_results, internal=internal, mode=mode, where=where)[0]
+
+
+def _relevance(results, mode, space):
+    """
+    Map each store's scores onto one scale (higher = more relevant) so results
+    from different stores can be ranked together:
+      dense   cosine similarity recovered from the distance (same model in every store)
+      hybrid  RRF score / best possible RRF score
+      sparse  BM25 / best BM25 in that store (BM25 is not comparable across corpora)
+    """
+    if mode == "dense":
+        for r in results:
+            d = r["score"] if r["score"] is not None else 2.0
+            r["relevance"] = 1.0 - d / 2.0 if space == "l2" else 1.0 - d
+    elif mode == "hybrid":
+        for r in results:
+            r["relevance"] = r["score"] * (RRF_K + 1) / 2.0
+    else:
+        top = max((r["score"] for r in results), default=0.0) or 1.0
+        for r in results:
+            r["relevance"] = r["score"] / top
+    return results
+
+
+def retrieve_fanout(query, n_results=4, internal=(False, True), mode=None, where=None):
+    """
+    Query several stores concurrently (internal: one flag per store, False =
+    public, True = internal) and merge them by normalized relevance. Latency is
+    that of the slowest store, not the sum. Each result gets "store" and
+    "relevance"; a chunk present in several stores is kept once.
+    """
+    mode = mode or RETRIEVE_MODE
+    handles = {flag: REGISTRY.get(*store_location(flag)) for flag in dict.fromkeys(internal)}
+    live = {flag: h for flag, h in handles.items() if h.count()}
+    if mode != "dense" and any(h.bm25 is None for h in live.values()):
+        # one mode for every store, or the relevance scales would not be comparable
+        print(f"[WARN] A store has no BM25 index; fan-out uses dense retrieval for all stores instead of {mode}")
+        mode = "dense"
+    query_vecs = {}
+    if mode != "sparse":
+        # one encoding per distinct query encoder (stores built with the same model share it),
+        # the distinct ones running concurrently
+        encoders = {id(h.encoder): h.encoder for h in live.values()}
+        query_vecs = dict(zip(encoders, _FANOUT_POOL.map(lambda enc: enc.encode([query]), encoders.values())))
+
+    def one(flag):
+        h = live[flag]
+        vecs = query_vecs.get(id(h.encoder))
+        return flag, retrieve_many([query], n_results=n_results, internal=flag, mode=mode, where=where,
+                                   query_vecs=vecs)[0]
+
+    merged = {}
+    for flag, results in _FANOUT_POOL.map(one, list(live)):
+        for r in _relevance(results, mode, live[flag].space):
+            r["store"] = "internal" if flag else "public"
+            if r["id"] not in merged or r["relevance"] > merged[r["id"]]["relevance"]:
+                merged[r["id"]] = r
+    return sorted(merged.values(), key=lambda r: -r["relevance"])[:n_results]
+
+
 # ---- Optional quick test ----
 if __name__ == "__main__":
     q = input("Enter query: ")
@@ -3,7 +3,7 @@ import re
 import os
 import json
 from dotenv import load_dotenv
-from vectorstore import retrieve
+from vectorstore import retrieve, retrieve_many
 
 load_dotenv()
 
@@ -114,8 +114,9 @@ ANSWER:
     except Exception as e:
         return {"decision": "ERROR", "reason": str(e)}
 
-def verify_answer(question, answer, k=4):
-    retrieved = retrieve(question, n_results=k)
+def verify_answer(question, answer, k=4, retrieved=None):
+    if retrieved is None:
+        retrieved = retrieve(question, n_results=k)
     score = overlap_score(answer, retrieved)
     judge = None
     if USE_OPENAI and client is not None:
@@ -127,6 +128,15 @@ def verify_answer(question, answer, k=4):
         "llm_judge": judge
     }
 
+def verify_answers(pairs, k=4):
+    """
+    Verify many (question, answer) pairs, e.g. an evaluation set; retrieval
+    for all questions is done in one batched call.
+    """
+    pairs = list(pairs)
+    retrieved_all = retrieve_many([q for q, _ in pairs], n_results=k)
+    return [verify_answer(q, a, k=k, retrieved=r) for (q, a), r in zip(pairs, retrieved_all)]
+
 # quick CLI test
 if __name__ == "__main__":
     q = input("Question: ")
@@ -0,0 +1,47 @@
+# tests/conftest.py
+import re
+import sys
+import zlib
+import importlib.machinery
+import importlib.util
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+
+class StubEncoder:
+    """Deterministic hashed bag-of-words vectors, so tests need no torch/model download."""
+    dim = 64
+
+    def encode(self, texts, convert_to_numpy=True, **kwargs):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in re.findall(r"\w+", text.lower()):
+                out[i, zlib.crc32(word.encode("utf-8")) % self.dim] += 1.0
+        return out / np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+
+
+@pytest.fixture
+def stub_encoder(monkeypatch):
+    import encoders
+    import vectorstore
+    enc = StubEncoder()
+    monkeypatch.setattr(encoders, "load_encoder", lambda *a, **k: enc)
+    monkeypatch.setattr(vectorstore, "load_encoder", lambda *a, **k: enc)
+    monkeypatch.setattr(vectorstore, "_ENCODERS", {})
+    return enc
+
+
+@pytest.fixture(scope="session")
+def embedding_cli():
+    """src/embedding,py (the comma keeps it from being imported by name)."""
+    path = SRC_DIR / "embedding,py"
+    loader = importlib.machinery.SourceFileLoader("embedding_cli", str(path))
+    module = importlib.util.module_from_spec(importlib.util.spec_from_loader("embedding_cli", loader))
+    loader.exec_module(module)
+    return module
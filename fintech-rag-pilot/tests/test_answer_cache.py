@@ -0,0 +1,44 @@
+# tests/test_answer_cache.py
+import numpy as np
+
+from answer_cache import SemanticAnswerCache
+
+A = np.array([1.0, 0.0, 0.0])
+NEAR_A = np.array([0.99, 0.1, 0.0])
+B = np.array([0.0, 1.0, 0.0])
+
+
+def test_hit_for_paraphrase_miss_for_other_question():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.put(A, "GREEN", "v1", "q", "answer")
+    assert cache.get(NEAR_A, "GREEN", "v1")["answer"] == "answer"
+    assert cache.get(B, "GREEN", "v1") is None
+
+
+def test_new_index_version_invalidates_entries():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.put(A, "GREEN", "v1", "q", "old answer")
+    assert cache.get(A, "GREEN", "v2") is None
+    assert cache.stats()["invalidated"] == 1
+    assert cache.get(A, "GREEN", "v1") is None  # gone, not just hidden
+
+
+def test_labels_are_isolated_and_red_is_never_cached():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.put(A, "YELLOW", "v1", "q", "internal answer")
+    assert cache.get(A, "GREEN", "v1") is None
+    cache.put(B, "RED", "v1", "q", "secret")
+    assert cache.get(B, "RED", "v1") is None
+    assert cache.stats()["entries"] == 1
+
+
+def test_ttl_and_lru_eviction():
+    cache = SemanticAnswerCache(threshold=0.9, ttl=0.0)
+    cache.put(A, "GREEN", "v1", "q", "answer")
+    assert cache.get(A, "GREEN", "v1") is None and cache.stats()["expired"] == 1
+
+    cache = SemanticAnswerCache(threshold=0.9, max_entries=1)
+    cache.put(A, "GREEN", "v1", "a", "first")
+    cache.put(B, "GREEN", "v1", "b", "second")
+    assert cache.get(A, "GREEN", "v1") is None
+    assert cache.get(B, "GREEN", "v1")["answer"] == "second"
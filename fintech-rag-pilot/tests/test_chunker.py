@@ -0,0 +1,49 @@
+# tests/test_chunker.py
+import pytest
+
+from chunker import OffsetTextSplitter, SourceDoc
+
+TEXT = (
+    "TECHSUPPLIERS LLP\nInvoice No: INV-2025-0815\nInvoice Date: 2025-08-15\n\n"
+    "Bill To: Werize Solutions Pvt Ltd\nTotal Due: 181,248.00 INR\nDue Date: 2025-09-14\n\n"
+    + " ".join(f"word{i}" for i in range(400))
+    + "\n\nA" + "x" * 300 + "\n\nshort tail paragraph."
+)
+SIZES = [(800, 200), (120, 30), (50, 0), (40, 39)]
+
+
+@pytest.mark.parametrize("chunk_size, chunk_overlap", SIZES)
+def test_spans_point_at_their_text(chunk_size, chunk_overlap):
+    splitter = OffsetTextSplitter(chunk_size, chunk_overlap)
+    spans = splitter.split_spans(TEXT)
+    assert [TEXT[s:e] for s, e in spans] == splitter.split_text(TEXT)
+    for s, e in spans:
+        chunk = TEXT[s:e]
+        assert chunk and chunk == chunk.strip()
+        assert len(chunk) <= chunk_size
+    # chunks come in source order and cover every non-space character
+    starts = [s for s, _ in spans]
+    assert starts == sorted(starts)
+    covered = set()
+    for s, e in spans:
+        covered.update(range(s, e))
+    assert all(i in covered for i, c in enumerate(TEXT) if not c.isspace())
+
+
+def test_split_doc_assigns_pdf_pages():
+    text = "page one text\n\npage two text"
+    doc = SourceDoc("x.pdf", text, pages=[(0, 1), (text.index("page two"), 2)])
+    chunks = OffsetTextSplitter(15, 0).split_doc(doc)
+    assert [(c.text, c.page) for c in chunks] == [("page one text", 1), ("page two text", 2)]
+
+
+def test_overlap_larger_than_size_is_rejected():
+    with pytest.raises(ValueError):
+        OffsetTextSplitter(10, 20)
+
+
+@pytest.mark.parametrize("chunk_size, chunk_overlap", SIZES)
+def test_matches_langchain_recursive_splitter(chunk_size, chunk_overlap):
+    splitters = pytest.importorskip("langchain_text_splitters", reason="LangChain not installed")
+    reference = splitters.RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    assert OffsetTextSplitter(chunk_size, chunk_overlap).split_text(TEXT) == reference.split_text(TEXT)
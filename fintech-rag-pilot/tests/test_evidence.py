@@ -0,0 +1,29 @@
+# tests/test_evidence.py
+from evidence import budget_evidence, count_tokens
+
+
+def _chunk(i, doc, start, text):
+    return {"id": f"c{i}", "text": text, "metadata": {"doc_id": doc, "start": start, "end": start + len(text)}}
+
+
+def _results(k):
+    return [_chunk(i, f"doc{i}.txt", 0, f"evidence sentence number {i} " * 40) for i in range(k)]
+
+
+def test_no_budget_keeps_every_chunk():
+    sections = budget_evidence(_results(10), max_tokens=0)
+    assert [s["id"] for s in sections] == [f"c{i}" for i in range(10)]
+
+
+def test_adjacent_chunks_are_merged_without_overlap():
+    a = _chunk(0, "d.txt", 0, "alpha beta gamma")
+    b = _chunk(1, "d.txt", 11, "gamma delta")
+    [s] = budget_evidence([a, b], max_tokens=0)
+    assert s["text"] == "alpha beta gamma delta"
+    assert s["chunk_ids"] == ["c0", "c1"]
+
+
+def test_oversized_best_section_is_truncated_to_the_budget():
+    [s] = budget_evidence(_results(1), max_tokens=20)
+    assert s["tokens"] == count_tokens(s["text"]) <= 20
+    assert s["tokens"] >= 15  # cut by tokens, not a chars-per-token guess
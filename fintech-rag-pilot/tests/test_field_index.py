@@ -0,0 +1,52 @@
+# tests/test_field_index.py
+import pytest
+
+from field_index import FieldIndex
+
+INVOICE = """TECHSUPPLIERS LLP
+Invoice No: INV-2025-0815
+Invoice Date: 2025-08-15
+Bill To: Werize Solutions Pvt Ltd
+Total Due: 181,248.00 INR
+Due Date: 2025-09-14"""
+
+PAYSLIP = """ACME CORPORATION
+Payroll Statement
+Employee: Aisha Rao
+Employee ID: EMP-4783
+Pay Period: 2025-08-01 to 2025-08-31
+Net Pay: 104,950.00 INR"""
+
+
+@pytest.fixture
+def index(tmp_path):
+    idx = FieldIndex(tmp_path / "field_index.sqlite")
+    idx.put_document("invoice_techsuppliers_20250815.txt", INVOICE)
+    idx.put_document("payslip_2025_Aisha_Rao.txt", PAYSLIP)
+    yield idx
+    idx.close()
+
+
+@pytest.mark.parametrize("question, field, raw", [
+    ("What is the due date on INV-2025-0815?", "due_date", "2025-09-14"),
+    ("When is the due date of invoice INV-2025-0815?", "due_date", "2025-09-14"),
+    ("What's the total due for INV-2025-0815", "total_due", "181,248.00 INR"),
+    ("How much is the net pay for EMP-4783?", "net_pay", "104,950.00 INR"),
+    ("net pay EMP-4783", "net_pay", "104,950.00 INR"),
+])
+def test_lookup_answers_field_questions(index, question, field, raw):
+    hit = index.lookup(question)
+    assert hit is not None
+    assert (hit["field"], hit["raw"]) == (field, raw)
+
+
+@pytest.mark.parametrize("question", [
+    "Why was INV-2025-0815 not paid by the due date?",
+    "Is the total due on INV-2025-0815 correct given the line items?",
+    "Summarize the payslip EMP-4783 net pay trend and explain deductions",
+    "What is the due date?",                       # no identifier
+    "Who issued INV-2025-0815?",                   # no field named
+    "What is the due date on INV-9999-0001?",      # unknown identifier
+])
+def test_lookup_leaves_other_questions_to_rag(index, question):
+    assert index.lookup(question) is None
@@ -0,0 +1,116 @@
+# tests/test_incremental.py
+import json
+
+import pytest
+
+from ingest import iter_chunks
+from vector_backends import open_collection
+from bm25_index import open_bm25_index
+from metadata_index import open_metadata_index
+
+DOCS = {
+    "invoice_a.txt": "Invoice No: INV-1\nTotal Due: 100.00 INR\nDue Date: 2025-09-14",
+    "payslip_b.txt": "Employee ID: EMP-2\nNet Pay: 50,000.00 INR\nPay Date: 2025-09-01",
+    "letter_c.txt": "Employment letter confirming the role of analyst at TechFlow Solutions.",
+}
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    for name, text in DOCS.items():
+        (data / name).write_text(text, encoding="utf-8")
+    return data
+
+
+def build(cli, data, store, **kwargs):
+    opts = dict(persist_directory=store, collection_name="test", model_name="stub", cache_dir=None,
+                pipeline=False, vector_backend="flat")
+    opts.update(kwargs)
+    return cli.build_chroma(iter_chunks(str(data), report_timings=False), **opts)
+
+
+def reindex(cli, data, store, **kwargs):
+    opts = dict(persist_directory=store, collection_name="test", model_name="stub", cache_dir=None,
+                pipeline=False, vector_backend="flat")
+    opts.update(kwargs)
+    return cli.reindex_incremental(data, **opts)
+
+
+def stored_ids(store):
+    return set(open_collection("flat", store, "test").get(include=[])["ids"])
+
+
+def test_incremental_applies_only_the_changes(embedding_cli, stub_encoder, corpus, tmp_path):
+    store = tmp_path / "store"
+    build(embedding_cli, corpus, store)
+    assert stored_ids(store) == {f"{name}_0" for name in DOCS}
+
+    before = json.loads((store / "index_manifest.json").read_text(encoding="utf-8"))
+    assert reindex(embedding_cli, corpus, store)["indexed_at"] == before["indexed_at"]  # no changes
+
+    (corpus / "invoice_a.txt").write_text("Invoice No: INV-1\nTotal Due: 999.00 INR", encoding="utf-8")
+    (corpus / "letter_c.txt").unlink()
+    (corpus / "notice_d.txt").write_text("Income tax notice for PAN ABCDE1234F", encoding="utf-8")
+    meta = reindex(embedding_cli, corpus, store)
+
+    assert set(meta["files"]) == {"invoice_a.txt", "payslip_b.txt", "notice_d.txt"}
+    assert meta["files"]["payslip_b.txt"] == before["files"]["payslip_b.txt"]
+    assert stored_ids(store) == {"invoice_a.txt_0", "payslip_b.txt_0", "notice_d.txt_0"}
+    assert meta["num_vectors"] == 3
+    got = open_collection("flat", store, "test").get(ids=["invoice_a.txt_0"], include=["documents"])
+    assert "999.00" in got["documents"][0]
+    # keyword and metadata indexes are rebuilt to match the collection
+    assert len(open_bm25_index(store).chunk_ids) == 3
+    assert open_metadata_index(store).match({"doc_id": "letter_c.txt"}) == []
+
+
+def test_incremental_keeps_corpus_wide_dedup_stats(embedding_cli, stub_encoder, corpus, tmp_path):
+    store = tmp_path / "store"
+    (corpus / "letter_copy.txt").write_text(DOCS["letter_c.txt"], encoding="utf-8")
+    build(embedding_cli, corpus, store, dedup=True)
+
+    (corpus / "payslip_b.txt").write_text("Employee ID: EMP-2\nNet Pay: 51,000.00 INR", encoding="utf-8")
+    meta = reindex(embedding_cli, corpus, store, dedup=True)
+    assert meta["dedup"]["input_chunks"] == 4 and meta["dedup"]["duplicates_collapsed"] == 1
+
+    # removing the duplicate's file clears the representative's source list
+    (corpus / "letter_copy.txt").unlink()
+    meta = reindex(embedding_cli, corpus, store, dedup=True)
+    assert meta["dedup"]["duplicates_collapsed"] == 0
+    rep = open_collection("flat", store, "test").get(ids=["letter_c.txt_0"], include=["metadatas"])
+    assert rep["metadatas"][0]["num_sources"] == 1
+
+
+def test_changed_model_forces_full_build(embedding_cli, stub_encoder, corpus, tmp_path):
+    store = tmp_path / "store"
+    build(embedding_cli, corpus, store)
+    reindex(embedding_cli, corpus, store, model_name="other-stub")
+    meta = json.loads((store / "index_manifest.json").read_text(encoding="utf-8"))
+    assert meta["model_name"] == "other-stub"
+    assert stored_ids(store) == {f"{name}_0" for name in DOCS}
+
+
+def test_sharded_manifest_records_the_collection_space(embedding_cli, stub_encoder, corpus, tmp_path, monkeypatch):
+    import vector_backends
+    from vectorstore import ShardedHandle
+
+    monkeypatch.setattr(vector_backends.VectorBackend, "metadata", {"hnsw:space": "cosine"})
+    store = tmp_path / "sharded"
+    meta = embedding_cli.build_sharded(corpus, store, "test", 2, model_name="stub", cache_dir=None,
+                                       pipeline=False, vector_backend="flat")
+    assert meta["space"] == "cosine"
+    assert ShardedHandle(store, "test").space == "cosine"
+
+    # older root manifests without "space": taken from the shards, never assumed l2
+    del meta["space"]
+    (store / "index_manifest.json").write_text(json.dumps(meta), encoding="utf-8")
+    assert ShardedHandle(store, "test").space == "cosine"
+
+    # stores whose shard manifests predate it: read off the first shard's collection
+    for m in store.glob("shard-*/index_manifest.json"):
+        shard_meta = json.loads(m.read_text(encoding="utf-8"))
+        del shard_meta["space"]
+        m.write_text(json.dumps(shard_meta), encoding="utf-8")
+    assert ShardedHandle(store, "test").space == "cosine"
@@ -0,0 +1,86 @@
+# tests/test_index_versions.py
+import os
+import shutil
+import time
+
+import pytest
+
+import index_versions as iv
+from ingest import iter_chunks
+from shards import doc_family, shard_for
+
+
+def build_version(cli, data, root, name):
+    store = root / iv.VERSIONS_DIRNAME / name
+    cli.build_chroma(iter_chunks(str(data), report_timings=False), persist_directory=store, collection_name="test",
+                     model_name="stub", cache_dir=None, pipeline=False, vector_backend="flat")
+    return store
+
+
+@pytest.fixture
+def data(tmp_path):
+    folder = tmp_path / "data"
+    folder.mkdir()
+    (folder / "invoice_a.txt").write_text("Invoice No: INV-1\nDue Date: 2025-09-14", encoding="utf-8")
+    (folder / "payslip_b.txt").write_text("Employee ID: EMP-2\nNet Pay: 50,000.00 INR", encoding="utf-8")
+    return folder
+
+
+def test_publish_validates_and_switches_current(embedding_cli, stub_encoder, data, tmp_path):
+    root = tmp_path / "root"
+    store = build_version(embedding_cli, data, root, "v1")
+    assert iv.validate_version(store, "test") == []
+    assert iv.validate_version(store, "other") != []
+    assert iv.publish_version(root, store, "test")
+    assert iv.current_version(root) == "v1"
+    assert iv.resolve_store_dir(root) == store
+
+
+def test_invalid_version_is_not_published(embedding_cli, stub_encoder, data, tmp_path):
+    root = tmp_path / "root"
+    iv.publish_version(root, build_version(embedding_cli, data, root, "v1"), "test")
+    broken = build_version(embedding_cli, data, root, "v2")
+    shutil.rmtree(broken / "bm25_index")
+    assert any("BM25" in p for p in iv.validate_version(broken, "test"))
+    assert not iv.publish_version(root, broken, "test")
+    assert iv.current_version(root) == "v1"
+
+
+def make_versions(root, names):
+    for name in names:
+        (root / iv.VERSIONS_DIRNAME / name).mkdir(parents=True)
+
+
+def age(root, name, seconds):
+    marker = root / iv.VERSIONS_DIRNAME / name / iv.RETIRED_FILE
+    os.utime(marker, (time.time() - seconds,) * 2)
+
+
+def test_prune_waits_for_the_grace_period(tmp_path):
+    make_versions(tmp_path, ["v1", "v2", "v3", "v4"])
+    for name in ("v1", "v2", "v3"):
+        iv.activate_version(tmp_path, name)
+    # keep=2 keeps v3 (current) and v2; v1 is beyond it but was retired just now
+    assert iv.prune_versions(tmp_path, keep=2, grace_s=60) == []
+    age(tmp_path, "v1", 120)
+    assert iv.prune_versions(tmp_path, keep=2, grace_s=60) == ["v1"]
+    # v2 (rollback target) and the newer unpublished v4 are kept
+    assert iv.list_versions(tmp_path) == ["v2", "v3", "v4"]
+
+
+def test_rollback_puts_a_version_back_in_service(tmp_path):
+    make_versions(tmp_path, ["v1", "v2"])
+    iv.activate_version(tmp_path, "v1")
+    iv.activate_version(tmp_path, "v2")
+    assert (tmp_path / iv.VERSIONS_DIRNAME / "v1" / iv.RETIRED_FILE).exists()
+    iv.activate_version(tmp_path, "v1")
+    assert not (tmp_path / iv.VERSIONS_DIRNAME / "v1" / iv.RETIRED_FILE).exists()
+    assert (tmp_path / iv.VERSIONS_DIRNAME / "v2" / iv.RETIRED_FILE).exists()
+    assert iv.prune_versions(tmp_path, keep=1, grace_s=0) == []   # v2 is newer than current
+
+
+def test_shard_routing_is_stable():
+    assert doc_family("payslip_2025_Aisha_Rao.txt") == "payslip"
+    assert shard_for("invoice_a.txt", 4) == shard_for("invoice_a.txt", 4)
+    assert shard_for("payslip_a.txt", 8, by="family") == shard_for("payslip_b.txt", 8, by="family")
+    assert {shard_for(f"doc_{i}.txt", 4) for i in range(100)} == {0, 1, 2, 3}
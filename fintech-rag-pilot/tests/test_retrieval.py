@@ -0,0 +1,151 @@
+# tests/test_retrieval.py
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from bm25_index import build_bm25_from_collection, open_bm25_index
+from metadata_index import build_metadata_index_from_collection, open_metadata_index, where_matches
+from vector_backends import open_collection
+import vectorstore
+from vectorstore import RRF_K, StoreRegistry, _fuse
+
+DOCS = {
+    "invoice.txt_0": ("invoice total due date payment", {"doc_id": "invoice.txt", "file_type": "txt", "source": "public", "page": 1}),
+    "invoice.txt_1": ("invoice line items and tax", {"doc_id": "invoice.txt", "file_type": "txt", "source": "public", "page": 2}),
+    "payslip.txt_0": ("net pay gross pay deductions", {"doc_id": "payslip.txt", "file_type": "txt", "source": "internal", "page": 1}),
+    "loan.pdf_0": ("loan interest rate and due date", {"doc_id": "loan.pdf", "file_type": "pdf", "source": "internal", "page": 3}),
+    "kyc.pdf_0": ("kyc documents required for payment accounts", {"doc_id": "kyc.pdf", "file_type": "pdf", "source": "public", "page": 5}),
+}
+
+
+def make_collection(path, ids):
+    col = open_collection("flat", path, "test", delete_existing=True)
+    rng = np.random.RandomState(0)
+    col.upsert(ids=list(ids), embeddings=rng.normal(size=(len(ids), 8)).astype(np.float32),
+               documents=[DOCS[i][0] for i in ids], metadatas=[DOCS[i][1] for i in ids])
+    return col
+
+
+def r(id_, score):
+    return {"id": id_, "text": id_, "metadata": {}, "score": score}
+
+
+def test_fuse_sums_reciprocal_ranks():
+    dense = [[r("a", 0.1), r("b", 0.2), r("c", 0.3)]]
+    sparse = [[r("c", 9.0), r("a", 5.0)]]
+    fused = _fuse(dense, sparse, 3)[0]
+    assert [x["id"] for x in fused] == ["a", "c", "b"]
+    assert fused[0]["score"] == pytest.approx(1 / (RRF_K + 1) + 1 / (RRF_K + 2))
+    assert (fused[1]["dense_score"], fused[1]["bm25_score"]) == (0.3, 9.0)
+    assert fused[2]["bm25_score"] is None
+
+
+def test_fuse_truncates_to_n_results():
+    dense = [[r(str(i), i) for i in range(10)]]
+    assert len(_fuse(dense, [[]], 4)[0]) == 4
+
+
+def test_bm25_corpus_stats_make_shard_scores_match_unsharded(tmp_path):
+    ids = list(DOCS)
+    build_bm25_from_collection(make_collection(tmp_path / "all", ids), tmp_path / "all")
+    build_bm25_from_collection(make_collection(tmp_path / "s0", ids[:2]), tmp_path / "s0")
+    build_bm25_from_collection(make_collection(tmp_path / "s1", ids[2:]), tmp_path / "s1")
+    full, shards = open_bm25_index(tmp_path / "all"), [open_bm25_index(tmp_path / s) for s in ("s0", "s1")]
+
+    query = "payment due date"
+    n_docs, tokens, df = 0, 0.0, {}
+    for shard in shards:
+        n, t, d = shard.term_stats(query)
+        n_docs, tokens = n_docs + n, tokens + t
+        for term, c in d.items():
+            df[term] = df.get(term, 0) + c
+    stats = (n_docs, tokens / n_docs, df)
+
+    merged = sorted((hit for s in shards for hit in s.search(query, 10, stats=stats)), key=lambda h: -h[1])
+    expected = full.search(query, 10)
+    assert [h[0] for h in merged] == [h[0] for h in expected]
+    assert [h[1] for h in merged] == pytest.approx([h[1] for h in expected], rel=1e-5)
+    # without corpus-wide stats the shard-local IDF differs
+    local = sorted((hit for s in shards for hit in s.search(query, 10)), key=lambda h: -h[1])
+    assert [h[1] for h in local] != pytest.approx([h[1] for h in expected], rel=1e-5)
+
+
+def test_bm25_allowed_ids(tmp_path):
+    build_bm25_from_collection(make_collection(tmp_path, list(DOCS)), tmp_path)
+    hits = open_bm25_index(tmp_path).search("due date", 10, allowed_ids={"loan.pdf_0"})
+    assert [h[0] for h in hits] == ["loan.pdf_0"]
+
+
+@pytest.mark.parametrize("where, expected", [
+    ({"doc_id": "invoice.txt"}, {"invoice.txt_0", "invoice.txt_1"}),
+    ({"file_type": {"$ne": "txt"}}, {"loan.pdf_0", "kyc.pdf_0"}),
+    ({"doc_id": {"$in": ["loan.pdf", "kyc.pdf"]}}, {"loan.pdf_0", "kyc.pdf_0"}),
+    ({"source": {"$nin": ["internal"]}}, {"invoice.txt_0", "invoice.txt_1", "kyc.pdf_0"}),
+    ({"$and": [{"source": "internal"}, {"file_type": "pdf"}]}, {"loan.pdf_0"}),
+    ({"$or": [{"doc_id": "payslip.txt"}, {"file_type": "pdf"}]}, {"payslip.txt_0", "loan.pdf_0", "kyc.pdf_0"}),
+    ({"doc_id": "missing.txt"}, set()),
+])
+def test_metadata_index_matches_where_matches(tmp_path, where, expected):
+    build_metadata_index_from_collection(make_collection(tmp_path, list(DOCS)), tmp_path)
+    assert set(open_metadata_index(tmp_path).match(where)) == expected
+    assert {i for i, (_, meta) in DOCS.items() if where_matches(meta, where)} == expected
+
+
+def test_metadata_index_defers_unindexed_filters(tmp_path):
+    build_metadata_index_from_collection(make_collection(tmp_path, list(DOCS)), tmp_path)
+    index = open_metadata_index(tmp_path)
+    assert index.match({"page": {"$gt": 2}}) is None
+    assert index.match({"doc_id": {"$eq": "a", "$ne": "b"}}) is None
+
+
+@pytest.mark.parametrize("where, expected", [
+    ({"page": {"$gt": 2}}, {"loan.pdf_0", "kyc.pdf_0"}),
+    ({"page": {"$lte": 1}}, {"invoice.txt_0", "payslip.txt_0"}),
+    ({"page": {"$gte": 2, "$lt": 5}}, {"invoice.txt_1", "loan.pdf_0"}),
+])
+def test_in_process_collection_where_operators(tmp_path, where, expected):
+    got = make_collection(tmp_path, list(DOCS)).get(where=where, include=[])
+    assert set(got["ids"]) == expected
+
+
+def test_metadata_index_doc_id_includes_dedup_representatives(tmp_path):
+    col = make_collection(tmp_path, list(DOCS))
+    col.update(ids=["invoice.txt_0"], metadatas=[{"duplicate_ids": "copy.txt_0", "duplicate_doc_ids": "copy.txt",
+                                                  "num_sources": 2}])
+    build_metadata_index_from_collection(col, tmp_path)
+    index = open_metadata_index(tmp_path)
+    assert index.match({"doc_id": "copy.txt"}) == ["invoice.txt_0"]
+    assert index.aliased({"doc_id": "copy.txt"}) and not index.aliased({"doc_id": "invoice.txt"})
+    # negations only look at a chunk's own doc_id
+    assert "invoice.txt_0" in index.match({"doc_id": {"$ne": "copy.txt"}})
+
+
+class SlowDict(dict):
+    """Widens the gap between reading and writing the last-check time."""
+
+    def get(self, key, default=None):
+        value = super().get(key, default)
+        time.sleep(0.01)
+        return value
+
+
+def test_concurrent_version_checks_read_current_once(monkeypatch):
+    reads = []
+    monkeypatch.setattr(vectorstore, "current_version", lambda root: reads.append(root))
+    registry = StoreRegistry()
+    registry._checked = SlowDict()
+    handle = type("Handle", (), {"version": None})()
+    barrier = threading.Barrier(8)
+
+    def check():
+        barrier.wait()
+        registry._check_version("key", "root", "test", handle)
+
+    threads = [threading.Thread(target=check) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(reads) == 1